@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Set
+from agents.crew import Crew
+from agents.telemetry import Trace
+
+
+class RateLimiter:
+    """
+    Spaces calls at least 1 / rate seconds apart across all threads. rate=None disables limiting.
+    """
+
+    def __init__(self, rate: Optional[float] = None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class BatchRunner:
+    """
+    Answers many questions offline: reads {"id", "question"} JSON lines, writes {"id", "question", "answer", "sources", ...}
+    JSON lines.
+
+    Questions are processed in blocks. Per block, all questions are embedded in one encoder call and searched
+    with one vector DB query; web searches and LLM calls then run on a bounded thread pool, each rate limited.
+    Every answer is appended to the output as soon as it is ready, so a crashed run resumes by skipping the ids
+    already answered in the output. Failed questions are written with an "error" field and retried by the next run
+    (which appends their new record). Conversation memory is never read or written.
+    """
+
+    def __init__(
+            self,
+            crew: Crew,
+            concurrency: int = 8,
+            web_rate: Optional[float] = 5.0,
+            llm_rate: Optional[float] = None,
+            block_size: int = 256,
+            use_web: bool = True
+    ):
+        """
+        :param crew: Crew whose retriever, web searcher, reranker, synthesizer and answer cache are used.
+        :param concurrency: Questions whose web search and LLM call may be in flight at once.
+        :param web_rate: Maximum web searches per second (None: unlimited).
+        :param llm_rate: Maximum LLM calls per second (None: unlimited). Answer cache hits do not count.
+        :param block_size: Questions embedded and searched together; also bounds the answers lost to a crash.
+        :param use_web: If False, answers are synthesized from PDF chunks only.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1.")
+        self.crew = crew
+        self.concurrency = concurrency
+        self.block_size = block_size
+        self.use_web = use_web
+        self.web_limiter = RateLimiter(web_rate)
+        self.llm_limiter = RateLimiter(llm_rate)
+        self.logger = logging.getLogger("BatchRunner")
+
+    @staticmethod
+    def read_questions(input_path: str) -> List[Dict[str, Any]]:
+        """
+        Reads the input JSON lines. A line without an "id" gets its line number as id.
+        """
+        questions = []
+        with open(input_path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if not record.get("question"):
+                    raise ValueError(f"{input_path}:{line_number}: missing 'question'.")
+                questions.append({"id": record.get("id", line_number), "question": record["question"]})
+        return questions
+
+    @staticmethod
+    def completed_ids(output_path: str) -> Set[str]:
+        """
+        Ids already answered (without error) in output_path. A partial last line left by a crash is truncated away.
+        """
+        if not os.path.exists(output_path):
+            return set()
+        done = set()
+        with open(output_path, "r+b") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                f.truncate(end)
+        for line in data[:end].splitlines():
+            if line.strip():
+                record = json.loads(line)
+                if "error" not in record:
+                    done.add(str(record["id"]))
+        return done
+
+    def run(self, input_path: str, output_path: str) -> Dict[str, Any]:
+        """
+        Answers every question of input_path not yet in output_path. Returns run statistics.
+        """
+        questions = self.read_questions(input_path)
+        done = self.completed_ids(output_path)
+        pending = [q for q in questions if str(q["id"]) not in done]
+        self.logger.info(f"{len(questions)} questions, {len(questions) - len(pending)} already answered, {len(pending)} to go.")
+
+        stats = {"answered": 0, "errors": 0, "skipped": len(questions) - len(pending), "seconds": 0.0}
+        start = time.perf_counter()
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        with open(output_path, "a", encoding="utf-8") as out, \
+                ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as pool:
+            for offset in range(0, len(pending), self.block_size):
+                block = pending[offset:offset + self.block_size]
+                for record in self._run_block(block, pool):
+                    out.write(json.dumps(record) + "\n")
+                    out.flush()
+                    stats["errors" if "error" in record else "answered"] += 1
+                os.fsync(out.fileno())
+                elapsed = time.perf_counter() - start
+                print(f"{offset + len(block)}/{len(pending)} questions answered ({(offset + len(block)) / elapsed:.1f}/s)")
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        return stats
+
+    def _run_block(self, block: List[Dict[str, Any]], pool: ThreadPoolExecutor):
+        """
+        Yields the output records of a block as their answers complete.
+        """
+        crew = self.crew
+        questions = [q["question"] for q in block]
+        trace = Trace("batch_block")
+        embeddings = crew.retriever.embed_queries(questions, trace=trace)
+        pdf_results = crew.retriever.retrieve_many(
+            questions, top_k=crew.pdf_top_k, query_embeddings=embeddings, trace=trace
+        )
+        self.logger.debug(f"Retrieved {len(block)} questions in {trace.seconds:.2f}s: {trace.to_dict()['spans']}")
+
+        futures = {
+            pool.submit(self._answer, record["question"], pdf_chunks, embedding): record
+            for record, pdf_chunks, embedding in zip(block, pdf_results, embeddings)
+        }
+        for future in as_completed(futures):
+            record = futures[future]
+            try:
+                response = future.result()
+                if response["error"]:
+                    raise RuntimeError(response["error"])
+                yield {
+                    "id": record["id"],
+                    "question": record["question"],
+                    "answer": response["answer"],
+                    "sources": response["sources"],
+                    "cached": response["cached"],
+                }
+            except Exception as e:
+                self.logger.error(f"Question {record['id']} failed: {e}")
+                yield {"id": record["id"], "question": record["question"], "error": str(e)}
+
+    def _answer(self, question: str, pdf_chunks: List[Dict[str, Any]], embedding: List[float]) -> Dict[str, Any]:
+        pdf_chunks, _ = self.crew.rerank(question, pdf_chunks)
+        web_chunks = []
+        if self.use_web:
+            self.web_limiter.wait()
+            try:
+                web_chunks = self.crew.websearcher.search(question, num_results=3)
+            except Exception as e:
+                self.logger.warning(f"Web search failed for '{question}': {e}")
+        return self.crew.answer_with_context(
+            question, pdf_chunks, web_chunks, query_embedding=embedding, before_llm_call=self.llm_limiter.wait
+        )
@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Iterable, Callable, Hashable
+import numpy as np
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache bounded by entry count and (estimated) bytes, with hit/miss counters.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None, sizeof: Optional[Callable[[Any], int]] = None):
+        """
+        :param max_bytes: If set, evict least recently used entries until the sum of sizeof(value) fits.
+        :param sizeof: Estimates the size of a value in bytes (required for max_bytes to be meaningful).
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Returns the cached value (marking it most recently used), or None on a miss.
+        """
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Stores a value, evicting least recently used entries beyond the bounds. Values larger than max_bytes are not cached.
+        """
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self.bytes -= self._sizes[key]
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._sizes[key] = size
+            self.bytes += size
+            while len(self._data) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                old_key, _ = self._data.popitem(last=False)
+                self.bytes -= self._sizes.pop(old_key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._data), "bytes": self.bytes}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class DiskTTLCache:
+    """
+    Persistent key -> JSON value cache in SQLite, with a TTL and a size bound (oldest entries evicted first).
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 24 * 3600, max_entries: int = 10000):
+        """
+        :param path: SQLite file holding the cache (":memory:" for a non-persistent cache).
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_created_at ON entries (created_at)")
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value, or None if absent or expired.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM entries WHERE key = ? AND created_at >= ?",
+                (key, time.time() - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Stores a JSON-serializable value, then evicts expired entries and the oldest beyond max_entries.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now)
+            )
+            self._conn.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl_seconds,))
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY created_at ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+class SemanticCache:
+    """
+    Persistent cache of synthesized answers, keyed on the question embedding and the set of retrieved chunk ids.
+
+    A lookup hits when an unexpired entry retrieved from exactly the same chunks has a question embedding
+    with cosine similarity >= similarity_threshold, so paraphrases of an answered question skip the LLM.
+    Entries expire after ttl_seconds; above max_entries the least recently used entries are evicted.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            similarity_threshold: float = 0.95,
+            ttl_seconds: float = 7 * 24 * 3600,
+            max_entries: int = 1000
+    ):
+        """
+        :param path: SQLite file holding the cache (":memory:" for a non-persistent cache).
+        """
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.logger = logging.getLogger("SemanticCache")
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " id INTEGER PRIMARY KEY,"
+                " chunk_key TEXT NOT NULL,"
+                " embedding BLOB NOT NULL,"
+                " answer TEXT NOT NULL,"
+                " sources TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS answers_chunk_key ON answers (chunk_key)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+
+    @staticmethod
+    def chunk_key(chunk_ids: Iterable[str]) -> str:
+        """
+        Order-independent key for a set of chunk ids.
+        """
+        return hashlib.sha1("\n".join(sorted(set(chunk_ids))).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, embedding: List[float], chunk_ids: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """
+        Returns {"answer", "sources", "similarity"} of the closest cached entry, or None on a miss.
+        """
+        now = time.time()
+        query = self._normalize(embedding)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, embedding, answer, sources FROM answers WHERE chunk_key = ? AND created_at >= ?",
+                (self.chunk_key(chunk_ids), now - self.ttl_seconds)
+            ).fetchall()
+            if not rows:
+                return None
+            matrix = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+            if matrix.shape[1] != query.shape[0]:
+                return None
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                return None
+            row_id, _, answer, sources = rows[best]
+            with self._conn:
+                self._conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (now, row_id))
+        return {"answer": answer, "sources": json.loads(sources), "similarity": float(similarities[best])}
+
+    def store(self, embedding: List[float], chunk_ids: Iterable[str], answer: str, sources: List[Dict[str, Any]]) -> None:
+        """
+        Adds an answer to the cache, then evicts expired and least recently used entries.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO answers (chunk_key, embedding, answer, sources, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.chunk_key(chunk_ids), self._normalize(embedding).tobytes(), answer, json.dumps(sources), now, now)
+            )
+            self._conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+                self.logger.debug(f"Evicted {count - self.max_entries} least recently used answers.")
+
+    def clear(self) -> None:
+        """
+        Removes every cached answer.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM answers")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
@@ -0,0 +1,146 @@
+import os
+import json
+import mmap
+import numpy as np
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+# (chunk_id, text, metadata), as in agents.vectorstore.StoredChunk.
+Chunk = Tuple[str, str, Dict[str, Any]]
+# Stored for chunks whose metadata has no usable page number.
+NO_PAGE = -1
+CHUNK_FILES = (
+    "chunk_ids.npy", "chunk_id_order.npy", "chunk_file_ids.npy", "chunk_pages.npy",
+    "chunk_offsets.npy", "chunk_text.bin", "chunk_files.json",
+)
+
+
+class ChunkStore:
+    """
+    Compact, read-only chunk records, row for row: no Python object is kept per chunk.
+
+    Chunk texts are concatenated UTF-8 in one memory-mapped blob; parallel arrays hold each chunk's id
+    (fixed-width bytes), file (an index into the list of filenames), page number and byte offsets into the blob.
+    Ids are found by binary search over a stored sort order. A chunk's text is only decoded when that chunk is read.
+
+    Metadata is reduced to filename and page (all that ingestion records); pages are stored as integers
+    exactly as ingestion produced them.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        :param directory: Directory written by ChunkStore.write; None (or no files) for an empty store.
+        """
+        self.directory = directory
+        self._sorted_ids: Optional[np.ndarray] = None
+        if directory is None or not os.path.exists(os.path.join(directory, "chunk_ids.npy")):
+            self.ids = np.zeros(0, dtype="S1")
+            self.id_order = np.zeros(0, dtype=np.int64)
+            self.file_ids = np.zeros(0, dtype=np.uint32)
+            self.pages = np.zeros(0, dtype=np.int32)
+            self.offsets = np.zeros(1, dtype=np.uint64)
+            self.files: List[str] = []
+            self.text = b""
+            return
+        load = lambda name: np.load(os.path.join(directory, name), mmap_mode="r")
+        self.ids = load("chunk_ids.npy")
+        self.id_order = load("chunk_id_order.npy")
+        self.file_ids = load("chunk_file_ids.npy")
+        self.pages = load("chunk_pages.npy")
+        self.offsets = load("chunk_offsets.npy")
+        with open(os.path.join(directory, "chunk_files.json"), "r", encoding="utf-8") as f:
+            self.files = json.load(f)
+        self.text = b""
+        if int(self.offsets[-1]):
+            with open(os.path.join(directory, "chunk_text.bin"), "rb") as f:
+                self.text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def write(directory: str, chunks: Iterable[Chunk]) -> int:
+        """
+        Writes the chunks, in order, into directory (which must exist). Texts are streamed to the blob;
+        only the per-chunk arrays are held in memory. Returns the number of chunks written.
+        """
+        ids, file_ids, pages, offsets = [], [], [], [0]
+        file_index: Dict[str, int] = {}
+        with open(os.path.join(directory, "chunk_text.bin"), "wb") as blob:
+            for cid, text, metadata in chunks:
+                data = text.encode("utf-8")
+                blob.write(data)
+                offsets.append(offsets[-1] + len(data))
+                ids.append(cid.encode("utf-8"))
+                filename = metadata.get("filename", "Unknown")
+                file_ids.append(file_index.setdefault(filename, len(file_index)))
+                pages.append(ChunkStore._page_number(metadata.get("page")))
+        ids = np.array(ids, dtype=f"S{max((len(i) for i in ids), default=1)}")
+        np.save(os.path.join(directory, "chunk_ids.npy"), ids)
+        np.save(os.path.join(directory, "chunk_id_order.npy"), np.argsort(ids, kind="stable"))
+        np.save(os.path.join(directory, "chunk_file_ids.npy"), np.array(file_ids, dtype=np.uint32))
+        np.save(os.path.join(directory, "chunk_pages.npy"), np.array(pages, dtype=np.int32))
+        np.save(os.path.join(directory, "chunk_offsets.npy"), np.array(offsets, dtype=np.uint64))
+        with open(os.path.join(directory, "chunk_files.json"), "w", encoding="utf-8") as f:
+            json.dump(list(file_index), f)
+        return len(ids)
+
+    @staticmethod
+    def _page_number(page: Any) -> int:
+        try:
+            return int(page)
+        except (TypeError, ValueError):
+            return NO_PAGE
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def chunk_id(self, row: int) -> str:
+        return self.ids[row].decode("utf-8")
+
+    def text_of(self, row: int) -> str:
+        return self.text[int(self.offsets[row]):int(self.offsets[row + 1])].decode("utf-8")
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        metadata: Dict[str, Any] = {"filename": self.files[self.file_ids[row]]}
+        page = int(self.pages[row])
+        if page != NO_PAGE:
+            metadata["page"] = page
+        return metadata
+
+    def chunk(self, row: int) -> Chunk:
+        return self.chunk_id(row), self.text_of(row), self.metadata(row)
+
+    def row_of(self, cid: str) -> Optional[int]:
+        """
+        Row of the chunk with id cid, or None.
+        """
+        if not len(self.ids):
+            return None
+        if self._sorted_ids is None:
+            self._sorted_ids = np.asarray(self.ids[self.id_order])
+        key = np.array(cid.encode("utf-8"), dtype=self.ids.dtype)
+        i = int(np.searchsorted(self._sorted_ids, key))
+        if i < len(self._sorted_ids) and self._sorted_ids[i] == cid.encode("utf-8"):
+            return int(self.id_order[i])
+        return None
+
+    def iter_chunks(self, skip: Iterable[int] = ()) -> Iterator[Chunk]:
+        skip = set(skip)
+        for row in range(len(self)):
+            if row not in skip:
+                yield self.chunk(row)
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """
+        Bytes of the per-chunk arrays and of the text blob (memory-mapped: paged in on demand, shared between
+        processes), in total and per chunk.
+        """
+        arrays = sum(a.nbytes for a in (self.ids, self.id_order, self.file_ids, self.pages, self.offsets))
+        if self._sorted_ids is not None:
+            arrays += self._sorted_ids.nbytes
+        text = int(self.offsets[-1])
+        n = len(self)
+        return {
+            "chunks": n,
+            "array_bytes": arrays,
+            "text_bytes": text,
+            "array_bytes_per_chunk": round(arrays / n, 1) if n else 0.0,
+            "text_bytes_per_chunk": round(text / n, 1) if n else 0.0,
+        }
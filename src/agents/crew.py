@@ -1,10 +1,22 @@
+import os
 import logging
-import re
+import time
+import threading
+from contextlib import nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from agents.retriever import PDFRetriever
-from agents.synthesizer import Synthesizer
-from agents.memory import MemoryKeeper
+from agents.reranker import CrossEncoderReranker, DEFAULT_RERANK_MODEL
+from agents.synthesizer import Synthesizer, LLM_ERROR_PREFIX, CORROBORATION_HEADING
+from agents.cache import SemanticCache
+from agents.memory import MemoryKeeper, DEFAULT_SESSION
+from agents.router import default_router, is_standalone
 from agents.websearcher import WebSearcher
-from typing import Dict, Any
+from agents.telemetry import Trace, MetricsRegistry, SlowRequestProfiler, append_jsonl, maybe_span
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+SPECULATIVE_MODES = ("restart", "corroborate")
+# Prefix of the span and counter names recorded by speculative drafts.
+DRAFT_PREFIX = "draft_"
 
 class Crew:
     """
@@ -15,75 +27,609 @@ class Crew:
             self,
             papers_dir: str = "papers",
             persist_dir: str = "chroma_db",
-            model: str = "gpt-3.5-turbo"
+            model: str = "gpt-3.5-turbo",
+            pdf_timeout: float = 30.0,
+            web_timeout: float = 5.0,
+            answer_cache: bool = True,
+            cache_similarity: float = 0.95,
+            cache_ttl: float = 7 * 24 * 3600,
+            cache_max_entries: int = 1000,
+            memory_path: str = ":memory:",
+            memory_max_length: Optional[int] = None,
+            web_cache: bool = True,
+            trace_path: Optional[str] = None,
+            profile_threshold: Optional[float] = None,
+            profile_dir: str = "profiles",
+            profile_mode: str = "sampling",
+            rerank: bool = False,
+            rerank_candidates: int = 50,
+            rerank_top_n: int = 4,
+            rerank_model: str = DEFAULT_RERANK_MODEL,
+            rerank_backend: str = "torch",
+            rerank_quantize: bool = False,
+            build_index: bool = True,
+            warm_up: bool = False,
+            vector_backend: str = "chroma",
+            vector_dtype: str = "float32",
+            top_k: int = 4,
+            retriever: Optional[PDFRetriever] = None,
+            embed_batch_size: Optional[int] = None,
+            embed_batch_wait: float = 0.0,
+            source_workers: int = 4,
+            speculative: Optional[str] = None,
+            embedding_backend: str = "torch",
+            embedding_quantize: bool = False,
+            embedding_threads: Optional[int] = None,
+            embedding_batch_size: int = 32
     ):
+        """
+        :param pdf_timeout: Deadline in seconds for the PDF retrieval leg.
+        :param web_timeout: Deadline in seconds for the web search leg. If the web leg is late,
+            the answer is synthesized from PDF chunks alone.
+        :param answer_cache: Reuse answers of (near-)identical questions over the same PDF chunks instead of calling the LLM.
+            Follow-up questions, whose answer depends on the conversation history, are neither looked up nor cached;
+            questions that stand on their own are, whatever the history (see agents.router.is_standalone).
+        :param cache_similarity: Minimum cosine similarity between question embeddings for a cache hit.
+        :param cache_ttl: Seconds a cached answer stays valid.
+        :param cache_max_entries: Maximum number of cached answers (least recently used are evicted).
+        :param memory_path: SQLite file for conversation history (default: in memory, lost on exit).
+        :param memory_max_length: If set, only the latest memory_max_length turns are kept per session.
+        :param web_cache: Cache web search results on disk for a day, saving round-trips and API quota on repeated queries.
+        :param trace_path: If set, every request's trace (stage spans, token counts, cache hits) is appended to this JSON lines file.
+        :param profile_threshold: If set, requests slower than this many seconds have their stacks written to profile_dir.
+        :param profile_mode: "sampling" (all threads, collapsed stacks) or "cprofile" (request thread, .pstats).
+        :param rerank: Over-fetch rerank_candidates PDF chunks and keep the rerank_top_n best by a local cross-encoder.
+        :param rerank_backend: "torch" or "onnx" inference for the cross-encoder.
+        :param rerank_quantize: Use int8 cross-encoder weights.
+        :param build_index: Sync the index with papers_dir when the retriever is first needed. If False,
+            the existing index is loaded as is (faster; fails if there is none).
+        :param warm_up: Load the retriever, embedding model, reranker and LLM client on a background thread right away,
+            instead of on the first question that needs them.
+        :param vector_backend: "chroma", or "numpy" for the in-process memory-mapped vector store.
+        :param vector_dtype: "float32" or "int8" stored embeddings (numpy backend).
+        :param top_k: PDF chunks retrieved per question (without reranking).
+        :param retriever: Use this retriever, index already loaded, instead of opening one from papers_dir and
+            persist_dir (which then only hold the caches); the vector store and embedding options are ignored.
+        :param embed_batch_size: Micro-batch the query embeddings of concurrent questions into model calls of up to
+            this many queries (for servers handling questions on several threads).
+        :param embed_batch_wait: Seconds an embedding micro-batch waits for more queries.
+        :param source_workers: Threads running the PDF and web legs; each question in flight uses two
+            (three with speculative synthesis).
+        :param speculative: Speculative synthesis in handle_question: drafting an answer from the PDF chunks starts
+            as soon as they are retrieved, while the web search is still pending. If web results arrive before the
+            web deadline, "restart" cancels the draft and answers from both sources, while "corroborate" keeps the
+            draft and appends a web corroboration pass. Responses report the path taken under "speculation".
+        :param embedding_backend: "torch" or "onnx" inference for the embedding model (see PDFRetriever).
+        :param embedding_quantize: Use int8 embedding model weights.
+        :param embedding_threads: CPU threads for embedding inference.
+        :param embedding_batch_size: Texts encoded per embedding forward pass.
+
+        Construction itself is cheap: heavy components are created lazily, so meta questions never load them.
+        """
+        if speculative is not None and speculative not in SPECULATIVE_MODES:
+            raise ValueError(f"speculative must be None or one of {SPECULATIVE_MODES}.")
         self.logger = logging.getLogger("Crew")
-        self.retriever = PDFRetriever(papers_dir, persist_dir)
+        self.speculative = speculative
+        self.source_timeouts = {"pdf": pdf_timeout, "web": web_timeout}
+        # Long-lived pool: a late leg keeps running in the background instead of blocking the answer.
+        self.executor = ThreadPoolExecutor(max_workers=source_workers, thread_name_prefix="crew-source")
+        self.metrics = MetricsRegistry()
+        self.trace_path = trace_path
+        self.profiler = SlowRequestProfiler(
+            threshold_seconds=profile_threshold,
+            output_dir=profile_dir,
+            mode=profile_mode
+        ) if profile_threshold is not None else None
+        self.papers_dir = papers_dir
+        self.persist_dir = persist_dir
+        self.build_index = build_index
+        self.retriever_options = {
+            "vector_backend": vector_backend,
+            "vector_dtype": vector_dtype,
+            "query_batch_size": embed_batch_size,
+            "query_batch_wait": embed_batch_wait,
+            "embedding_backend": embedding_backend,
+            "embedding_quantize": embedding_quantize,
+            "embedding_threads": embedding_threads,
+            "embedding_batch_size": embedding_batch_size,
+        }
+        self._retriever = retriever
+        self._reranker: Optional[CrossEncoderReranker] = None
+        self._retriever_lock = threading.Lock()
+        self._reranker_lock = threading.Lock()
         self.synthesizer = Synthesizer(model=model)
-        self.memory = MemoryKeeper()
-        self.websearcher = WebSearcher()
+        self.pdf_top_k = rerank_candidates if rerank else top_k
+        self.rerank_top_n = rerank_top_n
+        self.rerank_options = {
+            "model_name": rerank_model,
+            "backend": rerank_backend,
+            "quantize": rerank_quantize
+        } if rerank else None
+        self.memory = MemoryKeeper(max_length=memory_max_length, db_path=memory_path)
+        # Register more meta intents with self.router.register(...).
+        self.router = default_router()
+        self.websearcher = WebSearcher(
+            cache_path=os.path.join(persist_dir, "web_cache.sqlite3") if web_cache else None
+        )
+        self.answer_cache = SemanticCache(
+            os.path.join(persist_dir, "answer_cache.sqlite3"),
+            similarity_threshold=cache_similarity,
+            ttl_seconds=cache_ttl,
+            max_entries=cache_max_entries
+        ) if answer_cache else None
+
+        self.warm_up_thread = None
+        if warm_up:
+            self.warm_up_thread = threading.Thread(target=self.warm_up, name="crew-warm-up", daemon=True)
+            self.warm_up_thread.start()
+
+    @property
+    def retriever(self) -> PDFRetriever:
+        """
+        PDF retriever with its index ready, created on first use.
+        """
+        if self._retriever is None:
+            with self._retriever_lock:
+                if self._retriever is None:
+                    self._retriever = self._open_retriever()
+        return self._retriever
+
+    @property
+    def loaded_retriever(self) -> Optional[PDFRetriever]:
+        """
+        The retriever if it has been created, else None; unlike retriever, never triggers loading.
+        """
+        return self._retriever
 
+    @property
+    def reranker(self) -> Optional[CrossEncoderReranker]:
+        """
+        Cross-encoder reranker, loaded on first use; None if reranking is off.
+        """
+        if self._reranker is None and self.rerank_options is not None:
+            with self._reranker_lock:
+                if self._reranker is None:
+                    self._reranker = CrossEncoderReranker(**self.rerank_options)
+        return self._reranker
+
+    def _open_retriever(self) -> PDFRetriever:
+        retriever = PDFRetriever(self.papers_dir, self.persist_dir, **self.retriever_options)
+        try:
+            if self.build_index:
+                stats = retriever.update_index()
+                self.logger.info(f"Vector DB synced with papers directory: {stats}")
+            else:
+                retriever.load_existing_index()
+                self.logger.info("Loaded existing vector DB without syncing it.")
+        except Exception as err:
+            self.logger.error(f"Failed to build vector DB: {err}")
+            raise
+        return retriever
+
+    def warm_up(self) -> None:
+        """
+        Loads everything a regular question needs: index, embedding model, reranker, tokenizer and LLM client.
+        Failures are only logged; the first question retries and reports them.
+        """
+        start = time.perf_counter()
         try:
-            self.retriever.load_existing_index()
-            self.logger.info("Vector DB loaded from disk.")
+            self.retriever.embedding.embed_query("warm up")
+            _ = self.reranker
+            _ = self.synthesizer.packer
+            _ = self.synthesizer.client
         except Exception as e:
-            self.logger.warning(f"No existing index found, building index: {e}")
+            self.logger.warning(f"Warm-up failed: {e}")
+            return
+        self.logger.info(f"Warm-up finished in {time.perf_counter() - start:.2f}s.")
+
+    def handle_question(self, question: str, session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
+        """
+        Handles a user question and returns a structured response with sources and conversational memory.
+        Questions with different session ids never see each other's history.
+        The response's "trace" holds per-stage timing spans, token counts and cache hits.
+        """
+        trace = Trace("handle_question")
+        with self._profiling(trace):
+            response = self._answer(question, session_id, trace)
+        self._record_trace(trace, response)
+        return response
+
+    def stream_question(self, question: str, session_id: str = DEFAULT_SESSION) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of handle_question. Yields {"type": "token", "text": ...} and
+        {"type": "citation", "source": ...} events while the answer is generated, then one
+        {"type": "done", ...} event carrying the same fields handle_question returns. If the LLM fails mid-answer,
+        its "error" is set and its "answer" is only the part streamed before the failure.
+        """
+        trace = Trace("stream_question")
+        with self._profiling(trace):
+            for event in self._stream_answer(question, session_id, trace):
+                if event["type"] == "done":
+                    self._record_trace(trace, event)
+                yield event
+
+    def export_metrics(self) -> str:
+        """
+        Aggregated stage timings and counters of all requests so far, in Prometheus text format.
+        """
+        return self.metrics.to_prometheus()
+
+    def _profiling(self, trace: Trace):
+        return self.profiler.profile(trace) if self.profiler else nullcontext()
+
+    def _record_trace(self, trace: Trace, response: Dict[str, Any]) -> None:
+        trace.finish()
+        self.metrics.observe(trace)
+        if self.trace_path:
             try:
-                self.retriever.load_and_index_papers()
-                self.logger.info("Vector DB created and persisted.")
-            except Exception as err:
-                self.logger.error(f"Failed to build vector DB: {err}")
-                raise
-
-    def handle_question(self, question: str) -> Dict[str, Any]:
-        """Handles a user question and returns a structured response with sources and conversational memory."""
-        meta_q = question.lower().strip()
-        history = self.memory.get_history()
-        ORDINAL_WORDS = {
-            "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5,
-            "sixth": 6, "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10,
-        }
+                append_jsonl(self.trace_path, trace)
+            except OSError as e:
+                self.logger.warning(f"Failed to write trace: {e}")
+        response["trace"] = trace.to_dict()
 
-        # --- Meta-question handlers ---
-        for word, n in ORDINAL_WORDS.items():
-            if f"{word} question" in meta_q:
-                if n <= len(history):
-                    answer = history[n-1]["question"]
-                else:
-                    answer = f"There is no question number {n}."
-                return {"answer": answer, "sources": [], "memory": history}
-        nth_q_match = re.search(r"(?:what\s+was\s+)?(?:the\s+)?(\d+)(?:st|nd|rd|th)?\s+question", meta_q)
-        if nth_q_match:
-            n = int(nth_q_match.group(1))
-            if 1 <= n <= len(history):
-                answer = history[n - 1]["question"]
-            else:
-                answer = f"There is no question number {n}."
-            return {"answer": answer, "sources": [], "memory": history}
-        if "last question" in meta_q:
-            answer = history[-2]["question"] if len(history) > 1 else "Not enough history."
-            return {"answer": answer, "sources": [], "memory": history}
-        if "last answer" in meta_q:
-            answer = history[-2]["answer"] if len(history) > 1 else "Not enough history."
-            return {"answer": answer, "sources": [], "memory": history}
-        if "previous questions" in meta_q or "list questions" in meta_q:
-            questions = [entry["question"] for entry in history[:-1]] if len(history) > 1 else []
-            answer = "\n".join(f"{i+1}. {q}" for i, q in enumerate(questions)) if questions else "No previous questions."
-            return {"answer": answer, "sources": [], "memory": history}
-
-        # --- Normal question (RAG) flow ---
+    def _answer(self, question: str, session_id: str, trace: Trace) -> Dict[str, Any]:
+        with trace.span("meta_detection"):
+            meta = self._handle_meta_question(question, session_id)
+        if meta is not None:
+            return meta
+
+        if self.speculative is not None:
+            turn = self._speculative_turn(question, session_id, trace)
+        else:
+            turn = self._prepare_turn(question, session_id, trace)
+            self._synthesize(question, turn, trace)
+        return self._finish_turn(question, turn, session_id)
+
+    def answer_with_context(
+            self,
+            question: str,
+            pdf_chunks: List[Dict[str, Any]],
+            web_chunks: List[Dict[str, Any]],
+            query_embedding: Optional[List[float]] = None,
+            before_llm_call: Optional[Callable[[], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Answers a question from already retrieved chunks, with no conversation history.
+        Conversation memory is neither read nor written, so offline runs (see agents/batch.py) leave sessions untouched.
+        The answer cache is used as in handle_question.
+        :param query_embedding: Embedding of question; needed for the answer cache.
+        :param before_llm_call: Called right before the LLM is called (not on cache hits), e.g. to rate limit.
+        """
+        trace = Trace("answer_with_context")
+        turn = self._build_turn(pdf_chunks, web_chunks, [], query_embedding, {}, None, trace)
+        if turn["result"] is None and before_llm_call is not None:
+            before_llm_call()
+        self._synthesize(question, turn, trace)
+        self._cache_answer(turn)
+        response = self._response(turn)
+        self._record_trace(trace, response)
+        return response
+
+    def _stream_answer(self, question: str, session_id: str, trace: Trace) -> Iterator[Dict[str, Any]]:
+        with trace.span("meta_detection"):
+            meta = self._handle_meta_question(question, session_id)
+        if meta is not None:
+            yield {"type": "token", "text": meta["answer"]}
+            yield dict(meta, type="done")
+            return
+
+        turn = self._prepare_turn(question, session_id, trace)
+        if turn["result"] is None:
+            try:
+                events = self.synthesizer.stream_synthesize(
+                    question, turn["chunks"], history=turn["history"], trace=trace
+                )
+                for event in events:
+                    if event["type"] == "done":
+                        turn["result"] = {key: event[key] for key in ("answer", "sources", "reasoning", "packing", "error")}
+                    else:
+                        yield event
+            except Exception as e:
+                self.logger.error(f"Synthesizer failed: {e}")
+                turn["result"] = self._synthesis_error(e)
+                turn["cacheable"] = False
+                yield {"type": "token", "text": turn["result"]["answer"]}
+        else:
+            yield {"type": "token", "text": turn["result"]["answer"]}
+        yield dict(self._finish_turn(question, turn, session_id), type="done")
+
+    def _handle_meta_question(self, question: str, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Answers questions about the conversation itself from memory (see agents/router.py). Returns None for regular questions.
+        """
+        return self.router.answer(question, self.memory, session_id)
+
+    def _prepare_turn(self, question: str, session_id: str, trace: Optional[Trace] = None) -> Dict[str, Any]:
+        """
+        Gathers everything needed to answer a regular question: retrieved and numbered chunks, recent history,
+        timings, and, if no LLM call is needed (cache hit or no context), the result itself.
+        """
+        legs, query = self._source_legs(question, trace)
+        start, futures = self._start_legs(legs)
+        sources: Dict[str, List[Dict[str, Any]]] = {}
+        timings: Dict[str, Dict[str, Any]] = {}
+        self._collect_leg("pdf", futures["pdf"], start, sources, timings)
+        history3 = self.memory.get_history(n=3, session_id=session_id)
+        embedding, rerank = query.get("embedding"), query.get("rerank")
+        standalone = is_standalone(question)
+
+        if sources["pdf"]:
+            # Cached answers are keyed on the PDF chunks only, so a hit does not wait for the web leg.
+            turn = self._build_turn(sources["pdf"], [], history3, embedding, timings, rerank, trace, standalone=standalone)
+            if turn["cached"]:
+                timings["web"] = {"status": "skipped", "seconds": round(time.perf_counter() - start, 4)}
+                timings["total"] = {"seconds": round(time.perf_counter() - start, 4)}
+                return turn
+        self._collect_leg("web", futures["web"], start, sources, timings)
+        timings["total"] = {"seconds": round(time.perf_counter() - start, 4)}
+        # Already looked up above (and never cacheable without PDF chunks).
+        return self._build_turn(
+            sources["pdf"], sources["web"], history3, embedding, timings, rerank, trace, lookup=False, standalone=standalone
+        )
+
+    def _source_legs(
+            self,
+            question: str,
+            trace: Optional[Trace] = None
+    ) -> Tuple[Dict[str, Callable[[float], List[Dict[str, Any]]]], Dict[str, Any]]:
+        """
+        The PDF and web retrieval legs of a question, and the dict the PDF leg fills with the query embedding
+        and rerank stats. Legs are called with their deadline (a time.perf_counter() value).
+        """
+        query = {}
+        # Initialized here rather than in the leg, so a first-use index build is not cut off by the pdf deadline.
+        # If the index cannot be loaded or built, the pdf leg fails like any other, leaving the web results;
+        # the next question tries again.
         try:
-            pdf_chunks = self.retriever.retrieve(question)
+            retriever = self.retriever
+            retriever_error = None
         except Exception as e:
-            self.logger.error(f"Failed to retrieve from PDFs: {e}")
-            pdf_chunks = []
+            # Already logged by _open_retriever; recorded as the pdf leg's error.
+            retriever, retriever_error = None, e
+
+        def retrieve_pdf(deadline: float):
+            if retriever is None:
+                raise RuntimeError(f"PDF retriever unavailable: {retriever_error}")
+            # Embed once: the embedding is reused as the answer cache key.
+            query["embedding"] = retriever.embed_query(question, trace=trace)
+            chunks = retriever.retrieve(
+                question, top_k=self.pdf_top_k, query_embedding=query["embedding"], trace=trace
+            )
+            # Reranked inside the leg, so it overlaps with the web search and counts against the pdf deadline.
+            reranked, query["rerank"] = self.rerank(question, chunks, trace=trace)
+            return reranked
+
+        return {
+            "pdf": retrieve_pdf,
+            "web": lambda deadline: self.websearcher.search(question, num_results=3, trace=trace, deadline=deadline),
+        }, query
+
+    def _speculative_turn(self, question: str, session_id: str, trace: Optional[Trace] = None) -> Dict[str, Any]:
+        """
+        Speculative variant of _prepare_turn followed by _synthesize: once the PDF chunks are in, an answer is
+        drafted from them on a worker thread while the web search is still pending (up to its deadline).
+        The turn's "speculation" records the mode and the path taken:
+        - "merged": the web results came first (or there were no PDF chunks), so both were used as usual;
+        - "cached": the answer cache had an answer for the PDF chunks, so the web results were not awaited;
+        - "pdf_only": no web results by the deadline; the draft is the answer;
+        - "restarted": web results arrived, so the draft was cancelled and the answer synthesized from both;
+        - "corroborated": web results arrived and a web corroboration pass was appended to the draft;
+        - "draft_failed": the draft failed, so the answer was synthesized again from the PDF chunks and any web results.
+        The draft records its spans and counters with a "draft_" prefix, so a discarded draft is never counted
+        as part of the answer; a draft that becomes the answer is counted under both names.
+        """
+        legs, query = self._source_legs(question, trace)
+        start, futures = self._start_legs(legs)
+        sources: Dict[str, List[Dict[str, Any]]] = {}
+        timings: Dict[str, Dict[str, Any]] = {}
+        self._collect_leg("pdf", futures["pdf"], start, sources, timings)
+        history3 = self.memory.get_history(n=3, session_id=session_id)
+        embedding, rerank = query.get("embedding"), query.get("rerank")
+        standalone = is_standalone(question)
+
+        if futures["web"].done() or not sources["pdf"]:
+            self._collect_leg("web", futures["web"], start, sources, timings)
+            timings["total"] = {"seconds": round(time.perf_counter() - start, 4)}
+            turn = self._build_turn(
+                sources["pdf"], sources["web"], history3, embedding, timings, rerank, trace, standalone=standalone
+            )
+            self._synthesize(question, turn, trace)
+            return self._speculation(turn, "cached" if turn["cached"] else "merged", trace)
+
+        turn = self._build_turn(sources["pdf"], [], history3, embedding, timings, rerank, trace, standalone=standalone)
+        if turn["result"] is not None:
+            # Cached answers are keyed on the PDF chunks only: web results would not change the answer.
+            timings["web"] = {"status": "skipped", "seconds": round(time.perf_counter() - start, 4)}
+            timings["total"] = {"seconds": round(time.perf_counter() - start, 4)}
+            return self._speculation(turn, "cached", trace)
+
+        cancel = threading.Event()
+        draft_trace = trace.prefixed(DRAFT_PREFIX) if trace is not None else None
+        draft = self.executor.submit(self._draft, question, turn, cancel, draft_trace)
+        self._collect_leg("web", futures["web"], start, sources, timings)
+        web_chunks = sources["web"]
+        result = None
+        awaited = not web_chunks or self.speculative == "corroborate"
+        if awaited:
+            result = self._await_draft(draft)
+        else:
+            cancel.set()
+
+        if result is not None:
+            self._adopt_draft(trace)
+        if result is not None and not web_chunks:
+            turn["result"], path = result, "pdf_only"
+        elif result is not None:
+            turn["result"], path = self._corroborate(question, result, web_chunks, trace)
+        else:
+            # Restart mode, or the draft failed: synthesize from both sources from scratch.
+            turn["chunks"] = self._number_chunks(sources["pdf"], web_chunks)
+            self._synthesize(question, turn, trace)
+            path = "draft_failed" if awaited else "restarted"
+        timings["total"] = {"seconds": round(time.perf_counter() - start, 4)}
+        return self._speculation(turn, path, trace)
+
+    def _speculation(self, turn: Dict[str, Any], path: str, trace: Optional[Trace] = None) -> Dict[str, Any]:
+        turn["speculation"] = {"mode": self.speculative, "path": path}
+        if trace is not None:
+            trace.incr(f"speculation_{path}")
+        return turn
+
+    @staticmethod
+    def _adopt_draft(trace: Optional[Trace]) -> None:
+        """
+        Counts the counters of a finished draft that became the answer under their own names too.
+        """
+        if trace is None:
+            return
+        for name, value in trace.to_dict()["counters"].items():
+            if name.startswith(DRAFT_PREFIX):
+                trace.incr(name[len(DRAFT_PREFIX):], value)
+
+    def _draft(
+            self,
+            question: str,
+            turn: Dict[str, Any],
+            cancel: threading.Event,
+            trace: Optional[Trace] = None
+    ) -> Dict[str, Any]:
+        """
+        Synthesizes an answer from the turn's (PDF) chunks; stops early once cancel is set.
+        """
+        events = self.synthesizer.stream_synthesize(
+            question, turn["chunks"], history=turn["history"], trace=trace, cancel=cancel
+        )
+        for event in events:
+            if event["type"] == "done":
+                return {key: event[key] for key in ("answer", "sources", "reasoning", "packing", "error")}
+        raise RuntimeError("Synthesis ended without a result.")
+
+    def _await_draft(self, draft: Future) -> Optional[Dict[str, Any]]:
+        """
+        The draft's result, or None if it failed (a draft cut short by an LLM error is never used as an answer).
+        """
         try:
-            web_chunks = self.websearcher.search(question, num_results=3)
+            result = draft.result()
         except Exception as e:
-            self.logger.error(f"Failed to retrieve from web: {e}")
-            web_chunks = []
+            self.logger.error(f"Speculative draft failed: {e}")
+            return None
+        if result["error"]:
+            self.logger.error(f"Speculative draft failed: {result['error']}")
+            return None
+        return result
+
+    def _corroborate(
+            self,
+            question: str,
+            draft: Dict[str, Any],
+            web_chunks: List[Dict[str, Any]],
+            trace: Optional[Trace] = None
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        Appends a web corroboration pass to a draft answer. Returns the result and the speculation path
+        ("pdf_only" if the pass failed and the draft is kept as is).
+        """
+        corroboration = self.synthesizer.corroborate(
+            question, draft["answer"], self._number_chunks([], web_chunks), trace=trace
+        )
+        if corroboration["answer"].startswith(LLM_ERROR_PREFIX):
+            self.logger.warning(f"Web corroboration failed; keeping the PDF-only answer. {corroboration['answer']}")
+            return draft, "pdf_only"
+        sources = draft["sources"] + [source for source in corroboration["sources"] if source not in draft["sources"]]
+        return {
+            "answer": f"{draft['answer']}\n\n{CORROBORATION_HEADING} {corroboration['answer']}",
+            "sources": sources,
+            "reasoning": f"{draft['reasoning']} Checked against web results in a corroboration pass.",
+            "packing": draft["packing"],
+        }, "corroborated"
+
+    def rerank(
+            self,
+            question: str,
+            chunks: List[Dict[str, Any]],
+            trace: Optional[Trace] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Applies the reranking stage, if enabled, to chunks retrieved with top_k=self.pdf_top_k.
+        Returns the kept chunks and the rerank stats (None if reranking is off).
+        """
+        if self.reranker is None:
+            return chunks, None
+        reranked, stats = self.reranker.rerank(question, chunks, top_n=self.rerank_top_n, trace=trace)
+        stats.update(self._rerank_savings(chunks, reranked, trace))
+        return reranked, stats
+
+    def _build_turn(
+            self,
+            pdf_chunks: List[Dict[str, Any]],
+            web_chunks: List[Dict[str, Any]],
+            history: List[Dict[str, Any]],
+            embedding: Optional[List[float]],
+            timings: Dict[str, Dict[str, Any]],
+            rerank: Optional[Dict[str, Any]],
+            trace: Optional[Trace] = None,
+            lookup: bool = True,
+            standalone: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Numbers the retrieved chunks for citation and, if no LLM call is needed (cache hit or no context),
+        sets the result itself.
+        :param lookup: Look the answer up in the answer cache (False if the same PDF chunks already missed it).
+        :param standalone: The question does not depend on history (see is_standalone), so it is cacheable with one.
+        """
+        all_chunks = self._number_chunks(pdf_chunks, web_chunks)
+
+        # Only answers grounded in PDF chunks are cached: web results change too often to key on.
+        # Answers to follow-up questions depend on the session's history, so they are neither looked up nor cached.
+        # Retrieval only sees the question, so a standalone question gets the same chunks whatever the history.
+        chunk_ids = [chunk["id"] for chunk in pdf_chunks if chunk.get("id")]
+        turn = {
+            "chunks": all_chunks,
+            "history": history,
+            "timings": timings,
+            "embedding": embedding,
+            "chunk_ids": chunk_ids,
+            "rerank": rerank,
+            "cacheable": self.answer_cache is not None and embedding is not None and bool(chunk_ids) and (
+                standalone or not history
+            ),
+            "cached": False,
+            "result": None,
+            "speculation": None,
+        }
 
-        history3 = self.memory.get_history(n=3)
+        if not all_chunks or not all(isinstance(chunk, dict) and "text" in chunk for chunk in all_chunks):
+            self.logger.debug(f"No valid text chunks found in retrieval. Chunks: {all_chunks}")
+            turn["cacheable"] = False
+            turn["result"] = {
+                "answer": "Sorry, I couldn't find any relevant information in the documents or online.",
+                "sources": [],
+                "reasoning": "No retrievable context."
+            }
+        elif turn["cacheable"] and lookup:
+            start = time.perf_counter()
+            with maybe_span(trace, "answer_cache"):
+                cached = self.answer_cache.lookup(turn["embedding"], chunk_ids)
+            if trace is not None:
+                trace.incr("answer_cache_hits" if cached else "answer_cache_misses")
+            timings["answer_cache"] = {
+                "status": "hit" if cached else "miss",
+                "seconds": round(time.perf_counter() - start, 4)
+            }
+            if cached:
+                turn["cached"] = True
+                turn["result"] = {
+                    "answer": cached["answer"],
+                    "sources": cached["sources"],
+                    "reasoning": f"Cached answer (similarity {cached['similarity']:.3f})."
+                }
+        return turn
+
+    @staticmethod
+    def _number_chunks(pdf_chunks: List[Dict[str, Any]], web_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Copies of the chunks numbered for citation: PDF chunks as [1], [2], ..., web chunks as [W1], [W2], ...
+        """
         all_chunks = []
         for i, chunk in enumerate(pdf_chunks):
             chunk = dict(chunk)
@@ -95,31 +641,117 @@ class Crew:
             chunk["citation_type"] = "web"
             chunk["citation_num"] = i + 1
             all_chunks.append(chunk)
+        return all_chunks
 
-        if not all_chunks or not all(isinstance(chunk, dict) and "text" in chunk for chunk in all_chunks):
-            self.logger.debug(f"No valid text chunks found in retrieval. Chunks: {all_chunks}")
-            result = {
-                "answer": "Sorry, I couldn't find any relevant information in the documents or online.",
-                "sources": [],
-                "reasoning": "No retrievable context."
-            }
-        else:
-            try:
-                result = self.synthesizer.synthesize(question, all_chunks, history=history3)
-            except Exception as e:
-                self.logger.error(f"Synthesizer failed: {e}")
-                result = {
-                    "answer": "Sorry, an error occurred while generating the answer.",
-                    "sources": [],
-                    "reasoning": f"Error: {e}"
-                }
+    def _finish_turn(self, question: str, turn: Dict[str, Any], session_id: str) -> Dict[str, Any]:
+        """
+        Caches a freshly synthesized answer, records the turn in memory and builds the response.
+        If the LLM failed, memory records the error rather than a possibly partial answer.
+        """
+        self._cache_answer(turn)
+        result = turn["result"]
+        self.memory.add(question, result.get("error") or result["answer"], result["sources"], session_id=session_id)
+        return self._response(turn)
+
+    def _synthesize(self, question: str, turn: Dict[str, Any], trace: Optional[Trace] = None) -> None:
+        """
+        Calls the LLM unless the turn already has a result.
+        """
+        if turn["result"] is not None:
+            return
+        try:
+            turn["result"] = self.synthesizer.synthesize(
+                question, turn["chunks"], history=turn["history"], trace=trace
+            )
+        except Exception as e:
+            self.logger.error(f"Synthesizer failed: {e}")
+            turn["result"] = self._synthesis_error(e)
+            turn["cacheable"] = False
+
+    def _cache_answer(self, turn: Dict[str, Any]) -> None:
+        result = turn["result"]
+        if turn["cacheable"] and not turn["cached"] and not result.get("error"):
+            self.answer_cache.store(turn["embedding"], turn["chunk_ids"], result["answer"], result["sources"])
 
-        self.memory.add(question, result["answer"], result["sources"])
+    @staticmethod
+    def _response(turn: Dict[str, Any]) -> Dict[str, Any]:
+        result = turn["result"]
         return {
             "answer": result["answer"],
             "sources": result["sources"],
-            "memory": history3,
+            "memory": turn["history"],
+            "timings": turn["timings"],
+            "cached": turn["cached"],
+            "packing": result.get("packing"),
+            "rerank": turn["rerank"],
+            "speculation": turn["speculation"],
+            "error": result.get("error"),
         }
 
+    def _rerank_savings(
+            self,
+            candidates: List[Dict[str, Any]],
+            kept: List[Dict[str, Any]],
+            trace: Optional[Trace] = None
+    ) -> Dict[str, int]:
+        """
+        Prompt tokens of all rerank candidates versus the kept chunks.
+        """
+        count = self.synthesizer.packer.count
+        before = sum(count(chunk["text"]) for chunk in candidates)
+        after = sum(count(chunk["text"]) for chunk in kept)
+        if trace is not None:
+            trace.incr("rerank_tokens_saved", before - after)
+        return {"tokens_before": before, "tokens_after": after, "tokens_saved": before - after}
+
+    @staticmethod
+    def _synthesis_error(error: Exception) -> Dict[str, Any]:
+        return {
+            "answer": "Sorry, an error occurred while generating the answer.",
+            "sources": [],
+            "reasoning": f"Error: {error}"
+        }
 
+    @staticmethod
+    def _timed(fn: Callable[[float], List[Dict[str, Any]]], deadline: float) -> Tuple[List[Dict[str, Any]], float]:
+        start = time.perf_counter()
+        result = fn(deadline)
+        return result, time.perf_counter() - start
 
+    def _start_legs(self, legs: Dict[str, Callable[[float], List[Dict[str, Any]]]]) -> Tuple[float, Dict[str, Future]]:
+        """
+        Submits the legs, each with its deadline measured from now. Returns the start time and the legs' futures.
+        """
+        start = time.perf_counter()
+        return start, {
+            name: self.executor.submit(self._timed, fn, start + self.source_timeouts.get(name, 30.0))
+            for name, fn in legs.items()
+        }
+
+    def _collect_leg(
+            self,
+            name: str,
+            future: Future,
+            start: float,
+            results: Dict[str, List[Dict[str, Any]]],
+            timings: Dict[str, Dict[str, Any]]
+    ) -> None:
+        """
+        Waits for one leg until its deadline (measured from start) and records its chunks and timing.
+        A late leg is cancelled if it has not started yet, so it does not hold a worker; a running one is left to
+        finish, which the web leg does by its deadline.
+        """
+        remaining = self.source_timeouts.get(name, 30.0) - (time.perf_counter() - start)
+        try:
+            chunks, elapsed = future.result(timeout=max(remaining, 0.0))
+            results[name] = chunks
+            timings[name] = {"status": "ok", "seconds": round(elapsed, 4)}
+        except FutureTimeout:
+            future.cancel()
+            self.logger.warning(f"{name} leg missed its {self.source_timeouts.get(name)}s deadline; continuing without it.")
+            results[name] = []
+            timings[name] = {"status": "timeout", "seconds": round(time.perf_counter() - start, 4)}
+        except Exception as e:
+            self.logger.error(f"Failed to retrieve from {name}: {e}")
+            results[name] = []
+            timings[name] = {"status": "error", "seconds": round(time.perf_counter() - start, 4)}
@@ -0,0 +1,176 @@
+import os
+import time
+import hashlib
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Tuple, Optional
+from langchain_community.document_loaders import PyPDFLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+
+# (filename, path, file_hash) of a PDF to ingest.
+FileJob = Tuple[str, str, str]
+# (filename, file_hash, [(page, text), ...]) once parsed; pages is None if parsing failed.
+ParsedFile = Tuple[str, str, Optional[List[Tuple[Any, str]]]]
+# (chunk_id, text, metadata)
+Chunk = Tuple[str, str, Dict[str, Any]]
+# Parser processes start fresh rather than forking: ingestion runs inside the server and the crew, whose
+# threads (and the locks they hold) a forked child would inherit in whatever state they were in.
+PARSER_START_METHOD = "spawn"
+
+
+def chunk_id(filename: str, file_hash: str, index: int) -> str:
+    """
+    Chunk id derived from the file's content and name: re-indexing identical content upserts instead of
+    duplicating, while identical copies of a PDF under different names keep separate chunks.
+    """
+    name_hash = hashlib.sha1(filename.encode("utf-8")).hexdigest()[:8]
+    return f"{file_hash[:16]}-{name_hash}-{index}"
+
+
+def parse_pdf(path: str) -> List[Tuple[Any, str]]:
+    """
+    Extracts the text of every page of a PDF as (page, text) pairs.
+    Module-level so it can run in a worker process.
+    """
+    pages = []
+    for i, doc in enumerate(PyPDFLoader(path).lazy_load()):
+        page = doc.metadata.get("page", None)
+        pages.append((i if page is None else page, doc.page_content))
+    return pages
+
+
+class IngestionPipeline:
+    """
+    Streaming PDF ingestion: parse (process pool) -> chunk (generator) -> embed and store (bounded batches).
+
+    Only a bounded window of parsed files and one embedding batch are held in memory at any time,
+    so peak memory does not grow with the size of the corpus.
+    """
+
+    def __init__(
+            self,
+            vector_db,
+            chunk_size: int = 800,
+            chunk_overlap: int = 100,
+            workers: Optional[int] = None,
+            batch_size: int = 256,
+            max_in_flight: Optional[int] = None
+    ):
+        """
+        :param vector_db: Store exposing add_texts(texts, metadatas=..., ids=...) (an agents.vectorstore.VectorStore).
+        :param workers: Parser processes (default: CPU count). 0 parses in the calling process.
+        :param batch_size: Number of chunks embedded and written per batch.
+        :param max_in_flight: Maximum number of files being parsed or waiting to be chunked (default: 2 * workers).
+        """
+        self.vector_db = vector_db
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight or 2 * max(self.workers, 1)
+        self._reset_counters()
+
+    def run(self, files: List[FileJob]) -> Dict[str, int]:
+        """
+        Ingests the given files.
+        :return: Number of chunks written per successfully ingested filename. Files that failed to parse are absent.
+        """
+        self._reset_counters()
+        self._total_files = len(files)
+        self._start = time.perf_counter()
+        chunk_counts: Dict[str, int] = {}
+        self._embed_stage(self._chunk_stage(self._parse_stage(files), chunk_counts))
+        self._report(final=True)
+        return chunk_counts
+
+    def _reset_counters(self) -> None:
+        self._total_files = 0
+        self._files = 0
+        self._pages = 0
+        self._chunks = 0
+        self._start = time.perf_counter()
+
+    def _parse_stage(self, files: List[FileJob]) -> Iterator[ParsedFile]:
+        """
+        Parses PDFs in a process pool, keeping at most max_in_flight files submitted at once.
+        Results are yielded in submission order.
+        """
+        if self.workers == 0:
+            for filename, path, file_hash in files:
+                yield filename, file_hash, self._parse_or_none(path)
+            return
+
+        with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(PARSER_START_METHOD)
+        ) as pool:
+            pending = deque()
+            jobs = iter(files)
+            for filename, path, file_hash in jobs:
+                pending.append((filename, path, file_hash, pool.submit(parse_pdf, path)))
+                if len(pending) >= self.max_in_flight:
+                    break
+            while pending:
+                filename, path, file_hash, future = pending.popleft()
+                try:
+                    pages = future.result()
+                except Exception as e:
+                    print(f"Error loading {path}: {e}")
+                    pages = None
+                next_job = next(jobs, None)
+                if next_job is not None:
+                    pending.append((*next_job, pool.submit(parse_pdf, next_job[1])))
+                yield filename, file_hash, pages
+
+    @staticmethod
+    def _parse_or_none(path: str) -> Optional[List[Tuple[Any, str]]]:
+        try:
+            return parse_pdf(path)
+        except Exception as e:
+            print(f"Error loading {path}: {e}")
+            return None
+
+    def _chunk_stage(self, parsed: Iterable[ParsedFile], chunk_counts: Dict[str, int]) -> Iterator[Chunk]:
+        """
+        Splits each page into chunks, tagging them with filename and page.
+        Splitting page by page keeps each chunk's page number exact.
+        """
+        for filename, file_hash, pages in parsed:
+            self._files += 1
+            if pages is None:
+                continue
+            index = 0
+            for page, text in pages:
+                self._pages += 1
+                for piece in self.splitter.split_text(text):
+                    yield chunk_id(filename, file_hash, index), piece, {"filename": filename, "page": page}
+                    index += 1
+            chunk_counts[filename] = index
+
+    def _embed_stage(self, chunks: Iterable[Chunk]) -> None:
+        """
+        Embeds and writes chunks in batches of batch_size as they arrive.
+        """
+        batch: List[Chunk] = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch: List[Chunk]) -> None:
+        ids, texts, metadatas = zip(*batch)
+        self.vector_db.add_texts(list(texts), metadatas=list(metadatas), ids=list(ids))
+        self._chunks += len(batch)
+        self._report()
+
+    def _report(self, final: bool = False) -> None:
+        elapsed = max(time.perf_counter() - self._start, 1e-9)
+        prefix = "Ingestion complete" if final else "Ingesting"
+        print(
+            f"{prefix}: {self._files}/{self._total_files} files, {self._pages} pages, {self._chunks} chunks "
+            f"in {elapsed:.1f}s ({self._pages / elapsed:.1f} pages/s, {self._chunks / elapsed:.1f} chunks/s)"
+        )
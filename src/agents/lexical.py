@@ -0,0 +1,421 @@
+import os
+import re
+import json
+import shutil
+import logging
+from array import array
+from typing import List, Dict, Tuple, Iterable, Optional, Any, NamedTuple
+import numpy as np
+
+# Runs of Unicode letters and digits, so accented and non-Latin terms are indexed too.
+TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+# Very frequent function words: their postings are long and carry almost no BM25 weight.
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to was were which with".split()
+)
+# Bumped whenever the on-disk layout changes; indexes of another version are rebuilt.
+LEXICAL_INDEX_VERSION = 3
+# Term frequencies are stored as uint16.
+MAX_TF = np.iinfo(np.uint16).max
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased alphanumeric terms in any script, keeping identifiers such as "d2r" or "drd4" intact.
+    """
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+class _LexicalSegment:
+    """
+    One immutable, memory-mapped part of a BM25Index (see there), plus the set of its documents deleted since it was written.
+    """
+
+    def __init__(self, path: str, entry: Dict[str, Any]):
+        """
+        :param path: Segment directory.
+        :param entry: The segment's entry in meta.json (name and the file of deleted documents, if any).
+        """
+        self.path = path
+        self.name = entry["name"]
+        load = lambda name: np.load(os.path.join(path, name), mmap_mode="r")
+        self.doc_ids = load("doc_ids.npy")
+        self.doc_lengths = load("doc_lengths.npy")
+        self.terms = load("terms.npy")
+        self.term_offsets = load("term_offsets.npy")
+        self.postings_docs = load("postings_docs.npy")
+        self.postings_tfs = load("postings_tfs.npy")
+        self.deleted_file: Optional[str] = entry.get("deleted")
+        deleted = np.load(os.path.join(path, self.deleted_file)) if self.deleted_file else np.zeros(0, np.uint32)
+        self._set_deleted(deleted)
+        # Whether deleted changed since it was last written.
+        self.deleted_changed = False
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @property
+    def live(self) -> int:
+        return len(self) - len(self.deleted)
+
+    def _set_deleted(self, deleted: np.ndarray) -> None:
+        # Replaced, never mutated, so a concurrent search always sees a consistent array.
+        self.deleted = np.unique(deleted).astype(np.uint32)
+        self.live_length = int(self.doc_lengths.sum(dtype=np.int64) - self.doc_lengths[self.deleted].sum(dtype=np.int64))
+
+    def delete(self, doc_ids: np.ndarray) -> int:
+        """
+        Marks the live documents with one of the given (fixed-width bytes) ids as deleted; returns how many.
+        """
+        if not len(self) or not len(doc_ids):
+            return 0
+        docs = np.minimum(np.searchsorted(self.doc_ids, doc_ids), len(self) - 1)
+        docs = docs[self.doc_ids[docs] == doc_ids]
+        docs = docs[~np.isin(docs, self.deleted)]
+        if len(docs):
+            self._set_deleted(np.concatenate([self.deleted, docs.astype(np.uint32)]))
+            self.deleted_changed = True
+        return len(docs)
+
+    def postings(self, term: bytes) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Doc numbers and term frequencies of term (deleted documents included), or None if no document has it.
+        """
+        if len(term) > self.terms.dtype.itemsize:
+            return None
+        i = int(np.searchsorted(self.terms, term))
+        if i == len(self.terms) or self.terms[i] != term:
+            return None
+        start, end = int(self.term_offsets[i]), int(self.term_offsets[i + 1])
+        return self.postings_docs[start:end], self.postings_tfs[start:end]
+
+    def live_docs(self) -> np.ndarray:
+        docs = np.arange(len(self), dtype=np.int64)
+        return docs[~np.isin(docs, self.deleted)] if len(self.deleted) else docs
+
+    def entry(self) -> Dict[str, Any]:
+        return {"name": self.name, "docs": len(self), "deleted": self.deleted_file}
+
+
+class _IndexState(NamedTuple):
+    segments: List[_LexicalSegment]
+    num_docs: int
+    total_length: int
+
+
+class BM25Index:
+    """
+    Compact on-disk BM25 index over chunk texts, updated incrementally.
+
+    Like NumpyStore, the index is a list of immutable segments: an update writes the new documents as a new segment
+    and marks replaced or removed ones as deleted in the older segments, and small or mostly deleted segments are
+    merged once there are more than max_segments. Every array is memory-mapped, so opening the index reads no
+    postings, vocabulary or ids into Python objects, and a query only touches the postings of its own terms.
+    Layout of a segment directory:
+    - doc_ids.npy: chunk ids as sorted fixed-width bytes (document numbers follow that order, so ids are found
+      by binary search) and doc_lengths.npy (uint32);
+    - terms.npy: sorted fixed-width vocabulary, looked up by binary search, and term_offsets.npy (int64), the
+      start of every term's postings (its document frequency is the distance to the next offset);
+    - postings_docs.npy (uint32) and postings_tfs.npy (uint16), 6 bytes per posting in total;
+    - deleted-GEN.npy: document numbers deleted since the segment was written.
+    meta.json lists the segments and is replaced atomically by every update.
+
+    Term weights use the corpus-wide document count and average length at query time. Document frequencies
+    still count deleted documents until their segment is merged, which slightly lowers the idf of their terms.
+    """
+
+    def __init__(self, directory: str, k1: float = 1.2, b: float = 0.75, segment_docs: int = 50000, max_segments: int = 8):
+        """
+        Opens the index in directory, or an empty one if there is none (written by the first update).
+        :param k1: BM25 term-frequency saturation; for an existing index, the value it was built with is kept.
+        :param b: BM25 length normalization; likewise kept from an existing index.
+        :param segment_docs: Documents written per segment by an update (bounds the memory used to build one).
+        :param max_segments: Segments kept before the smallest ones are merged.
+        """
+        self.logger = logging.getLogger("BM25Index")
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.segment_docs = segment_docs
+        self.max_segments = max_segments
+        self._next_segment = 0
+        self._generation = 0
+        segments: List[_LexicalSegment] = []
+        if self.exists(directory):
+            meta = self._read_meta(directory)
+            self.k1, self.b = meta["k1"], meta["b"]
+            self._next_segment = meta["next_segment"]
+            self._generation = meta["generation"]
+            segments = [_LexicalSegment(os.path.join(directory, entry["name"]), entry) for entry in meta["segments"]]
+        self._state = self._make_state(segments)
+
+    @property
+    def num_docs(self) -> int:
+        return self._state.num_docs
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        """
+        Whether directory holds an index in the current layout.
+        """
+        meta = BM25Index._read_meta(directory)
+        return meta is not None and meta.get("version") == LEXICAL_INDEX_VERSION
+
+    @classmethod
+    def build(cls, directory: str, documents: Iterable[Tuple[str, str]], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        """
+        Builds the index from (chunk_id, text) pairs, replacing any index in directory.
+        """
+        shutil.rmtree(directory, ignore_errors=True)
+        index = cls(directory, k1=k1, b=b)
+        index.update(documents)
+        return index
+
+    def update(self, documents: Iterable[Tuple[str, str]], deleted_ids: Iterable[str] = ()) -> None:
+        """
+        Adds (chunk_id, text) pairs, replacing indexed documents with the same id, and deletes deleted_ids.
+        Only the given documents are tokenized; the rest of the index is left as written, apart from merges.
+        Searches are not blocked meanwhile; they switch to the new segments once the update is committed.
+        """
+        segments = list(self._state.segments)
+        batch: List[Tuple[str, str]] = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) == self.segment_docs:
+                self._add_segment(segments, batch)
+                batch = []
+        if batch:
+            self._add_segment(segments, batch)
+        new = {segment.name for segment in segments[len(self._state.segments):]}
+        deleted = np.unique(np.array([cid.encode("utf-8") for cid in deleted_ids], dtype=bytes))
+        if len(deleted):
+            # Ids deleted and re-added in the same update stay in the new segments.
+            for segment in segments:
+                if segment.name not in new:
+                    segment.delete(deleted)
+        segments = self._compact(segments)
+        self._commit(segments)
+        self._state = self._make_state(segments)
+
+    def _add_segment(self, segments: List[_LexicalSegment], documents: List[Tuple[str, str]]) -> None:
+        """
+        Writes documents as a new segment appended to segments, after deleting the same ids from the segments
+        already there.
+        """
+        segment = self._write_documents(documents)
+        for other in segments:
+            other.delete(segment.doc_ids)
+        segments.append(segment)
+
+    def _write_documents(self, documents: List[Tuple[str, str]]) -> _LexicalSegment:
+        # Later duplicates of an id replace earlier ones.
+        documents = list(dict(documents).items())
+        doc_lengths = array("I")
+        term_numbers: Dict[str, int] = {}
+        posting_terms, posting_docs, posting_tfs = array("I"), array("I"), array("I")
+        for doc, (_, text) in enumerate(documents):
+            terms = tokenize(text)
+            doc_lengths.append(len(terms))
+            counts: Dict[str, int] = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                posting_terms.append(term_numbers.setdefault(term, len(term_numbers)))
+                posting_docs.append(doc)
+                posting_tfs.append(tf)
+        # Terms are stored as UTF-8: the width is that of the longest encoding.
+        terms = [term.encode("utf-8") for term in term_numbers]
+        return self._write_segment(
+            np.array([cid.encode("utf-8") for cid, _ in documents]),
+            np.frombuffer(doc_lengths, dtype=np.uint32),
+            np.array(terms, dtype=f"S{max((len(term) for term in terms), default=1)}"),
+            np.frombuffer(posting_terms, dtype=np.uint32),
+            np.frombuffer(posting_docs, dtype=np.uint32),
+            np.frombuffer(posting_tfs, dtype=np.uint32)
+        )
+
+    def _compact(self, segments: List[_LexicalSegment]) -> List[_LexicalSegment]:
+        """
+        Drops fully deleted segments, rewrites segments with at least half of their documents deleted and merges
+        the smallest segments while there are more than max_segments.
+        """
+        segments = [segment for segment in segments if segment.live]
+        merge = [segment for segment in segments if len(segment.deleted) * 2 >= len(segment)]
+        rest = sorted((segment for segment in segments if segment not in merge), key=lambda segment: segment.live)
+        while rest and len(rest) + (1 if merge else 0) > self.max_segments:
+            merge.append(rest.pop(0))
+        if not merge:
+            return segments
+        doc_ids, doc_lengths = [], []
+        posting_terms, posting_docs, posting_tfs = [], [], []
+        terms = np.unique(np.concatenate([segment.terms for segment in merge]))
+        base = 0
+        for segment in merge:
+            live = segment.live_docs()
+            renumber = np.full(len(segment), -1, dtype=np.int64)
+            renumber[live] = base + np.arange(len(live))
+            base += len(live)
+            doc_ids.append(segment.doc_ids[live])
+            doc_lengths.append(segment.doc_lengths[live])
+            term_numbers = np.searchsorted(terms, segment.terms)
+            docs = renumber[segment.postings_docs]
+            kept = docs >= 0
+            posting_terms.append(np.repeat(term_numbers, np.diff(segment.term_offsets))[kept])
+            posting_docs.append(docs[kept])
+            posting_tfs.append(segment.postings_tfs[kept])
+        rest.append(self._write_segment(
+            np.concatenate(doc_ids), np.concatenate(doc_lengths), terms,
+            np.concatenate(posting_terms), np.concatenate(posting_docs), np.concatenate(posting_tfs)
+        ))
+        self.logger.info(f"Merged {len(merge)} lexical index segments into one of {base} documents.")
+        return rest
+
+    def _write_segment(
+            self,
+            doc_ids: np.ndarray,
+            doc_lengths: np.ndarray,
+            terms: np.ndarray,
+            posting_terms: np.ndarray,
+            posting_docs: np.ndarray,
+            posting_tfs: np.ndarray
+    ) -> _LexicalSegment:
+        """
+        Writes a segment from unordered postings given as (term number, doc number, tf) triples: documents are
+        renumbered in id order, terms sorted (terms without postings are dropped) and postings grouped by term.
+        """
+        doc_order = np.argsort(doc_ids, kind="stable")
+        doc_rank = np.empty(len(doc_ids), dtype=np.uint32)
+        doc_rank[doc_order] = np.arange(len(doc_ids), dtype=np.uint32)
+        df = np.bincount(posting_terms, minlength=len(terms))
+        used = np.flatnonzero(df)
+        term_order = used[np.argsort(terms[used], kind="stable")]
+        term_rank = np.empty(len(terms), dtype=np.int64)
+        term_rank[term_order] = np.arange(len(term_order))
+        posting_terms = term_rank[posting_terms]
+        posting_docs = doc_rank[posting_docs]
+        order = np.lexsort((posting_docs, posting_terms))
+
+        name = f"seg-{self._next_segment:06d}"
+        self._next_segment += 1
+        path = os.path.join(self.directory, name)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        np.save(os.path.join(path, "doc_ids.npy"), doc_ids[doc_order])
+        np.save(os.path.join(path, "doc_lengths.npy"), doc_lengths[doc_order].astype(np.uint32))
+        np.save(os.path.join(path, "terms.npy"), terms[term_order])
+        np.save(os.path.join(path, "term_offsets.npy"), np.concatenate([[0], np.cumsum(df[term_order])]).astype(np.int64))
+        np.save(os.path.join(path, "postings_docs.npy"), posting_docs[order])
+        np.save(os.path.join(path, "postings_tfs.npy"), np.minimum(posting_tfs[order], MAX_TF).astype(np.uint16))
+        return _LexicalSegment(path, {"name": name})
+
+    def _commit(self, segments: List[_LexicalSegment]) -> None:
+        """
+        Writes the deleted documents that changed and atomically replaces meta.json, then removes unlisted files.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._generation += 1
+        for segment in segments:
+            if segment.deleted_changed:
+                segment.deleted_file = f"deleted-{self._generation:06d}.npy"
+                np.save(os.path.join(segment.path, segment.deleted_file), segment.deleted)
+                segment.deleted_changed = False
+        meta_path = os.path.join(self.directory, "meta.json")
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "version": LEXICAL_INDEX_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "next_segment": self._next_segment,
+                "generation": self._generation,
+                "segments": [segment.entry() for segment in segments],
+            }, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+        listed = {segment.name: segment for segment in segments}
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name == "meta.json":
+                continue
+            if name not in listed:
+                # Memory-mapped files of dropped segments stay readable by searches still holding them.
+                shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+                continue
+            for file_name in os.listdir(path):
+                if file_name.startswith("deleted-") and file_name != listed[name].deleted_file:
+                    os.remove(os.path.join(path, file_name))
+
+    @staticmethod
+    def _make_state(segments: List[_LexicalSegment]) -> _IndexState:
+        return _IndexState(
+            segments,
+            sum(segment.live for segment in segments),
+            sum(segment.live_length for segment in segments)
+        )
+
+    @staticmethod
+    def _read_meta(directory: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(directory, "meta.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Returns up to k (chunk_id, score) pairs, best first. Only documents containing a query term are scored.
+        """
+        state = self._state
+        terms = sorted({term.encode("utf-8") for term in tokenize(query)})
+        if not terms or not state.num_docs:
+            return []
+        # (segment, term number, doc numbers, term frequencies) of every postings list found.
+        found = []
+        df = np.zeros(len(terms), dtype=np.float64)
+        for segment in state.segments:
+            for t, term in enumerate(terms):
+                postings = segment.postings(term)
+                if postings is not None:
+                    found.append((segment, t) + postings)
+                    df[t] += len(postings[0])
+        if not found:
+            return []
+        df = np.minimum(df, state.num_docs)
+        idf = np.log(1 + (state.num_docs - df + 0.5) / (df + 0.5))
+        avgdl = state.total_length / state.num_docs
+
+        scores, ids = [], []
+        for segment in state.segments:
+            lists = [(t, docs, tfs) for s, t, docs, tfs in found if s is segment]
+            if not lists:
+                continue
+            docs = np.concatenate([docs for _, docs, _ in lists])
+            tfs = np.concatenate([tfs for _, _, tfs in lists]).astype(np.float32)
+            term_idf = np.repeat(idf[[t for t, _, _ in lists]], [len(d) for _, d, _ in lists]).astype(np.float32)
+            if len(segment.deleted):
+                live = ~np.isin(docs, segment.deleted)
+                docs, tfs, term_idf = docs[live], tfs[live], term_idf[live]
+            if not len(docs):
+                continue
+            norm = self.k1 * (1 - self.b + self.b * segment.doc_lengths[docs].astype(np.float32) / avgdl) if avgdl else self.k1
+            candidates, inverse = np.unique(docs, return_inverse=True)
+            doc_scores = np.bincount(inverse, weights=term_idf * tfs * (self.k1 + 1) / (tfs + norm))
+            top = np.argpartition(-doc_scores, k - 1)[:k] if len(doc_scores) > k else slice(None)
+            scores.append(doc_scores[top])
+            ids.append(segment.doc_ids[candidates[top]])
+        if not scores:
+            return []
+        scores, ids = np.concatenate(scores), np.concatenate(ids)
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [(ids[i].decode("utf-8"), float(scores[i])) for i in top if scores[i] > 0]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60, limit: Optional[int] = None) -> List[str]:
+    """
+    Fuses several ranked id lists: each id scores sum(1 / (k + rank)) over the lists it appears in.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    fused = sorted(scores, key=scores.get, reverse=True)
+    return fused[:limit] if limit is not None else fused
@@ -1,81 +1,172 @@
+import os
+import json
+import sqlite3
 import logging
+import threading
 from typing import List, Dict, Any, Optional
 
+DEFAULT_SESSION = "default"
+
+
 class MemoryKeeper:
     """
-    Stores the conversational memory (Q&A pairs with sources).
-    Suitable for single-session/single-user applications.
+    Stores the conversational memory (Q&A pairs with sources), keyed by session id.
+    Backed by SQLite (WAL mode for on-disk stores) and safe to use from concurrent threads.
     """
 
-    def __init__(self, max_length: Optional[int] = None):
+    def __init__(self, max_length: Optional[int] = None, db_path: str = ":memory:"):
         """
-        :param max_length: If set, only keep the latest max_length entries (FIFO).
+        :param max_length: If set, only keep the latest max_length entries per session (FIFO).
+        :param db_path: SQLite file holding the history. The default keeps it in memory for the life of the process.
         """
-        self.history: List[Dict[str, Any]] = []
         self.max_length = max_length
+        self.db_path = db_path
         self.logger = logging.getLogger("MemoryKeeper")
+        # One connection shared by all threads; the lock serializes access to it.
+        self._lock = threading.RLock()
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " session_id TEXT NOT NULL,"
+                " question TEXT NOT NULL,"
+                " answer TEXT NOT NULL,"
+                " sources TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS history_session ON history (session_id, seq)")
+
+    @staticmethod
+    def _entry(row) -> Dict[str, Any]:
+        question, answer, sources = row
+        return {"question": question, "answer": answer, "sources": json.loads(sources)}
 
-    def add(self, question: str, answer: str, sources: Optional[Any] = None) -> None:
+    def add(self, question: str, answer: str, sources: Optional[Any] = None, session_id: str = DEFAULT_SESSION) -> None:
         """
         Store an entry containing question, answer and sources.
         """
-        entry = {
-            "question": question,
-            "answer": answer,
-            "sources": sources
-        }
-        self.history.append(entry)
-        if self.max_length is not None and len(self.history) > self.max_length:
-            # Remove oldest entry (FIFO)
-            removed = self.history.pop(0)
-            self.logger.debug(f"Max history exceeded; removing oldest entry: {removed}")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO history (session_id, question, answer, sources) VALUES (?, ?, ?, ?)",
+                (session_id, question, answer, json.dumps(sources))
+            )
+            if self.max_length is not None:
+                # Remove oldest entries (FIFO)
+                removed = self._conn.execute(
+                    "DELETE FROM history WHERE session_id = ? AND seq <= ("
+                    " SELECT seq FROM history WHERE session_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                    (session_id, session_id, self.max_length)
+                ).rowcount
+                if removed:
+                    self.logger.debug(f"Max history exceeded; removed {removed} oldest entries of session {session_id}.")
+            total = self.count(session_id)
 
-        self.logger.info(f"Added memory entry. Total entries: {len(self.history)}")
+        self.logger.info(f"Added memory entry. Total entries: {total}")
 
-    def get_history(self, n: int = None) -> List[Dict[str, Any]]:
+    def count(self, session_id: str = DEFAULT_SESSION) -> int:
         """
-        Return the last n entries (or all if n is None).
-        Returns a copy to prevent outside mutation.
+        Number of entries of a session.
         """
-        if n is None:
-            return list(self.history)
-        else:
-            return list(self.history[-n:])
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM history WHERE session_id = ?", (session_id,)).fetchone()[0]
 
-    def get_last_question(self) -> Optional[str]:
+    def get_entry(self, index: int, session_id: str = DEFAULT_SESSION) -> Optional[Dict[str, Any]]:
+        """
+        Returns entry number index, oldest first (negative indices count from the newest, as in a list),
+        or None if out of range. Only that row is read, through the (session_id, seq) index.
+        """
+        order, offset = ("ASC", index) if index >= 0 else ("DESC", -index - 1)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT question, answer, sources FROM history WHERE session_id = ? ORDER BY seq {order} LIMIT 1 OFFSET ?",
+                (session_id, offset)
+            ).fetchone()
+        return self._entry(row) if row is not None else None
+
+    def get_questions(self, limit: Optional[int] = None, session_id: str = DEFAULT_SESSION) -> List[str]:
+        """
+        Returns the questions of the first limit entries (or all if limit is None), oldest first,
+        without reading answers or sources.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question FROM history WHERE session_id = ? ORDER BY seq LIMIT ?",
+                (session_id, -1 if limit is None else max(limit, 0))
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_history(self, n: int = None, session_id: str = DEFAULT_SESSION) -> List[Dict[str, Any]]:
+        """
+        Return the last n entries (or all if n is None), oldest first.
+        Only the requested rows are read; the returned dicts are fresh copies.
+        """
+        with self._lock:
+            if n is None:
+                rows = self._conn.execute(
+                    "SELECT question, answer, sources FROM history WHERE session_id = ? ORDER BY seq",
+                    (session_id,)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT question, answer, sources FROM history WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+                    (session_id, max(n, 0))
+                ).fetchall()
+                rows.reverse()
+        return [self._entry(row) for row in rows]
+
+    def get_last_question(self, session_id: str = DEFAULT_SESSION) -> Optional[str]:
         """
         Returns the most recent question, or None if memory is empty.
         """
-        if self.history:
-            return self.history[-1]["question"]
+        history = self.get_history(n=1, session_id=session_id)
+        if history:
+            return history[-1]["question"]
         return None
 
-    def get_last_answer(self) -> Optional[str]:
+    def get_last_answer(self, session_id: str = DEFAULT_SESSION) -> Optional[str]:
         """
         Returns the most recent answer, or None if memory is empty.
         """
-        if self.history:
-            return self.history[-1]["answer"]
+        history = self.get_history(n=1, session_id=session_id)
+        if history:
+            return history[-1]["answer"]
         return None
 
-    def clear(self) -> None:
+    def clear(self, session_id: str = DEFAULT_SESSION) -> None:
         """
-        Clears all memory entries.
+        Clears all memory entries of a session.
         """
-        self.logger.info(f"Memory cleared. {len(self.history)} entries removed.")
-        self.history = []
+        with self._lock, self._conn:
+            removed = self._conn.execute("DELETE FROM history WHERE session_id = ?", (session_id,)).rowcount
+        self.logger.info(f"Memory cleared. {removed} entries removed.")
 
-    def export_memory(self) -> List[Dict[str, Any]]:
+    def export_memory(self, session_id: str = DEFAULT_SESSION) -> List[Dict[str, Any]]:
         """
-        Returns the entire conversation history as a list of dicts (deep copy).
+        Returns the entire conversation history of a session as a list of dicts (deep copy).
         """
-        import copy
-        return copy.deepcopy(self.history)
+        return self.get_history(session_id=session_id)
+
+    def import_memory(self, history: List[Dict[str, Any]], session_id: str = DEFAULT_SESSION) -> None:
+        """
+        Loads memory from a provided history list (overwrites existing memory of the session).
+        """
+        if self.max_length is not None:
+            history = history[-self.max_length:] if self.max_length else []
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM history WHERE session_id = ?", (session_id,))
+            self._conn.executemany(
+                "INSERT INTO history (session_id, question, answer, sources) VALUES (?, ?, ?, ?)",
+                [(session_id, e["question"], e["answer"], json.dumps(e.get("sources"))) for e in history]
+            )
+        self.logger.info(f"Memory imported with {len(history)} entries.")
 
-    def import_memory(self, history: List[Dict[str, Any]]) -> None:
+    def sessions(self) -> List[str]:
         """
-        Loads memory from a provided history list (overwrites existing memory).
+        Returns the ids of all sessions with stored history.
         """
-        import copy
-        self.history = copy.deepcopy(history)
-        self.logger.info(f"Memory imported with {len(self.history)} entries.")
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT session_id FROM history")]
@@ -0,0 +1,84 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import List, Any, Callable, Dict
+
+
+class MicroBatcher:
+    """
+    Coalesces single-item calls from concurrent threads into batched calls of fn.
+
+    A background thread takes every item queued while the previous batch was being computed (up to max_batch),
+    so a lone caller is served at once and batches only form under load. With max_wait > 0, the thread also
+    waits that long for more items before computing a batch, trading latency for larger batches.
+    """
+
+    def __init__(
+            self,
+            fn: Callable[[List[Any]], List[Any]],
+            max_batch: int = 32,
+            max_wait: float = 0.0,
+            name: str = "micro-batcher"
+    ):
+        """
+        :param fn: Computes the results of a list of items, in order.
+        :param max_batch: Maximum items per call of fn.
+        :param max_wait: Seconds to wait for more items after the first of a batch arrives.
+        """
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1.")
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self.logger = logging.getLogger("MicroBatcher")
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Any:
+        """
+        Result of fn for item, computed in a batch with other concurrent items. Blocks until it is ready;
+        an exception raised by fn is raised in every caller of the batch.
+        """
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
+
+    def _collect(self) -> List[Any]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            try:
+                results = self.fn([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} items.")
+            except Exception as e:
+                self.logger.error(f"Batch of {len(batch)} failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,176 @@
+import re
+import logging
+from typing import List, Dict, Any, Tuple
+
+# Shortest shared prefix/suffix treated as splitter overlap between two chunks.
+MIN_OVERLAP_CHARS = 20
+# Longest overlap searched for (the splitter uses chunk_overlap=100; boundaries may shift it a little).
+MAX_OVERLAP_CHARS = 200
+WORD_RE = re.compile(r"\w+")
+
+
+class ContextPacker:
+    """
+    Fits retrieved chunks and conversation history into a token budget before the prompt is built.
+
+    - Overlap shared with an already kept chunk (splitter overlap) is trimmed, and near-duplicate chunks are dropped.
+    - Chunks are admitted by rank, alternating PDF and web sources, until the context budget is used.
+    - The most recent history turns are kept in full; older answers are trimmed and the oldest turns dropped
+      to fit the history budget.
+    - Kept chunks are renumbered so [N]/[WN] citations stay consecutive.
+    """
+
+    def __init__(
+            self,
+            model: str = "gpt-3.5-turbo",
+            max_context_tokens: int = 1800,
+            max_history_tokens: int = 600,
+            recent_full_turns: int = 1,
+            older_answer_tokens: int = 80,
+            duplicate_threshold: float = 0.8
+    ):
+        """
+        :param model: Model whose tokenizer is used to count tokens.
+        :param max_context_tokens: Budget for the text of retrieved chunks.
+        :param max_history_tokens: Budget for the conversation history.
+        :param recent_full_turns: Number of most recent turns whose answers are never trimmed.
+        :param older_answer_tokens: Answers of older turns are trimmed to this many tokens.
+        :param duplicate_threshold: Chunks sharing at least this fraction of their word trigrams with a kept chunk are dropped.
+        """
+        self.max_context_tokens = max_context_tokens
+        self.max_history_tokens = max_history_tokens
+        self.recent_full_turns = recent_full_turns
+        self.older_answer_tokens = older_answer_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.logger = logging.getLogger("ContextPacker")
+        try:
+            import tiktoken
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # Without a tokenizer, fall back to the usual ~4 characters per token estimate.
+            self.logger.warning(f"Tokenizer unavailable, estimating token counts: {e}")
+            self.encoding = None
+
+    def count(self, text: str) -> int:
+        """
+        Number of tokens in text.
+        """
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Cuts text to at most max_tokens tokens, marking the cut with an ellipsis.
+        """
+        if self.encoding is None:
+            return text if len(text) <= 4 * max_tokens else text[:4 * max_tokens].rstrip() + "..."
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return self.encoding.decode(tokens[:max_tokens]).rstrip() + "..."
+
+    @staticmethod
+    def _shingles(text: str) -> set:
+        words = WORD_RE.findall(text.lower())
+        return {tuple(words[i:i + 3]) for i in range(max(len(words) - 2, 1))}
+
+    @staticmethod
+    def _trim_overlap(text: str, kept: List[str]) -> str:
+        """
+        Removes a prefix or suffix of text that repeats the end or start of a kept chunk.
+        """
+        for other in kept:
+            limit = min(len(text), len(other), MAX_OVERLAP_CHARS)
+            for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+                if other.endswith(text[:size]):
+                    text = text[size:].lstrip()
+                    break
+                if other.startswith(text[-size:]):
+                    text = text[:-size].rstrip()
+                    break
+        return text
+
+    def _pack_chunks(self, chunks: List[Dict[str, Any]], stats: Dict[str, int]) -> List[Dict[str, Any]]:
+        pdf = [c for c in chunks if c.get("citation_type", "pdf") == "pdf"]
+        web = [c for c in chunks if c.get("citation_type", "pdf") != "pdf"]
+        # Admit by rank, alternating sources, so a budget cut does not starve one of them.
+        by_rank = [c for pair in zip(pdf, web) for c in pair] + pdf[len(web):] + web[len(pdf):]
+
+        kept_texts: List[str] = []
+        kept_shingles: List[set] = []
+        packed: Dict[int, Dict[str, Any]] = {}
+        used = 0
+        for chunk in by_rank:
+            stats["tokens_before"] += self.count(chunk["text"])
+            text = self._trim_overlap(chunk["text"], kept_texts)
+            shingles = self._shingles(text)
+            if not text or any(
+                    len(shingles & other) >= self.duplicate_threshold * min(len(shingles), len(other))
+                    for other in kept_shingles
+            ):
+                stats["duplicates_dropped"] += 1
+                continue
+            tokens = self.count(text)
+            if used + tokens > self.max_context_tokens:
+                stats["chunks_dropped"] += 1
+                continue
+            used += tokens
+            kept_texts.append(text)
+            kept_shingles.append(shingles)
+            packed[id(chunk)] = dict(chunk, text=text)
+        stats["tokens_after"] += used
+
+        # Renumber in the original order so citations stay [1..n] and [W1..Wm].
+        result = []
+        counters = {}
+        for chunk in chunks:
+            if id(chunk) not in packed:
+                continue
+            chunk = packed[id(chunk)]
+            ctype = chunk.get("citation_type", "pdf")
+            counters[ctype] = counters.get(ctype, 0) + 1
+            chunk["citation_num"] = counters[ctype]
+            result.append(chunk)
+        return result
+
+    def _pack_history(self, history: List[Dict[str, Any]], stats: Dict[str, int]) -> List[Dict[str, Any]]:
+        turns = []
+        for i, entry in enumerate(history):
+            answer = entry["answer"]
+            stats["tokens_before"] += self.count(entry["question"]) + self.count(answer)
+            if i < len(history) - self.recent_full_turns:
+                answer = self.truncate(answer, self.older_answer_tokens)
+            turns.append(dict(entry, answer=answer))
+
+        sizes = [self.count(t["question"]) + self.count(t["answer"]) for t in turns]
+        while sum(sizes) > self.max_history_tokens and len(turns) > self.recent_full_turns:
+            turns.pop(0)
+            sizes.pop(0)
+            stats["history_turns_dropped"] += 1
+        stats["tokens_after"] += sum(sizes)
+        return turns
+
+    def pack(
+            self,
+            chunks: List[Dict[str, Any]],
+            history: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, int]]:
+        """
+        Returns the packed chunks and history (copies; inputs are left untouched) and packing stats:
+        tokens_before, tokens_after, tokens_saved, duplicates_dropped, chunks_dropped, history_turns_dropped.
+        """
+        stats = {
+            "tokens_before": 0,
+            "tokens_after": 0,
+            "duplicates_dropped": 0,
+            "chunks_dropped": 0,
+            "history_turns_dropped": 0,
+        }
+        packed_chunks = self._pack_chunks(chunks, stats)
+        packed_history = self._pack_history(history or [], stats)
+        stats["tokens_saved"] = stats["tokens_before"] - stats["tokens_after"]
+        return packed_chunks, packed_history, stats
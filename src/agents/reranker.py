@@ -0,0 +1,100 @@
+import time
+import logging
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+from agents.telemetry import Trace, maybe_span
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L6-v2"
+# int8 dynamically quantized ONNX export published alongside the model on the HuggingFace hub.
+QUANTIZED_ONNX_FILE = "onnx/model_qint8_avx512.onnx"
+RERANK_BACKENDS = ("torch", "onnx")
+
+
+class CrossEncoderReranker:
+    """
+    Rescores retrieved chunks against the question with a small local cross-encoder and keeps the best few.
+    Inference runs on CPU in batches of (question, chunk) pairs; the model can be loaded as ONNX and/or int8-quantized.
+    """
+
+    def __init__(
+            self,
+            model_name: str = DEFAULT_RERANK_MODEL,
+            backend: str = "torch",
+            quantize: bool = False,
+            batch_size: int = 32,
+            max_length: int = 256
+    ):
+        """
+        :param model_name: HuggingFace cross-encoder model.
+        :param backend: "torch" or "onnx" (ONNX Runtime; needs sentence-transformers[onnx]).
+        :param quantize: Use int8 weights: the quantized ONNX export with backend="onnx",
+            dynamic quantization of the linear layers with backend="torch".
+        :param batch_size: (question, chunk) pairs scored per forward pass.
+        :param max_length: Pairs are truncated to this many tokens.
+        """
+        if backend not in RERANK_BACKENDS:
+            raise ValueError(f"backend must be one of {RERANK_BACKENDS}.")
+        self.model_name = model_name
+        self.backend = backend
+        self.quantize = quantize
+        self.batch_size = batch_size
+        self.logger = logging.getLogger("CrossEncoderReranker")
+
+        model_kwargs = {"file_name": QUANTIZED_ONNX_FILE} if backend == "onnx" and quantize else None
+        try:
+            from sentence_transformers import CrossEncoder
+            self.model = CrossEncoder(
+                model_name,
+                max_length=max_length,
+                device="cpu",
+                backend=backend,
+                model_kwargs=model_kwargs
+            )
+        except Exception as e:
+            raise RuntimeError(f"Failed to load cross-encoder {model_name} ({backend}): {e}")
+        if backend == "torch" and quantize:
+            import torch
+            self.model.model = torch.quantization.quantize_dynamic(self.model.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.logger.info(f"Loaded reranker {model_name} (backend={backend}, quantized={quantize}).")
+
+    def score(self, question: str, texts: List[str]) -> np.ndarray:
+        """
+        Relevance score of every text for the question (higher is better).
+        """
+        if not texts:
+            return np.zeros(0, dtype=np.float32)
+        return np.asarray(
+            self.model.predict(
+                [(question, text) for text in texts],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True
+            ),
+            dtype=np.float32
+        ).reshape(len(texts))
+
+    def rerank(
+            self,
+            question: str,
+            chunks: List[Dict[str, Any]],
+            top_n: int = 4,
+            trace: Optional[Trace] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Returns the top_n chunks by cross-encoder score (copies, each with a "rerank_score") and stats:
+        candidates, kept and seconds.
+        """
+        start = time.perf_counter()
+        with maybe_span(trace, "rerank"):
+            scores = self.score(question, [chunk["text"] for chunk in chunks])
+            # Stable, so equal scores keep their retrieval order.
+            order = np.argsort(-scores, kind="stable")[:top_n]
+        reranked = [dict(chunks[i], rerank_score=round(float(scores[i]), 4)) for i in order]
+        stats = {
+            "candidates": len(chunks),
+            "kept": len(reranked),
+            "seconds": round(time.perf_counter() - start, 4),
+        }
+        if trace is not None:
+            trace.incr("rerank_candidates", len(chunks))
+        return reranked, stats
@@ -1,10 +1,38 @@
 import os
 import glob
-from typing import List, Dict, Optional
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+import json
+import shutil
+import hashlib
+import logging
+import threading
+import numpy as np
+from typing import List, Dict, Optional, Any, TYPE_CHECKING
+from agents.cache import LRUCache
+from agents.telemetry import Trace, maybe_span
+from agents.lexical import BM25Index, reciprocal_rank_fusion
+from agents.microbatch import MicroBatcher
+from agents.reranker import QUANTIZED_ONNX_FILE
+from agents.vectorstore import VectorStore, ChromaStore, NumpyStore, StoredChunk, NUMPY_STORE_VERSION
+
+# langchain, Chroma and the embedding model are imported on first use: they take seconds to load.
+if TYPE_CHECKING:
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+
+MANIFEST_NAME = "manifest.json"
+LEXICAL_DIR_NAME = "bm25"
+RETRIEVAL_MODES = ("dense", "hybrid")
+VECTOR_BACKENDS = ("chroma", "numpy")
+NUMPY_STORE_DIR_NAME = "vectors"
+EMBEDDING_BACKENDS = ("torch", "onnx")
+# Embedded by every embedder to fingerprint it; the index manifest keeps the vectors of the embedder that built it.
+FINGERPRINT_PROBES = (
+    "Dopamine neurons signal reward prediction errors.",
+    "The quick brown fox jumps over the lazy dog.",
+)
+# Minimum cosine similarity of the probe vectors for two embedders to share an index: the same weights run
+# with another backend or quantized to int8 stay well above it, a different model does not.
+MIN_FINGERPRINT_SIMILARITY = 0.95
 
 
 class PDFRetriever:
@@ -12,87 +40,563 @@ class PDFRetriever:
     Loads, chunks, embeds, and retrieves relevant text passages from a collection of files.
     """
 
-    def __init__(self, papers_dir: str = "papers", persist_dir: str = "chroma_db"):
+    def __init__(
+            self,
+            papers_dir: str = "papers",
+            persist_dir: str = "chroma_db",
+            embedding_model: str = "all-MiniLM-L6-v2",
+            chunk_size: int = 800,
+            chunk_overlap: int = 100,
+            ingest_workers: Optional[int] = None,
+            ingest_batch_size: int = 256,
+            embedding_cache_entries: int = 4096,
+            embedding_cache_bytes: int = 16 * 1024 * 1024,
+            result_cache_entries: int = 1024,
+            retrieval_mode: str = "hybrid",
+            hybrid_candidates: int = 20,
+            vector_backend: str = "chroma",
+            vector_dtype: str = "float32",
+            ann_threshold: int = 50000,
+            query_batch_size: Optional[int] = None,
+            query_batch_wait: float = 0.0,
+            embedding_backend: str = "torch",
+            embedding_quantize: bool = False,
+            embedding_threads: Optional[int] = None,
+            embedding_batch_size: int = 32
+    ):
         """
         Initialize the retriever.
+        :param ingest_workers: PDF parser processes used during indexing (default: CPU count).
+        :param ingest_batch_size: Number of chunks embedded and written to the vector DB per batch.
+        :param embedding_cache_entries: Maximum number of cached query embeddings.
+        :param embedding_cache_bytes: Maximum memory used by cached query embeddings.
+        :param result_cache_entries: Maximum number of cached top-k results (cleared whenever the index changes).
+        :param retrieval_mode: "dense" (vector similarity only) or "hybrid" (BM25 and vector rankings fused
+            with reciprocal rank fusion; falls back to dense if no lexical index exists).
+        :param hybrid_candidates: Candidates taken from each ranking before fusion in hybrid mode.
+        :param vector_backend: "chroma", or "numpy" for the in-process NumpyStore (memory-mapped segments in
+            persist_dir/vectors, exact search with IVF in segments of ann_threshold vectors or more).
+        :param vector_dtype: "float32" or "int8" embeddings (numpy backend only).
+        :param ann_threshold: Segment size from which the numpy backend switches to approximate IVF search.
+        :param query_batch_size: If set, query embeddings requested concurrently by different threads (cache misses
+            of embed_query) are micro-batched into model calls of up to this many queries. Meant for servers.
+        :param query_batch_wait: Seconds a micro-batch waits for more queries (default: batch only what is queued).
+        :param embedding_backend: "torch" or "onnx" (ONNX Runtime; needs sentence-transformers[onnx]) inference
+            for the embedding model.
+        :param embedding_quantize: Use int8 weights: the quantized ONNX export with embedding_backend="onnx",
+            dynamic quantization of the linear layers with embedding_backend="torch".
+        :param embedding_threads: CPU threads for embedding inference (default: the runtime's own choice).
+            With torch, this sets the thread count of the whole process.
+        :param embedding_batch_size: Texts encoded per forward pass, during ingestion and for batched queries.
+
+        The manifest records a fingerprint of the embedder that built the index (see embedder_fingerprint);
+        querying or updating the index with an incompatible embedder raises RuntimeError.
         """
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"retrieval_mode must be one of {RETRIEVAL_MODES}.")
+        if vector_backend not in VECTOR_BACKENDS:
+            raise ValueError(f"vector_backend must be one of {VECTOR_BACKENDS}.")
+        if embedding_backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"embedding_backend must be one of {EMBEDDING_BACKENDS}.")
+        self.logger = logging.getLogger("PDFRetriever")
         self.papers_dir = papers_dir
         self.persist_dir = persist_dir
-        self.embedding = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-        self.vector_db = None
+        self.embedding_model = embedding_model
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.ingest_workers = ingest_workers
+        self.ingest_batch_size = ingest_batch_size
+        self.manifest_path = os.path.join(persist_dir, MANIFEST_NAME)
+        self.lexical_dir = os.path.join(persist_dir, LEXICAL_DIR_NAME)
+        self.retrieval_mode = retrieval_mode
+        self.hybrid_candidates = hybrid_candidates
+        self.lexical_index: Optional[BM25Index] = None
+        self.embedding_backend = embedding_backend
+        self.embedding_quantize = embedding_quantize
+        self.embedding_threads = embedding_threads
+        self.embedding_batch_size = embedding_batch_size
+        self._embedding = None
+        self._embedding_lock = threading.Lock()
+        self._fingerprint: Optional[Dict[str, Any]] = None
+        # Fingerprint recorded by the open index (None if unknown), and whether the embedder was checked against it.
+        self._index_fingerprint: Optional[Dict[str, Any]] = None
+        self._embedder_verified = False
+        self.vector_backend = vector_backend
+        self.vector_dtype = vector_dtype
+        self.ann_threshold = ann_threshold
+        self.vector_db: Optional[VectorStore] = None
+        self.embedding_cache = LRUCache(
+            max_entries=embedding_cache_entries,
+            max_bytes=embedding_cache_bytes,
+            sizeof=lambda vector: vector.nbytes
+        )
+        self.result_cache = LRUCache(max_entries=result_cache_entries)
+        self.query_batcher = MicroBatcher(
+            lambda queries: self.embedding.embed_documents(queries),
+            max_batch=query_batch_size,
+            max_wait=query_batch_wait,
+            name="query-embedding-batcher"
+        ) if query_batch_size else None
+
+    @property
+    def embedding(self) -> "HuggingFaceEmbeddings":
+        """
+        Embedding model, loaded on first use.
+        """
+        if self._embedding is None:
+            with self._embedding_lock:
+                if self._embedding is None:
+                    self._embedding = self._load_embedding()
+        return self._embedding
+
+    def _load_embedding(self) -> "HuggingFaceEmbeddings":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        model_kwargs: Dict[str, Any] = {}
+        if self.embedding_backend == "onnx":
+            model_kwargs["backend"] = "onnx"
+            runtime_kwargs: Dict[str, Any] = {}
+            if self.embedding_quantize:
+                runtime_kwargs["file_name"] = QUANTIZED_ONNX_FILE
+            if self.embedding_threads:
+                import onnxruntime
+                options = onnxruntime.SessionOptions()
+                options.intra_op_num_threads = self.embedding_threads
+                runtime_kwargs["session_options"] = options
+            if runtime_kwargs:
+                model_kwargs["model_kwargs"] = runtime_kwargs
+        elif self.embedding_threads:
+            import torch
+            torch.set_num_threads(self.embedding_threads)
+        try:
+            embedding = HuggingFaceEmbeddings(
+                model_name=self.embedding_model,
+                model_kwargs=model_kwargs,
+                encode_kwargs={"batch_size": self.embedding_batch_size}
+            )
+        except Exception as e:
+            raise RuntimeError(f"Failed to load embedding model {self.embedding_model} ({self.embedding_backend}): {e}")
+        if self.embedding_backend == "torch" and self.embedding_quantize:
+            import torch
+            # _client is the underlying SentenceTransformer.
+            torch.quantization.quantize_dynamic(embedding._client, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        return embedding
+
+    def embedder_fingerprint(self) -> Dict[str, Any]:
+        """
+        Identifies the embedder by its model name, settings, dimension and the vectors it gives FINGERPRINT_PROBES.
+        Computed once (this loads the model).
+        """
+        if self._fingerprint is None:
+            probes = np.asarray(self.embedding.embed_documents(list(FINGERPRINT_PROBES)), dtype=np.float32)
+            self._fingerprint = {
+                "model": self.embedding_model,
+                "backend": self.embedding_backend,
+                "quantize": self.embedding_quantize,
+                "dim": int(probes.shape[1]),
+                "probes": np.round(probes, 4).tolist(),
+            }
+        return self._fingerprint
+
+    @staticmethod
+    def fingerprint_similarity(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+        """
+        Lowest cosine similarity between the two fingerprints' probe vectors (0.0 if their dimensions differ).
+        """
+        if a["dim"] != b["dim"] or len(a["probes"]) != len(b["probes"]):
+            return 0.0
+        x, y = np.asarray(a["probes"], dtype=np.float32), np.asarray(b["probes"], dtype=np.float32)
+        cosines = (x * y).sum(axis=1) / np.maximum(np.linalg.norm(x, axis=1) * np.linalg.norm(y, axis=1), 1e-12)
+        return float(cosines.min())
+
+    def _verify_embedder(self) -> None:
+        """
+        Raises RuntimeError if the open index was built by an embedder incompatible with this one.
+        """
+        if self._embedder_verified or self._index_fingerprint is None:
+            return
+        expected, current = self._index_fingerprint, self.embedder_fingerprint()
+        similarity = self.fingerprint_similarity(expected, current)
+        if similarity < MIN_FINGERPRINT_SIMILARITY:
+            raise RuntimeError(
+                f"Index in {self.persist_dir} was built with embedder {expected['model']} "
+                f"({expected['backend']}, quantize={expected['quantize']}, dim {expected['dim']}), incompatible with "
+                f"{current['model']} ({current['backend']}, quantize={current['quantize']}, dim {current['dim']}): "
+                f"probe similarity {similarity:.3f} < {MIN_FINGERPRINT_SIMILARITY}. "
+                "Use the original embedding settings or rebuild the index with load_and_index_papers()."
+            )
+        self._embedder_verified = True
 
     def load_and_index_papers(self) -> None:
         """
-        Loads all PDFs from the papers_dir, chunks the text, embeds, and persists in a vector DB.
+        Rebuilds the vector DB from scratch: drops every stored chunk and re-indexes all PDFs in papers_dir.
         """
-        pdf_files = glob.glob(os.path.join(self.papers_dir, "*.pdf"))
-        if not pdf_files:
+        if not glob.glob(os.path.join(self.papers_dir, "*.pdf")):
             raise FileNotFoundError(f"No PDF files found in directory: {self.papers_dir}")
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+        self.update_index()
+
+    def update_index(self) -> Dict[str, int]:
+        """
+        Incrementally syncs the vector DB with papers_dir.
 
-        all_documents = []
-        for pdf_file in pdf_files:
-            try:
-                loader = PyPDFLoader(pdf_file)
-                docs = loader.load_and_split()
-                for doc in docs:
-                    doc.metadata["filename"] = os.path.basename(pdf_file)
-                    # Ensure 'page' metadata is present (may be named 'page', 'page_number', etc)
-                    # LangChain's PyPDFLoader usually adds 'page', but just in case we double-check:
-                    page = doc.metadata.get("page", None)
-                    if page is None:
-                        # If the loader splits by page, you might know the current page by order
-                        # For robustness, it might be needed to set it to '?' if not available
-                        doc.metadata["page"] = "?"
-                all_documents.extend(docs)
-            except Exception as e:
-                print(f"Error loading {pdf_file}: {e}")
-        print(f"Loaded {len(all_documents)} document chunks from {len(pdf_files)} PDFs.")
-
-        splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
-        split_documents = splitter.split_documents(all_documents)
-        print(f"Split into {len(split_documents)} smaller chunks.")
+        A manifest next to the vector DB records, per file, its size, mtime, content hash and number of chunks,
+        plus the chunking parameters and embedding model the index was built with. Only new or changed files
+        are parsed and embedded, and the chunks of removed files are deleted. Unchanged files are detected from
+        their size and mtime without being re-read, so re-running over an unchanged corpus is a near no-op.
+        If the chunking parameters or embedding model changed, the whole index is rebuilt.
+        :return: Counts of added, updated, removed and unchanged files.
+        """
+        if self.vector_db is None:
+            self.vector_db = self._open_vector_db()
 
-        try:
-            self.vector_db = Chroma.from_documents(
-                split_documents,
-                self.embedding,
-                persist_directory=self.persist_dir
+        manifest = self._load_manifest()
+        if manifest is None or manifest.get("settings") != self._index_settings():
+            if manifest is not None:
+                print("Index settings (chunking, embedding model or vector store) changed; rebuilding the index.")
+            if self.vector_db.count():
+                self.vector_db.reset()
+                self.result_cache.clear()
+            shutil.rmtree(self.lexical_dir, ignore_errors=True)
+            self.lexical_index = None
+            manifest = {"settings": self._index_settings(), "files": {}}
+        self._index_fingerprint = manifest.get("embedder")
+        self._embedder_verified = False
+
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        # Chunk ids added to and deleted from the vector DB, applied to the lexical index afterwards.
+        added_ids: List[str] = []
+        removed_ids: List[str] = []
+        indexed = manifest["files"]
+        on_disk = {os.path.basename(p): p for p in glob.glob(os.path.join(self.papers_dir, "*.pdf"))}
+
+        for filename in sorted(set(indexed) - set(on_disk)):
+            removed_ids += self._delete_chunks(filename, indexed.pop(filename))
+            stats["removed"] += 1
+
+        jobs = []
+        for filename in sorted(on_disk):
+            path = on_disk[filename]
+            st = os.stat(path)
+            entry = indexed.get(filename)
+            if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+                stats["unchanged"] += 1
+                continue
+            file_hash = self._file_hash(path)
+            if entry and entry["sha256"] == file_hash:
+                # Touched but not modified: refresh the stat fields only.
+                entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+                stats["unchanged"] += 1
+                continue
+            jobs.append((filename, path, file_hash))
+
+        if jobs:
+            # New chunks must be embedded like the ones already indexed.
+            self._verify_embedder()
+            manifest["embedder"] = self._index_fingerprint = self._index_fingerprint or self.embedder_fingerprint()
+            from agents.ingestion import IngestionPipeline
+            pipeline = IngestionPipeline(
+                self.vector_db,
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                workers=self.ingest_workers,
+                batch_size=self.ingest_batch_size
             )
-            print("Embedding and storage complete.")
-        except Exception as e:
-            print("Failed to embed and store documents:", e)
-            raise
+            chunk_counts = pipeline.run(jobs)
+            from agents.ingestion import chunk_id
+            for filename, path, file_hash in jobs:
+                if filename not in chunk_counts:
+                    continue
+                st = os.stat(path)
+                entry = indexed.get(filename)
+                if entry:
+                    removed_ids += self._delete_chunks(filename, entry)
+                added_ids += [chunk_id(filename, file_hash, i) for i in range(chunk_counts[filename])]
+                indexed[filename] = {
+                    "sha256": file_hash,
+                    "size": st.st_size,
+                    "mtime_ns": st.st_mtime_ns,
+                    "num_chunks": chunk_counts[filename],
+                }
+                stats["updated" if entry else "added"] += 1
+
+        # Vectors and lexical postings are persisted before the manifest records them: after a crash, the files
+        # missing from the manifest are ingested again, replacing their chunks in both indexes.
+        self.vector_db.flush()
+        changed = stats["added"] or stats["updated"] or stats["removed"]
+        if not BM25Index.exists(self.lexical_dir):
+            self._rebuild_lexical_index()
+        else:
+            if self.lexical_index is None:
+                self.lexical_index = BM25Index(self.lexical_dir)
+            if changed:
+                self._update_lexical_index(added_ids, removed_ids)
+        self._save_manifest(manifest)
+        if changed:
+            self.result_cache.clear()
+            print(
+                f"Index updated: {stats['added']} added, {stats['updated']} updated, "
+                f"{stats['removed']} removed, {stats['unchanged']} unchanged."
+            )
+        return stats
 
     def load_existing_index(self) -> None:
         """
         Loads an existing persisted vector database.
         """
-        if not os.path.exists(self.persist_dir):
-            raise FileNotFoundError("Persisted vector DB not found. Run load_and_index_papers() first.")
-        self.vector_db = Chroma(
-            persist_directory=self.persist_dir,
-            embedding_function=self.embedding
-        )
+        # persist_dir itself is no evidence of an index: the answer and web caches are created in it too.
+        if not os.path.exists(self.manifest_path) or not self._vector_db_exists():
+            raise FileNotFoundError(
+                f"No {self.vector_backend} index found in {self.persist_dir}. "
+                "Run load_and_index_papers() first (or start without --no-build)."
+            )
+        self.vector_db = self._open_vector_db()
+        self.result_cache.clear()
+        manifest = self._load_manifest()
+        self._index_fingerprint = manifest.get("embedder") if manifest else None
+        self._embedder_verified = False
+        if self._index_fingerprint is None:
+            self.logger.warning("The index records no embedder fingerprint; queries cannot be checked against it.")
         # Dummy test
         try:
-            _ = self.vector_db._collection.count()
+            _ = self.vector_db.count()
         except Exception as e:
-            raise RuntimeError(f"Failed to load Chroma index: {e}")
+            raise RuntimeError(f"Failed to load {self.vector_backend} index: {e}")
+        self.lexical_index = BM25Index(self.lexical_dir) if BM25Index.exists(self.lexical_dir) else None
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """
+        Cache key for a query: case- and whitespace-insensitive.
+        """
+        return " ".join(query.lower().split())
+
+    def embed_query(self, query: str, trace: Optional[Trace] = None) -> List[float]:
+        """
+        Embeds a query with the same model used for the indexed chunks.
+        Embeddings are cached by normalized query text.
+        """
+        self._verify_embedder()
+        key = self.normalize_query(query)
+        vector = self.embedding_cache.get(key)
+        if trace is not None:
+            trace.incr("embedding_cache_hits" if vector is not None else "embedding_cache_misses")
+        if vector is None:
+            with maybe_span(trace, "embedding"):
+                if self.query_batcher is not None:
+                    # Same encoder and encode kwargs as embed_query (see embed_queries).
+                    vector = np.asarray(self.query_batcher.submit(query), dtype=np.float32)
+                else:
+                    vector = np.asarray(self.embedding.embed_query(query), dtype=np.float32)
+            self.embedding_cache.put(key, vector)
+        return vector.tolist()
 
-    def retrieve(self, query: str, top_k: int = 4) -> List[Dict[str, Dict[str, str]]]:
+    def embed_queries(self, queries: List[str], trace: Optional[Trace] = None) -> List[List[float]]:
         """
-        Runs similarity search and returns relevant chunks with citation metadata.
+        Batched embed_query: all queries missing from the embedding cache are encoded in a single model call.
+        """
+        self._verify_embedder()
+        keys = [self.normalize_query(q) for q in queries]
+        vectors = [self.embedding_cache.get(key) for key in keys]
+        missing = {}
+        for query, key, vector in zip(queries, keys, vectors):
+            if vector is None:
+                missing.setdefault(key, query)
+        if trace is not None:
+            trace.incr("embedding_cache_hits", len(queries) - len(missing))
+            trace.incr("embedding_cache_misses", len(missing))
+        if missing:
+            # Same encoder and encode kwargs as embed_query; embed_documents just takes the whole batch.
+            with maybe_span(trace, "embedding"):
+                encoded = self.embedding.embed_documents(list(missing.values()))
+            for key, vector in zip(missing, encoded):
+                self.embedding_cache.put(key, np.asarray(vector, dtype=np.float32))
+            fresh = dict(zip(missing, encoded))
+            vectors = [np.asarray(fresh[key], dtype=np.float32) if v is None else v for key, v in zip(keys, vectors)]
+        return [vector.tolist() for vector in vectors]
+
+    def retrieve(
+            self,
+            query: str,
+            top_k: int = 4,
+            query_embedding: Optional[List[float]] = None,
+            trace: Optional[Trace] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Runs similarity search and returns relevant chunks with their id and citation metadata.
+        Results are cached per (normalized query, top_k) until the index changes.
+        :param query_embedding: Precomputed embedding of query (see embed_query), to avoid encoding it twice.
         """
         if not self.vector_db:
             raise RuntimeError("Vector DB not loaded. Call load_and_index_papers() or load_existing_index() first.")
 
-        results = self.vector_db.similarity_search(query, k=top_k)
-        answers = []
-        for r in results:
-            citation = {
-                "filename": r.metadata.get("filename", "Unknown"),
-                "page": str(r.metadata.get("page", "?"))
-            }
-            answers.append({"text": r.page_content, "citation": citation})
-        return answers
+        key = (self.normalize_query(query), top_k)
+        answers = self.result_cache.get(key)
+        if trace is not None:
+            trace.incr("retrieval_cache_hits" if answers is not None else "retrieval_cache_misses")
+        if answers is None:
+            if query_embedding is None:
+                query_embedding = self.embed_query(query, trace=trace)
+            answers = [self._to_answer(chunk) for chunk in self._search_many([query], [query_embedding], top_k, trace)[0]]
+            self.result_cache.put(key, answers)
+        # Copies, so callers cannot mutate the cached entries.
+        return [dict(answer, citation=dict(answer["citation"])) for answer in answers]
+
+    def retrieve_many(
+            self,
+            queries: List[str],
+            top_k: int = 4,
+            query_embeddings: Optional[List[List[float]]] = None,
+            trace: Optional[Trace] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Bulk retrieve: the results of every query, in order. Queries missing from the result cache are
+        embedded in one batch (unless query_embeddings are given) and searched with a single vector DB query.
+        """
+        if not self.vector_db:
+            raise RuntimeError("Vector DB not loaded. Call load_and_index_papers() or load_existing_index() first.")
+
+        keys = [(self.normalize_query(q), top_k) for q in queries]
+        results = [self.result_cache.get(key) for key in keys]
+        misses = [i for i, answers in enumerate(results) if answers is None]
+        if trace is not None:
+            trace.incr("retrieval_cache_hits", len(queries) - len(misses))
+            trace.incr("retrieval_cache_misses", len(misses))
+        if misses:
+            miss_queries = [queries[i] for i in misses]
+            if query_embeddings is None:
+                miss_embeddings = self.embed_queries(miss_queries, trace=trace)
+            else:
+                miss_embeddings = [query_embeddings[i] for i in misses]
+            found = self._search_many(miss_queries, miss_embeddings, top_k, trace)
+            for i, chunks in zip(misses, found):
+                results[i] = [self._to_answer(chunk) for chunk in chunks]
+                self.result_cache.put(keys[i], results[i])
+        return [[dict(answer, citation=dict(answer["citation"])) for answer in answers] for answers in results]
+
+    @staticmethod
+    def _to_answer(chunk: StoredChunk) -> Dict[str, Any]:
+        cid, text, metadata = chunk
+        # The numpy store always records the page; "?" only remains for Chroma chunks indexed without one.
+        citation = {
+            "filename": metadata.get("filename", "Unknown"),
+            "page": str(metadata.get("page", "?"))
+        }
+        return {"id": cid, "text": text, "citation": citation}
+
+    def _search_many(
+            self,
+            queries: List[str],
+            query_embeddings: List[List[float]],
+            top_k: int,
+            trace: Optional[Trace]
+    ) -> List[List[StoredChunk]]:
+        """
+        Returns the top_k chunks of each query, dense-only or fused with BM25 depending on retrieval_mode.
+        All dense searches go to the vector store as one query.
+        """
+        hybrid = self.retrieval_mode == "hybrid" and self.lexical_index is not None
+        candidates = max(top_k, self.hybrid_candidates) if hybrid else top_k
+        with maybe_span(trace, "vector_search"):
+            dense = self.vector_db.query(query_embeddings, k=candidates)
+        if not hybrid:
+            return dense
+
+        results = []
+        for query, chunks in zip(queries, dense):
+            with maybe_span(trace, "lexical_search"):
+                lexical = self.lexical_index.search(query, k=candidates)
+            fused = reciprocal_rank_fusion([[chunk[0] for chunk in chunks], [cid for cid, _ in lexical]], limit=top_k)
+            by_id = {chunk[0]: chunk for chunk in chunks}
+            missing = [cid for cid in fused if cid not in by_id]
+            if missing:
+                with maybe_span(trace, "chunk_fetch"):
+                    for chunk in self.vector_db.get_by_ids(missing):
+                        by_id[chunk[0]] = chunk
+            results.append([by_id[cid] for cid in fused if cid in by_id])
+        return results
+
+    def _rebuild_lexical_index(self, page_size: int = 5000) -> None:
+        """
+        Rebuilds the BM25 index from the chunks stored in the vector DB, reading them page by page.
+        """
+        stored_chunks = ((cid, text) for cid, text, _ in self.vector_db.iter_chunks(page_size=page_size))
+        self.lexical_index = BM25Index.build(self.lexical_dir, stored_chunks)
+        print(f"Lexical index built over {self.lexical_index.num_docs} chunks.")
+
+    def _update_lexical_index(self, added_ids: List[str], removed_ids: List[str], page_size: int = 5000) -> None:
+        """
+        Applies a vector DB update to the BM25 index: only the added chunks are read back and tokenized.
+        """
+        def added_chunks():
+            for start in range(0, len(added_ids), page_size):
+                for cid, text, _ in self.vector_db.get_by_ids(added_ids[start:start + page_size]):
+                    yield cid, text
+        self.lexical_index.update(added_chunks(), removed_ids)
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Hit/miss counters and sizes of the query-embedding and result caches.
+        """
+        return {"query_embeddings": self.embedding_cache.stats(), "results": self.result_cache.stats()}
+
+    def _open_vector_db(self) -> VectorStore:
+        if self.vector_backend == "numpy":
+            return NumpyStore(
+                os.path.join(self.persist_dir, NUMPY_STORE_DIR_NAME),
+                self.embedding,
+                dtype=self.vector_dtype,
+                ann_threshold=self.ann_threshold
+            )
+        return ChromaStore(self.persist_dir, self.embedding)
+
+    def _vector_db_exists(self) -> bool:
+        if self.vector_backend == "numpy":
+            return NumpyStore.exists(os.path.join(self.persist_dir, NUMPY_STORE_DIR_NAME))
+        return ChromaStore.exists(self.persist_dir)
+
+    def _index_settings(self) -> Dict[str, Any]:
+        settings = {
+            "embedding_model": self.embedding_model,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "chunking": "per-page",
+            # Chunk ids include the filename, so identical copies of a PDF do not share them.
+            "chunk_ids": "per-file",
+        }
+        # Only recorded for the numpy backend, so existing Chroma indexes keep matching their manifest.
+        if self.vector_backend == "numpy":
+            settings.update(vector_backend="numpy", vector_dtype=self.vector_dtype, vector_store_version=NUMPY_STORE_VERSION)
+        return settings
+
+    def _load_manifest(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable index manifest: {e}")
+            return None
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        os.makedirs(self.persist_dir, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def _file_hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
 
+    def _delete_chunks(self, filename: str, entry: Dict[str, Any]) -> List[str]:
+        from agents.ingestion import chunk_id
+        ids = [chunk_id(filename, entry["sha256"], i) for i in range(entry["num_chunks"])]
+        if ids:
+            self.vector_db.delete(ids=ids)
+        return ids
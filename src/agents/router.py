@@ -0,0 +1,232 @@
+import re
+from typing import List, Dict, Any, Optional, Callable, NamedTuple, Pattern, Match, Tuple, Union
+from agents.memory import MemoryKeeper
+
+ORDINAL_WORDS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5,
+    "sixth": 6, "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10,
+}
+# Answer excerpt length per turn in conversation summaries.
+SUMMARY_ANSWER_CHARS = 160
+# Latest turns returned as a meta answer's "memory", the same window regular answers are given.
+MEMORY_TURNS = 3
+# Words and openings that point back at earlier turns ("what about its side effects?", "and in mice?").
+FOLLOW_UP_RE = re.compile(
+    r"\b(it|its|they|them|their|this|that|these|those|he|him|his|she|her|former|latter|above|previous|earlier"
+    r"|same|also|else|more|again|instead|mentioned)\b"
+    r"|^\W*(and|but|or|so|then|why|how come|what about|how about)\b",
+    re.IGNORECASE
+)
+# Questions this short are too elliptical to be read without the conversation ("Why not?", "Explain").
+MIN_STANDALONE_WORDS = 3
+
+
+class HistoryView:
+    """
+    Read-only view of one session's history that loads only what is accessed: len() is one COUNT query
+    and history[i] (negative indices count from the newest) reads a single row, whatever the session length.
+    """
+
+    def __init__(self, memory: MemoryKeeper, session_id: str):
+        self.memory = memory
+        self.session_id = session_id
+        self._len: Optional[int] = None
+
+    def __len__(self) -> int:
+        # COUNT is linear in the session length; handlers should prefer get(), which needs no length.
+        if self._len is None:
+            self._len = self.memory.count(session_id=self.session_id)
+        return self._len
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        entry = self.get(index)
+        if entry is None:
+            raise IndexError(f"History index {index} out of range.")
+        return entry
+
+    def get(self, index: int) -> Optional[Dict[str, Any]]:
+        """
+        Entry at index (negative indices count from the newest), or None if out of range.
+        """
+        return self.memory.get_entry(index, session_id=self.session_id)
+
+    def questions(self) -> List[str]:
+        """
+        All questions, oldest first (answers and sources are not read).
+        """
+        return self.memory.get_questions(session_id=self.session_id)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """
+        The whole history, oldest first.
+        """
+        return self.memory.get_history(session_id=self.session_id)
+
+    def recent(self, n: int) -> List[Dict[str, Any]]:
+        """
+        The last n entries, oldest first (only those rows are read).
+        """
+        return self.memory.get_history(n=n, session_id=self.session_id)
+
+
+# A handler answers a matched meta question from the history; returning None passes the question on.
+MetaHandler = Callable[[Match, HistoryView], Optional[str]]
+
+
+class MetaIntent(NamedTuple):
+    name: str
+    pattern: Pattern
+    handler: MetaHandler
+    # The pattern is only searched if one of these substrings occurs in the question (None: always).
+    keywords: Optional[Tuple[str, ...]] = None
+
+    def match(self, text: str) -> Optional[Match]:
+        if self.keywords is not None and not any(keyword in text for keyword in self.keywords):
+            return None
+        return self.pattern.search(text)
+
+
+class MetaRouter:
+    """
+    Routes questions about the conversation itself (meta questions) to handlers that answer from memory.
+
+    Intents are tried in registration order against the lowercased question with precompiled patterns; the first
+    whose pattern matches, and whose handler returns an answer, wins. Routing reads no history: a regular question
+    costs a few substring tests (each intent's keywords gate its regex), and history rows are only loaded by the
+    handler of a matched intent.
+    """
+
+    def __init__(self):
+        self.intents: List[MetaIntent] = []
+
+    def register(
+            self,
+            name: str,
+            pattern: Union[str, Pattern],
+            handler: MetaHandler,
+            keywords: Optional[Tuple[str, ...]] = None,
+            before: Optional[str] = None
+    ) -> None:
+        """
+        Adds an intent. The pattern is searched in the lowercased, stripped question.
+        :param keywords: Substrings of which every match of the pattern contains at least one; questions without
+            any of them skip the regex search.
+        :param before: Name of a registered intent this one takes precedence over (default: lowest precedence).
+        """
+        if any(intent.name == name for intent in self.intents):
+            raise ValueError(f"Meta intent {name} is already registered.")
+        intent = MetaIntent(name, re.compile(pattern) if isinstance(pattern, str) else pattern, handler, keywords)
+        if before is None:
+            self.intents.append(intent)
+            return
+        for i, existing in enumerate(self.intents):
+            if existing.name == before:
+                self.intents.insert(i, intent)
+                return
+        raise ValueError(f"No meta intent named {before}.")
+
+    def route(self, question: str) -> Optional[Tuple[MetaIntent, Match]]:
+        """
+        The first intent whose pattern matches the question, with its match; None for regular questions.
+        """
+        text = question.lower().strip()
+        for intent in self.intents:
+            match = intent.match(text)
+            if match is not None:
+                return intent, match
+        return None
+
+    def answer(self, question: str, memory: MemoryKeeper, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Answers a meta question from memory, or returns None for regular questions.
+        The response's "memory" holds the last MEMORY_TURNS turns, not the whole history.
+        """
+        text = question.lower().strip()
+        history = None
+        for intent in self.intents:
+            match = intent.match(text)
+            if match is None:
+                continue
+            if history is None:
+                history = HistoryView(memory, session_id)
+            answer = intent.handler(match, history)
+            if answer is not None:
+                return {"answer": answer, "sources": [], "memory": history.recent(MEMORY_TURNS), "intent": intent.name}
+        return None
+
+
+def is_standalone(question: str) -> bool:
+    """
+    Whether a question can be understood without the conversation before it. Errs on the side of False:
+    anything that may refer back to an earlier turn counts as a follow-up.
+    """
+    return len(question.split()) >= MIN_STANDALONE_WORDS and FOLLOW_UP_RE.search(question) is None
+
+
+def _question_number(n: int, history: HistoryView) -> str:
+    entry = history.get(n - 1) if n >= 1 else None
+    return entry["question"] if entry is not None else f"There is no question number {n}."
+
+
+def _ordinal_question(match: Match, history: HistoryView) -> str:
+    # The lowest ordinal mentioned wins, wherever it appears in the question.
+    n = min(ORDINAL_WORDS[word] for word in match.re.findall(match.string))
+    return _question_number(n, history)
+
+
+def _numbered_question(match: Match, history: HistoryView) -> str:
+    return _question_number(int(match.group(1)), history)
+
+
+# "Last" refers to the turn before the latest one, and "previous questions" leave out the latest one.
+def _last_question(match: Match, history: HistoryView) -> str:
+    entry = history.get(-2)
+    return entry["question"] if entry is not None else "Not enough history."
+
+
+def _last_answer(match: Match, history: HistoryView) -> str:
+    entry = history.get(-2)
+    return entry["answer"] if entry is not None else "Not enough history."
+
+
+def _previous_questions(match: Match, history: HistoryView) -> str:
+    questions = history.questions()[:-1]
+    return "\n".join(f"{i+1}. {q}" for i, q in enumerate(questions)) if questions else "No previous questions."
+
+
+def _summarize_conversation(match: Match, history: HistoryView) -> str:
+    entries = history.entries()
+    if not entries:
+        return "We have not discussed anything yet."
+    lines = [f"We have discussed {len(entries)} question{'s' if len(entries) != 1 else ''}:"]
+    for i, entry in enumerate(entries):
+        answer = " ".join(entry["answer"].split())
+        if len(answer) > SUMMARY_ANSWER_CHARS:
+            answer = answer[:SUMMARY_ANSWER_CHARS].rsplit(" ", 1)[0] + "..."
+        lines.append(f"{i+1}. {entry['question']} - {answer}")
+    return "\n".join(lines)
+
+
+def default_router() -> MetaRouter:
+    """
+    A router with the built-in meta intents, in precedence order.
+    """
+    router = MetaRouter()
+    router.register(
+        "ordinal_question", r"(" + "|".join(ORDINAL_WORDS) + r") question", _ordinal_question, keywords=(" question",)
+    )
+    router.register("numbered_question", r"(\d+)(?:st|nd|rd|th)?\s+question", _numbered_question, keywords=("question",))
+    router.register("last_question", r"last question", _last_question, keywords=("last question",))
+    router.register("last_answer", r"last answer", _last_answer, keywords=("last answer",))
+    router.register(
+        "previous_questions", r"previous questions|list questions", _previous_questions,
+        keywords=("previous questions", "list questions")
+    )
+    router.register(
+        "summarize_conversation",
+        r"\b(?:summari[sz]e|sum up|recap)\b.*\b(?:conversation|chat|discussion|session)\b"
+        r"|\bsummary of (?:the|our|this) (?:conversation|chat|discussion|session)\b",
+        _summarize_conversation,
+        keywords=("summar", "sum up", "recap")
+    )
+    return router
@@ -1,6 +1,18 @@
 import re
-from typing import List, Dict, Any
-import openai
+import time
+import threading
+from typing import List, Dict, Any, Iterator, Optional, Tuple, TYPE_CHECKING
+from agents.packer import ContextPacker
+from agents.telemetry import Trace, maybe_span
+
+if TYPE_CHECKING:
+    import openai
+
+LLM_ERROR_PREFIX = "Error: Failed to get an answer from the LLM"
+SYNTHESIS_REASONING = "Synthesized by LLM based on provided document and web chunks."
+CORROBORATION_HEADING = "Web corroboration:"
+# Citation markers in answers: [N] for PDF chunks, [WN] for web results.
+CITATION_RE = re.compile(r"\[(W?)(\d+)\]")
 
 class Synthesizer:
     """
@@ -8,9 +20,25 @@ class Synthesizer:
     and returns both the answer and the cited sources.
     """
 
-    def __init__(self, model: str = "gpt-3.5-turbo", temperature: float = 0.1):
+    def __init__(
+            self,
+            model: str = "gpt-3.5-turbo",
+            temperature: float = 0.1,
+            base_url: Optional[str] = None,
+            api_key: Optional[str] = None,
+            packer: Optional[ContextPacker] = None
+    ):
+        """
+        :param base_url: OpenAI-compatible endpoint (defaults to OPENAI_BASE_URL or the OpenAI API).
+        :param api_key: API key (defaults to OPENAI_API_KEY).
+        :param packer: Fits chunks and history into a token budget before prompting (default: ContextPacker for model).
+        """
         self.model = model
         self.temperature = temperature
+        self.base_url = base_url
+        self.api_key = api_key
+        self._client = None
+        self._packer = packer
 
     def format_context(self, chunks: List[Dict[str, Any]]) -> str:
         """
@@ -56,36 +84,55 @@ class Synthesizer:
             "Answer (with citations):"
         )
         return prompt
-    
-    
 
-    def synthesize(self, question: str, chunks: List[Dict[str, Any]], history: List[Dict[str, Any]], max_tokens: int = 400) -> Dict[str, Any]:
-        """
-        Uses the LLM to synthesize an answer.
-        Returns a dict with the answer, sources, and reasoning.
-        """
+    def _messages(self, question: str, chunks: List[Dict[str, Any]], history: List[Dict[str, Any]]) -> List[Dict[str, str]]:
         prompt = self.build_prompt(question, chunks, history)
-        messages = [
+        return [
             {"role": "system", "content": "You are a neuroscience research assistant."},
             {"role": "user", "content": prompt}
         ]
-        try:
-            client = openai.OpenAI()
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=max_tokens
-            )
-            answer = response.choices[0].message.content.strip()
 
-        except Exception as e:
-            answer = f"Error: Failed to get an answer from the LLM: {e}"
+    @property
+    def client(self) -> "openai.OpenAI":
+        """
+        OpenAI client, created on first use and reused so connections are kept alive across questions.
+        The openai package itself is only imported then, keeping startup fast.
+        """
+        if self._client is None:
+            import openai
+            self._client = openai.OpenAI(base_url=self.base_url, api_key=self.api_key)
+        return self._client
 
-        # --- PATCHED citation handling starts here ---
+    @property
+    def packer(self) -> ContextPacker:
+        """
+        Context packer, created on first use (loading the tokenizer takes a while).
+        """
+        if self._packer is None:
+            self._packer = ContextPacker(model=self.model)
+        return self._packer
+
+    @staticmethod
+    def citation_lookup(chunks: List[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """
+        Maps (citation_type, citation_num) to the chunk's citation metadata.
+        """
+        lookup = {}
+        for chunk in chunks:
+            typ = chunk.get("citation_type", "pdf")
+            num = str(chunk.get("citation_num", 1))
+            lookup[(typ, num)] = chunk["citation"]
+        return lookup
+
+    @staticmethod
+    def extract_sources(answer: str, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Returns the citation metadata of every source cited in answer, in order of first appearance.
+        Citations that do not match a provided chunk are dropped.
+        """
         # 1. Find all citations in order of appearance (including duplicates)
         citation_tuples = []
-        for match in re.finditer(r"\[(W?)(\d+)\]", answer):
+        for match in CITATION_RE.finditer(answer):
             typ = 'web' if match.group(1) == 'W' else 'pdf'
             num = match.group(2)
             citation_tuples.append((typ, num))
@@ -97,17 +144,204 @@ class Synthesizer:
                 seen.add(tup)
                 ordered_citations.append(tup)
         # 3. Build a lookup from (typ, num) to the chunk's citation metadata
-        lookup = {}
-        for chunk in chunks:
-            typ = chunk.get("citation_type", "pdf")
-            num = str(chunk.get("citation_num", 1))
-            lookup[(typ, num)] = chunk["citation"]
+        lookup = Synthesizer.citation_lookup(chunks)
         # 4. Ordered list of cited sources
-        cited_sources = [lookup[tup] for tup in ordered_citations if tup in lookup]
-        # --- PATCHED citation handling ends here ---
+        return [lookup[tup] for tup in ordered_citations if tup in lookup]
 
+    def synthesize(
+            self,
+            question: str,
+            chunks: List[Dict[str, Any]],
+            history: List[Dict[str, Any]],
+            max_tokens: int = 400,
+            trace: Optional[Trace] = None
+    ) -> Dict[str, Any]:
+        """
+        Uses the LLM to synthesize an answer.
+        Chunks and history are first packed into the token budget (see ContextPacker); citation numbers
+        refer to the packed chunks.
+        Returns a dict with the answer, sources, reasoning, packing stats (including tokens_saved) and error:
+        None, or if the LLM call failed, the LLM_ERROR_PREFIX message that is then also the answer.
+        """
+        with maybe_span(trace, "prompt_build"):
+            chunks, history, packing = self.packer.pack(chunks, history)
+            messages = self._messages(question, chunks, history)
+        self._record_packing(trace, packing)
+        try:
+            with maybe_span(trace, "llm_call"):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=max_tokens
+                )
+            answer = response.choices[0].message.content.strip()
+            if trace is not None and response.usage is not None:
+                trace.incr("prompt_tokens", response.usage.prompt_tokens)
+                trace.incr("completion_tokens", response.usage.completion_tokens)
+
+        except Exception as e:
+            answer = error = f"{LLM_ERROR_PREFIX}: {e}"
+        else:
+            error = None
+
+        with maybe_span(trace, "citation_parsing"):
+            sources = self.extract_sources(answer, chunks)
         return {
             "answer": answer,
-            "sources": cited_sources,
-            "reasoning": "Synthesized by LLM based on provided document and web chunks."
+            "sources": sources,
+            "reasoning": SYNTHESIS_REASONING,
+            "packing": packing,
+            "error": error
+        }
+
+    @staticmethod
+    def _record_packing(trace: Optional[Trace], packing: Dict[str, int]) -> None:
+        if trace is not None:
+            trace.incr("context_tokens", packing["tokens_after"])
+            trace.incr("context_tokens_saved", packing["tokens_saved"])
+
+    def stream_synthesize(
+            self,
+            question: str,
+            chunks: List[Dict[str, Any]],
+            history: List[Dict[str, Any]],
+            max_tokens: int = 400,
+            trace: Optional[Trace] = None,
+            cancel: Optional[threading.Event] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of synthesize. Yields events as the completion arrives:
+        - {"type": "token", "text": ...} for every piece of answer text;
+        - {"type": "citation", "source": ...} the first time a provided source is cited;
+        - {"type": "done", "answer": ..., "sources": ..., "reasoning": ..., "packing": ..., "error": ...} once, at the end.
+        If the completion fails, "error" carries the LLM_ERROR_PREFIX message and "answer" the text streamed before
+        the failure; the message is only streamed (and is the answer) if nothing was streamed yet. Otherwise "error" is None.
+        :param cancel: When set (e.g. from another thread), the completion is closed at the next streamed piece
+            and "done" carries the partial answer.
+        """
+        with maybe_span(trace, "prompt_build"):
+            chunks, history, packing = self.packer.pack(chunks, history)
+            messages = self._messages(question, chunks, history)
+        self._record_packing(trace, packing)
+        lookup = self.citation_lookup(chunks)
+        answer = ""
+        scan_from = 0
+        seen = set()
+        error = None
+        llm_start = time.perf_counter()
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            for event in stream:
+                if cancel is not None and cancel.is_set():
+                    stream.close()
+                    break
+                if not event.choices:
+                    continue
+                text = event.choices[0].delta.content
+                if not text:
+                    continue
+                if not answer:
+                    text = text.lstrip()
+                    if not text:
+                        continue
+                    if trace is not None:
+                        trace.incr("time_to_first_token_ms", round((time.perf_counter() - llm_start) * 1000, 3))
+                answer += text
+                yield {"type": "token", "text": text}
+
+                for match in CITATION_RE.finditer(answer, scan_from):
+                    scan_from = match.end()
+                    tup = ('web' if match.group(1) == 'W' else 'pdf', match.group(2))
+                    if tup not in seen:
+                        seen.add(tup)
+                        if tup in lookup:
+                            yield {"type": "citation", "source": lookup[tup]}
+                # Rescan from an unclosed "[" next time: a citation may be split across tokens.
+                open_bracket = answer.rfind("[", scan_from)
+                scan_from = open_bracket if open_bracket != -1 else len(answer)
+        except Exception as e:
+            # Reported in "done" rather than appended to a partial answer, which could pass for a complete one.
+            error = f"{LLM_ERROR_PREFIX}: {e}"
+            if not answer:
+                answer = error
+                yield {"type": "token", "text": error}
+        if trace is not None:
+            # Includes the time the consumer spent between tokens.
+            trace.incr("llm_stream_ms", round((time.perf_counter() - llm_start) * 1000, 3))
+            trace.incr("completion_tokens", self.packer.count(answer))
+
+        answer = answer.strip()
+        with maybe_span(trace, "citation_parsing"):
+            sources = self.extract_sources(answer, chunks)
+        yield {
+            "type": "done",
+            "answer": answer,
+            "sources": sources,
+            "reasoning": SYNTHESIS_REASONING,
+            "packing": packing,
+            "error": error
         }
+
+    def build_corroboration_prompt(self, question: str, answer: str, web_chunks: List[Dict[str, Any]]) -> str:
+        """
+        Builds the prompt of a web corroboration pass over an answer drafted from PDF chunks.
+        """
+        context = self.format_context(web_chunks)
+        return (
+            "You are an expert neuroscience research assistant. "
+            "An answer to the user's question was drafted from research papers. "
+            "Using only the web sources below, write one short paragraph saying which points of the draft "
+            "they support, contradict or complement. "
+            "Cite web sources as [W1], [W2], etc., using the numbers provided; do not cite any other source. "
+            "If the web sources add nothing, reply only: No further corroboration.\n\n"
+            f"Question: {question}\n\n"
+            f"Draft answer:\n{answer}\n\n"
+            f"Web sources:\n{context}\n\n"
+            "Corroboration (with citations):"
+        )
+
+    def corroborate(
+            self,
+            question: str,
+            answer: str,
+            web_chunks: List[Dict[str, Any]],
+            max_tokens: int = 200,
+            trace: Optional[Trace] = None
+    ) -> Dict[str, Any]:
+        """
+        Uses the LLM to check an answer drafted from PDF chunks against web chunks (numbered [WN]).
+        Returns a dict with the corroboration paragraph as "answer" (an LLM_ERROR_PREFIX message if the call
+        failed), the web sources it cites and the packing stats of the web chunks.
+        """
+        with maybe_span(trace, "prompt_build"):
+            web_chunks, _, packing = self.packer.pack(web_chunks, [])
+            messages = [
+                {"role": "system", "content": "You are a neuroscience research assistant."},
+                {"role": "user", "content": self.build_corroboration_prompt(question, answer, web_chunks)}
+            ]
+        self._record_packing(trace, packing)
+        try:
+            with maybe_span(trace, "llm_corroboration"):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=max_tokens
+                )
+            if trace is not None and response.usage is not None:
+                trace.incr("prompt_tokens", response.usage.prompt_tokens)
+                trace.incr("completion_tokens", response.usage.completion_tokens)
+            answer = response.choices[0].message.content.strip()
+        except Exception as e:
+            answer = f"{LLM_ERROR_PREFIX}: {e}"
+
+        with maybe_span(trace, "citation_parsing"):
+            sources = self.extract_sources(answer, web_chunks)
+        return {"answer": answer, "sources": sources, "packing": packing}
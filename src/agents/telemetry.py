@@ -0,0 +1,215 @@
+import os
+import sys
+import copy
+import json
+import time
+import pstats
+import cProfile
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Iterator
+
+
+class Trace:
+    """
+    Timing spans and counters for one request. Safe to record into from several threads.
+    """
+
+    def __init__(self, name: str = "handle_question"):
+        self.name = name
+        # Prepended to the span and counter names recorded through this object (see prefixed).
+        self.prefix = ""
+        self.spans: List[Dict[str, Any]] = []
+        self.counters: Dict[str, float] = {}
+        self._start = time.perf_counter()
+        self._end: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """
+        Times the enclosed block as a span named name (recorded even if the block raises).
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.spans.append({
+                    "name": self.prefix + name,
+                    "start_ms": round((start - self._start) * 1000, 3),
+                    "ms": round((end - start) * 1000, 3),
+                    "thread": threading.current_thread().name,
+                })
+
+    def incr(self, name: str, value: float = 1) -> None:
+        name = self.prefix + name
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def prefixed(self, prefix: str) -> "Trace":
+        """
+        A view of this trace that records spans and counters into it under prefix + name, keeping the cost of
+        side work (e.g. a speculative draft) apart from the request's own.
+        """
+        view = copy.copy(self)
+        view.prefix = self.prefix + prefix
+        return view
+
+    def finish(self) -> None:
+        if self._end is None:
+            self._end = time.perf_counter()
+
+    @property
+    def seconds(self) -> float:
+        return (self._end or time.perf_counter()) - self._start
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "timestamp": time.time() - self.seconds,
+                "total_ms": round(self.seconds * 1000, 3),
+                "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+                "counters": dict(self.counters),
+            }
+
+
+@contextmanager
+def maybe_span(trace: Optional[Trace], name: str) -> Iterator[None]:
+    """
+    trace.span(name) if a trace is given, else a no-op.
+    """
+    if trace is None:
+        yield
+    else:
+        with trace.span(name):
+            yield
+
+
+def append_jsonl(path: str, trace: Trace) -> None:
+    """
+    Appends a trace as one JSON line.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(trace.to_dict()) + "\n")
+
+
+class MetricsRegistry:
+    """
+    Aggregates traces into per-stage duration summaries and counter totals, exportable as Prometheus text.
+    """
+
+    def __init__(self, prefix: str = "crew"):
+        self.prefix = prefix
+        self.requests = 0
+        self.request_seconds = 0.0
+        self.stage_seconds: Dict[str, float] = {}
+        self.stage_counts: Dict[str, int] = {}
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, trace: Trace) -> None:
+        # A snapshot taken under the trace's lock: late work (a cancelled draft, a leg past its deadline)
+        # may still be recording into the trace.
+        recorded = trace.to_dict()
+        with self._lock:
+            self.requests += 1
+            self.request_seconds += recorded["total_ms"] / 1000
+            for span in recorded["spans"]:
+                name = span["name"]
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + span["ms"] / 1000
+                self.stage_counts[name] = self.stage_counts.get(name, 0) + 1
+            for name, value in recorded["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_prometheus(self) -> str:
+        """
+        Prometheus text exposition format.
+        """
+        p = self.prefix
+        with self._lock:
+            lines = [
+                f"# TYPE {p}_request_seconds summary",
+                f"{p}_request_seconds_sum {self.request_seconds:.6f}",
+                f"{p}_request_seconds_count {self.requests}",
+                f"# TYPE {p}_stage_seconds summary",
+            ]
+            for name in sorted(self.stage_seconds):
+                lines.append(f'{p}_stage_seconds_sum{{stage="{name}"}} {self.stage_seconds[name]:.6f}')
+                lines.append(f'{p}_stage_seconds_count{{stage="{name}"}} {self.stage_counts[name]}')
+            for name in sorted(self.counters):
+                lines.append(f"# TYPE {p}_{name}_total counter")
+                lines.append(f"{p}_{name}_total {self.counters[name]:g}")
+        return "\n".join(lines) + "\n"
+
+
+class SlowRequestProfiler:
+    """
+    Profiles requests and keeps the profile only for those slower than threshold_seconds.
+
+    mode="sampling" samples the stacks of all threads (so retrieval legs running on worker threads are included)
+    and writes them in collapsed "frame;frame;frame count" format, ready for flame graph tools.
+    mode="cprofile" runs cProfile on the request thread and writes a .pstats file.
+    """
+
+    def __init__(self, threshold_seconds: float = 2.0, output_dir: str = "profiles", mode: str = "sampling", interval: float = 0.005):
+        if mode not in ("sampling", "cprofile"):
+            raise ValueError("mode must be 'sampling' or 'cprofile'.")
+        self.threshold_seconds = threshold_seconds
+        self.output_dir = output_dir
+        self.mode = mode
+        self.interval = interval
+        self.logger = logging.getLogger("SlowRequestProfiler")
+
+    @contextmanager
+    def profile(self, trace: Trace) -> Iterator[None]:
+        if self.mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                if trace.seconds >= self.threshold_seconds:
+                    path = self._path(trace, "pstats")
+                    pstats.Stats(profiler).dump_stats(path)
+                    self.logger.warning(f"Slow request ({trace.seconds:.2f}s); profile written to {path}")
+            return
+
+        stacks: Counter = Counter()
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(stacks, stop), name="slow-request-sampler", daemon=True)
+        sampler.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            sampler.join()
+            if trace.seconds >= self.threshold_seconds:
+                path = self._path(trace, "folded")
+                with open(path, "w", encoding="utf-8") as f:
+                    for stack, count in stacks.most_common():
+                        f.write(f"{stack} {count}\n")
+                self.logger.warning(f"Slow request ({trace.seconds:.2f}s); {sum(stacks.values())} stack samples written to {path}")
+
+    def _sample(self, stacks: Counter, stop: threading.Event) -> None:
+        own = threading.get_ident()
+        while not stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stacks[";".join(reversed(names))] += 1
+
+    def _path(self, trace: Trace, extension: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        return os.path.join(self.output_dir, f"{trace.name}-{int(time.time() * 1000)}.{extension}")
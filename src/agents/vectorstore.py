@@ -0,0 +1,609 @@
+import os
+import json
+import shutil
+import logging
+import threading
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from agents.chunkstore import ChunkStore
+
+# (chunk_id, text, metadata) of a stored chunk.
+StoredChunk = Tuple[str, str, Dict[str, Any]]
+VECTOR_DTYPES = ("float32", "int8")
+# int8 rows store round(v / max|v| * INT8_MAX) of the unit-normalized embedding, with max|v| / INT8_MAX kept per row.
+INT8_MAX = 127.0
+# Rows scored per matrix product in exact search, bounding temporary memory for large memory-mapped matrices.
+BLOCK_ROWS = 32768
+# On-disk layout version of NumpyStore; stores of another version are rebuilt.
+NUMPY_STORE_VERSION = 3
+# SQLite file Chroma keeps in its persist directory.
+CHROMA_DB_FILE = "chroma.sqlite3"
+
+
+class VectorStore(ABC):
+    """
+    Storage and nearest-neighbour search of chunk embeddings. PDFRetriever and IngestionPipeline only use this interface.
+    """
+
+    @abstractmethod
+    def add_texts(
+            self,
+            texts: List[str],
+            metadatas: Optional[List[Dict[str, Any]]] = None,
+            ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Embeds and stores texts; an existing chunk with the same id is replaced.
+        """
+
+    @abstractmethod
+    def delete(self, ids: List[str]) -> None:
+        pass
+
+    @abstractmethod
+    def reset(self) -> None:
+        """
+        Removes every stored chunk.
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        pass
+
+    def flush(self) -> None:
+        """
+        Persists pending writes (a no-op for stores that write through).
+        """
+
+    @abstractmethod
+    def get_by_ids(self, ids: List[str]) -> List[StoredChunk]:
+        """
+        Stored chunks with the given ids (unknown ids are skipped).
+        """
+
+    @abstractmethod
+    def iter_chunks(self, page_size: int = 5000) -> Iterator[StoredChunk]:
+        """
+        Every stored chunk, read page by page.
+        """
+
+    @abstractmethod
+    def query(self, query_embeddings: List[List[float]], k: int) -> List[List[StoredChunk]]:
+        """
+        The k most similar chunks of each query embedding, best first.
+        """
+
+
+class ChromaStore(VectorStore):
+    """
+    VectorStore on a persistent Chroma collection (through langchain_chroma).
+    """
+
+    def __init__(self, persist_dir: str, embedding):
+        from langchain_chroma import Chroma
+        self.db = Chroma(persist_directory=persist_dir, embedding_function=embedding)
+
+    @staticmethod
+    def exists(persist_dir: str) -> bool:
+        """
+        Whether persist_dir holds a Chroma database (without opening it).
+        """
+        return os.path.exists(os.path.join(persist_dir, CHROMA_DB_FILE))
+
+    def add_texts(self, texts, metadatas=None, ids=None) -> List[str]:
+        return self.db.add_texts(texts, metadatas=metadatas, ids=ids)
+
+    def delete(self, ids: List[str]) -> None:
+        self.db.delete(ids=ids)
+
+    def reset(self) -> None:
+        self.db.reset_collection()
+
+    def count(self) -> int:
+        return self.db._collection.count()
+
+    def get_by_ids(self, ids: List[str]) -> List[StoredChunk]:
+        return [(doc.id, doc.page_content, doc.metadata) for doc in self.db.get_by_ids(ids)]
+
+    def iter_chunks(self, page_size: int = 5000) -> Iterator[StoredChunk]:
+        offset = 0
+        while True:
+            page = self.db._collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                return
+            yield from zip(page["ids"], page["documents"], [meta or {} for meta in page["metadatas"]])
+            offset += len(page["ids"])
+
+    def query(self, query_embeddings: List[List[float]], k: int) -> List[List[StoredChunk]]:
+        # One collection query for all embeddings.
+        found = self.db._collection.query(
+            query_embeddings=query_embeddings,
+            n_results=k,
+            include=["documents", "metadatas"]
+        )
+        return [
+            list(zip(ids, texts, [meta or {} for meta in metas]))
+            for ids, texts, metas in zip(found["ids"], found["documents"], found["metadatas"])
+        ]
+
+
+class _Segment:
+    """
+    One immutable, memory-mapped part of a NumpyStore (see there), plus the set of its rows deleted since it was written.
+    """
+
+    def __init__(self, path: str, entry: Dict[str, Any], dtype: str):
+        """
+        :param path: Segment directory.
+        :param entry: The segment's entry in index.json (name, count, ivf and the file of deleted rows, if any).
+        """
+        self.path = path
+        self.name = entry["name"]
+        self.chunks = ChunkStore(path)
+        self.matrix = np.zeros((0, 0), dtype=dtype)
+        self.scales: Optional[np.ndarray] = None
+        self.ivf: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        if entry["count"]:
+            self.matrix = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+            if dtype == "int8":
+                self.scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r")
+        if entry["ivf"]:
+            self.ivf = tuple(
+                np.load(os.path.join(path, f"ivf_{name}.npy"), mmap_mode="r")
+                for name in ("centroids", "lists", "offsets")
+            )
+        self.deleted_file: Optional[str] = entry.get("deleted")
+        self.deleted = set()
+        if self.deleted_file:
+            self.deleted = set(np.load(os.path.join(path, self.deleted_file)).tolist())
+        # Whether deleted changed since it was last written.
+        self.deleted_changed = False
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def live(self) -> int:
+        return len(self) - len(self.deleted)
+
+    def live_row(self, cid: str) -> Optional[int]:
+        row = self.chunks.row_of(cid)
+        return row if row is not None and row not in self.deleted else None
+
+    def delete(self, row: int) -> None:
+        if row not in self.deleted:
+            self.deleted.add(row)
+            self.deleted_changed = True
+
+    def live_rows(self) -> np.ndarray:
+        rows = np.arange(len(self), dtype=np.int64)
+        return rows[~np.isin(rows, self.deleted_array())] if self.deleted else rows
+
+    def deleted_array(self) -> Optional[np.ndarray]:
+        return np.fromiter(self.deleted, dtype=np.int64, count=len(self.deleted)) if self.deleted else None
+
+    def entry(self) -> Dict[str, Any]:
+        return {"name": self.name, "count": len(self), "ivf": self.ivf is not None, "deleted": self.deleted_file}
+
+
+class NumpyStore(VectorStore):
+    """
+    In-process VectorStore: unit-normalized embeddings in memory-mapped .npy matrices (float32, or int8 with
+    a per-row scale for about a quarter of the size), with chunk ids, texts, filenames and pages in ChunkStores
+    (agents/chunkstore.py), row for row.
+
+    The store is a list of immutable segments. Added chunks are buffered and sealed into a new segment every
+    segment_rows chunks, so ingestion holds at most one segment's worth of vectors and texts in memory whatever
+    the corpus size. Replaced and deleted chunks are only marked as deleted in their segment. flush() seals the
+    buffer and compacts: segments with many deleted rows are rewritten and, above max_segments, the smallest
+    segments are merged, all streamed block by block from the memory-mapped files.
+
+    Search is an exact blocked matrix product over each segment. Segments of at least ann_threshold rows also get an
+    IVF index (spherical k-means centroids over the rows, with each row listed under its nearest centroid), and
+    queries then only score the rows listed under their nprobe nearest centroids. The per-segment hits are merged.
+
+    Sealed segments are searchable at once; flush() makes the state durable by atomically replacing index.json.
+    Layout of the store directory:
+    - index.json: layout version, dimension, dtype and the list of segments (row count, IVF, deleted rows file);
+    - seg-NNNNNN/: one segment: embeddings.npy (the (rows, dimension) matrix), scales.npy (per-row scale) for int8,
+      the ChunkStore of its rows (chunk_* files), ivf_centroids.npy, ivf_lists.npy (row numbers grouped by centroid)
+      and ivf_offsets.npy if built, and deleted-NNNNNN.npy (deleted row numbers) if any.
+    Files no longer listed in index.json (e.g. segments of an interrupted ingestion) are removed on flush.
+    """
+
+    def __init__(
+            self,
+            directory: str,
+            embedding,
+            dtype: str = "float32",
+            ann_threshold: int = 50000,
+            nprobe: int = 16,
+            segment_rows: int = 8192,
+            max_segments: int = 8
+    ):
+        """
+        :param directory: Store directory (created on first write).
+        :param embedding: Embeddings model (embed_documents) used by add_texts.
+        :param dtype: "float32" or "int8" (symmetric per-row quantization of the normalized vectors).
+        :param ann_threshold: Segments with at least this many vectors get an IVF index and approximate search.
+        :param nprobe: IVF lists scanned per query; higher is slower with better recall.
+        :param segment_rows: Buffered chunks sealed into a segment at once, bounding ingestion memory.
+        :param max_segments: Segments kept before flush() merges the smallest ones.
+        """
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"dtype must be one of {VECTOR_DTYPES}.")
+        self.directory = directory
+        self.embedding = embedding
+        self.dtype = dtype
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe
+        self.segment_rows = segment_rows
+        self.max_segments = max(max_segments, 1)
+        self.logger = logging.getLogger("NumpyStore")
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[str, Dict[str, Any], np.ndarray]] = {}
+        self._dirty = False
+        self._dim = 0
+        self._next_segment = 0
+        self._generation = 0
+        # Replaced, never mutated, so queries can take a snapshot without the lock.
+        self._segments: List[_Segment] = self._load()
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        """
+        Whether directory holds a flushed NumpyStore.
+        """
+        return os.path.exists(os.path.join(directory, "index.json"))
+
+    def _load(self) -> List[_Segment]:
+        index_path = os.path.join(self.directory, "index.json")
+        if not os.path.exists(index_path):
+            return []
+        with open(index_path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        if info.get("version") != NUMPY_STORE_VERSION or info["dtype"] != self.dtype:
+            # Rebuilt by the caller (PDFRetriever re-indexes when its settings change); replaced on the next flush.
+            self.logger.warning(
+                f"Vector store {self.directory} holds version {info.get('version', 1)} {info['dtype']} vectors, "
+                f"not version {NUMPY_STORE_VERSION} {self.dtype}; starting empty."
+            )
+            self._dirty = True
+            return []
+        self._dim = info["dim"]
+        self._next_segment = info["next_segment"]
+        self._generation = info["generation"]
+        return [_Segment(os.path.join(self.directory, entry["name"]), entry, self.dtype) for entry in info["segments"]]
+
+    def _quantize(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Matrix rows in the store dtype, and their scales (None for float32).
+        """
+        if self.dtype == "int8":
+            scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / INT8_MAX
+            return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return vectors.astype(np.float32), None
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    @staticmethod
+    def _scores(rows: np.ndarray, scales: Optional[np.ndarray], queries: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarities, shape (queries, rows).
+        """
+        scores = queries @ rows.astype(np.float32, copy=False).T
+        return scores * scales if scales is not None else scores
+
+    def add_texts(self, texts, metadatas=None, ids=None) -> List[str]:
+        if ids is None or len(ids) != len(texts):
+            raise ValueError("NumpyStore.add_texts needs one id per text.")
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = self._normalize(self.embedding.embed_documents(list(texts)))
+        with self._lock:
+            for cid, text, meta, vector in zip(ids, texts, metadatas, vectors):
+                self._delete_stored(cid)
+                self._pending[cid] = (text, meta, vector)
+            self._dirty = True
+            if len(self._pending) >= self.segment_rows:
+                self._seal()
+        return list(ids)
+
+    def _delete_stored(self, cid: str) -> None:
+        for segment in self._segments:
+            row = segment.live_row(cid)
+            if row is not None:
+                segment.delete(row)
+
+    def delete(self, ids: List[str]) -> None:
+        with self._lock:
+            for cid in ids:
+                self._pending.pop(cid, None)
+                self._delete_stored(cid)
+            self._dirty = True
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            for segment in self._segments:
+                for row in range(len(segment)):
+                    segment.delete(row)
+            self._dirty = True
+
+    def count(self) -> int:
+        with self._lock:
+            return sum(segment.live for segment in self._segments) + len(self._pending)
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            self._seal()
+            self._compact()
+            self._commit()
+            self._dirty = False
+
+    def _seal(self) -> None:
+        """
+        Writes the buffered chunks as a new segment.
+        """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        rows, scales = self._quantize(np.stack([vector for _, _, vector in pending.values()]))
+        chunks = ((cid, text, meta) for cid, (text, meta, _) in pending.items())
+        self._segments = self._segments + [self._write_segment(chunks, len(rows), rows.shape[1], [(rows, scales)])]
+
+    def _compact(self) -> None:
+        """
+        Drops fully deleted segments, rewrites segments with at least half of their rows deleted and merges
+        the smallest segments while there are more than max_segments.
+        """
+        segments = [segment for segment in self._segments if segment.live]
+        merge = [segment for segment in segments if len(segment.deleted) * 2 >= len(segment)]
+        rest = sorted((segment for segment in segments if segment not in merge), key=lambda segment: segment.live)
+        while rest and len(rest) + (1 if merge else 0) > self.max_segments:
+            merge.append(rest.pop(0))
+        if merge:
+            count = sum(segment.live for segment in merge)
+            live = [(segment, segment.live_rows()) for segment in merge]
+            chunks = (segment.chunks.chunk(int(row)) for segment, rows in live for row in rows)
+            blocks = (
+                (segment.matrix[rows[start:start + BLOCK_ROWS]],
+                 segment.scales[rows[start:start + BLOCK_ROWS]] if segment.scales is not None else None)
+                for segment, rows in live for start in range(0, len(rows), BLOCK_ROWS)
+            )
+            rest.append(self._write_segment(chunks, count, self._dim, blocks))
+            self.logger.info(f"Compacted {len(merge)} segments into one of {count} vectors.")
+        self._segments = rest
+
+    def _write_segment(
+            self,
+            chunks: Iterator[StoredChunk],
+            count: int,
+            dim: int,
+            blocks: Iterator[Tuple[np.ndarray, Optional[np.ndarray]]]
+    ) -> _Segment:
+        """
+        Writes a segment of count rows: chunks and matrix blocks (with their scales) must list the rows in the same order.
+        The matrix is filled block by block into a memory-mapped file, never held in memory as a whole.
+        """
+        name = f"seg-{self._next_segment:06d}"
+        self._next_segment += 1
+        path = os.path.join(self.directory, name)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        ChunkStore.write(path, chunks)
+        matrix = np.lib.format.open_memmap(os.path.join(path, "embeddings.npy"), mode="w+", dtype=self.dtype, shape=(count, dim))
+        scales = np.lib.format.open_memmap(
+            os.path.join(path, "scales.npy"), mode="w+", dtype=np.float32, shape=(count,)
+        ) if self.dtype == "int8" else None
+        offset = 0
+        for rows, row_scales in blocks:
+            matrix[offset:offset + len(rows)] = rows
+            if scales is not None:
+                scales[offset:offset + len(rows)] = row_scales
+            offset += len(rows)
+        ivf = self._build_ivf(matrix) if count >= self.ann_threshold else None
+        matrix.flush()
+        if scales is not None:
+            scales.flush()
+        del matrix, scales
+        if ivf is not None:
+            for array_name, array in zip(("centroids", "lists", "offsets"), ivf):
+                np.save(os.path.join(path, f"ivf_{array_name}.npy"), array)
+        self._dim = dim
+        return _Segment(path, {"name": name, "count": count, "ivf": ivf is not None}, self.dtype)
+
+    def _commit(self) -> None:
+        """
+        Writes the deleted rows that changed and atomically replaces index.json, then removes unlisted files.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._generation += 1
+        for segment in self._segments:
+            if segment.deleted_changed:
+                segment.deleted_file = f"deleted-{self._generation:06d}.npy"
+                np.save(os.path.join(segment.path, segment.deleted_file), np.array(sorted(segment.deleted), dtype=np.uint32))
+                segment.deleted_changed = False
+        index_path = os.path.join(self.directory, "index.json")
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "version": NUMPY_STORE_VERSION,
+                "dim": self._dim,
+                "dtype": self.dtype,
+                "next_segment": self._next_segment,
+                "generation": self._generation,
+                "segments": [segment.entry() for segment in self._segments],
+            }, f)
+        os.replace(index_path + ".tmp", index_path)
+
+        listed = {segment.name: segment for segment in self._segments}
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name == "index.json":
+                continue
+            if name not in listed:
+                # Memory-mapped files of dropped segments stay readable by queries still holding them.
+                shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+                continue
+            for file_name in os.listdir(path):
+                if file_name.startswith("deleted-") and file_name != listed[name].deleted_file:
+                    os.remove(os.path.join(path, file_name))
+
+    def _build_ivf(self, matrix: np.ndarray, iterations: int = 10) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Spherical k-means with about sqrt(rows) centroids, trained on a sample; every row is then listed under
+        its nearest centroid.
+        """
+        n = len(matrix)
+        nlist = int(min(max(np.sqrt(n), 16), 4096))
+        rng = np.random.default_rng(0)
+        # Rescaling is unnecessary: spherical k-means normalizes the sampled rows anyway.
+        sample = matrix[np.sort(rng.choice(n, size=min(n, 64 * nlist), replace=False))].astype(np.float32)
+        sample = self._normalize(sample)
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = np.bincount(assign, minlength=nlist) == 0
+            # Empty clusters keep their previous centroid.
+            sums[empty] = centroids[empty]
+            centroids = self._normalize(sums)
+
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, BLOCK_ROWS):
+            block = matrix[start:start + BLOCK_ROWS].astype(np.float32)
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        lists = np.argsort(assign, kind="stable").astype(np.uint32)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assign, minlength=nlist))
+        self.logger.info(f"Built IVF index: {nlist} lists over {n} vectors.")
+        return centroids, lists, offsets
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """
+        Memory held for the sealed rows: the chunk stores' (see ChunkStore.memory_stats) plus the matrix bytes.
+        """
+        segments = self._segments
+        parts = [segment.chunks.memory_stats() for segment in segments]
+        n = sum(part["chunks"] for part in parts)
+        arrays = sum(part["array_bytes"] for part in parts)
+        text = sum(part["text_bytes"] for part in parts)
+        return {
+            "chunks": n,
+            "segments": len(segments),
+            "array_bytes": arrays,
+            "text_bytes": text,
+            "array_bytes_per_chunk": round(arrays / n, 1) if n else 0.0,
+            "text_bytes_per_chunk": round(text / n, 1) if n else 0.0,
+            "matrix_bytes": sum(
+                int(segment.matrix.nbytes) + (int(segment.scales.nbytes) if segment.scales is not None else 0)
+                for segment in segments
+            ),
+        }
+
+    def get_by_ids(self, ids: List[str]) -> List[StoredChunk]:
+        segments = self._segments
+        found = []
+        for cid in ids:
+            for segment in reversed(segments):
+                row = segment.live_row(cid)
+                if row is not None:
+                    found.append(segment.chunks.chunk(row))
+                    break
+        return found
+
+    def iter_chunks(self, page_size: int = 5000) -> Iterator[StoredChunk]:
+        for segment in self._segments:
+            yield from segment.chunks.iter_chunks(skip=set(segment.deleted))
+        yield from ((cid, text, meta) for cid, (text, meta, _) in list(self._pending.items()))
+
+    def query(self, query_embeddings: List[List[float]], k: int) -> List[List[StoredChunk]]:
+        with self._lock:
+            segments = self._segments
+            deleted = [segment.deleted_array() for segment in segments]
+        if not query_embeddings:
+            return []
+        if not segments or k <= 0:
+            return [[] for _ in query_embeddings]
+        queries = self._normalize(query_embeddings)
+        # Per query: (scores, segment number, rows) of every segment's hits.
+        hits: List[List[Tuple[np.ndarray, int, np.ndarray]]] = [[] for _ in queries]
+        for number, (segment, segment_deleted) in enumerate(zip(segments, deleted)):
+            if not len(segment):
+                continue
+            if segment.ivf is not None:
+                found = [self._search_ivf(segment, query, k, segment_deleted) for query in queries]
+            else:
+                found = self._search_exact(segment.matrix, segment.scales, queries, k, segment_deleted)
+            for query_hits, (rows, scores) in zip(hits, found):
+                query_hits.append((scores, number, rows))
+
+        results = []
+        for query_hits in hits:
+            scores = np.concatenate([scores for scores, _, _ in query_hits])
+            numbers = np.concatenate([np.full(len(rows), number) for _, number, rows in query_hits])
+            rows = np.concatenate([rows for _, _, rows in query_hits])
+            top = np.argsort(-scores, kind="stable")[:k]
+            # Only the returned chunks are decoded from the chunk stores.
+            results.append([segments[numbers[i]].chunks.chunk(int(rows[i])) for i in top])
+        return results
+
+    def _search_exact(
+            self,
+            matrix: np.ndarray,
+            scales: Optional[np.ndarray],
+            queries: np.ndarray,
+            k: int,
+            deleted: Optional[np.ndarray]
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        The up to k best (rows, scores) of each query, best first.
+        """
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(matrix), BLOCK_ROWS):
+            block_scales = scales[start:start + BLOCK_ROWS] if scales is not None else None
+            scores = self._scores(matrix[start:start + BLOCK_ROWS], block_scales, queries)
+            rows = np.arange(start, start + scores.shape[1])
+            if deleted is not None:
+                scores[:, np.isin(rows, deleted)] = -np.inf
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(rows, (len(queries), len(rows)))], axis=1)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                rows = np.take_along_axis(rows, top, axis=1)
+            best_scores, best_rows = scores, rows
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        kept = best_scores > -np.inf
+        return [(rows[mask], scores[mask]) for rows, scores, mask in zip(best_rows, best_scores, kept)]
+
+    def _search_ivf(
+            self,
+            segment: _Segment,
+            query: np.ndarray,
+            k: int,
+            deleted: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        centroids, lists, offsets = segment.ivf
+        nprobe = min(self.nprobe, len(centroids))
+        probe = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.sort(np.concatenate([lists[offsets[c]:offsets[c + 1]] for c in probe]).astype(np.int64))
+        if deleted is not None:
+            rows = rows[~np.isin(rows, deleted)]
+        if not len(rows):
+            return rows, np.zeros(0, dtype=np.float32)
+        scales = segment.scales[rows] if segment.scales is not None else None
+        scores = self._scores(segment.matrix[rows], scales, query[None, :])[0]
+        top = np.argpartition(-scores, min(k, len(rows)) - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return rows[top], scores[top]
@@ -1,29 +1,108 @@
 import os
+import json
+import time
+import random
 import requests
 import logging
+from requests.adapters import HTTPAdapter
 from typing import List, Dict, Any, Optional
+from agents.cache import DiskTTLCache
+from agents.telemetry import Trace, maybe_span
+
+SERPAPI_ENDPOINT = "https://serpapi.com/search"
+# Responses worth retrying: rate limiting and transient server errors.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
 
 class WebSearcher:
     """
     Searches the web using SerpAPI and returns structured, citable results.
+    Uses a pooled keep-alive HTTP session, retries transient failures with jittered backoff
+    and optionally caches results on disk.
     """
 
-    def __init__(self, serpapi_api_key: Optional[str] = None, engine: str = "google"):
+    def __init__(
+            self,
+            serpapi_api_key: Optional[str] = None,
+            engine: str = "google",
+            endpoint: str = SERPAPI_ENDPOINT,
+            timeout: float = 10,
+            max_retries: int = 2,
+            backoff: float = 0.5,
+            pool_size: int = 8,
+            cache_path: Optional[str] = None,
+            cache_ttl: float = 24 * 3600
+    ):
         """
         :param serpapi_api_key: API key for SerpAPI (or use SERPAPI_API_KEY environment variable)
         :param engine: Search engine type (default: 'google')
+        :param endpoint: Search endpoint URL (override to point at a local stub server).
+        :param timeout: Per-attempt request timeout in seconds.
+        :param max_retries: Retries after the first attempt on connection errors, timeouts, 429 and 5xx.
+        :param backoff: Base delay in seconds; retry i sleeps a random time in [0, backoff * 2**i].
+        :param pool_size: Keep-alive connections kept open to the endpoint.
+        :param cache_path: If set, SQLite file caching results per (engine, query, num_results).
+        :param cache_ttl: Seconds a cached result stays valid.
         """
         self.serpapi_api_key = serpapi_api_key or os.getenv("SERPAPI_API_KEY")
         if not self.serpapi_api_key:
             raise ValueError("You must provide a SerpAPI API key via argument or SERPAPI_API_KEY env variable.")
         self.engine = engine
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
         self.logger = logging.getLogger("WebSearcher")
 
-    def search(self, query: str, num_results: int = 3) -> List[Dict[str, Any]]:
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.cache = DiskTTLCache(cache_path, ttl_seconds=cache_ttl) if cache_path else None
+
+    def _cache_key(self, query: str, num_results: int) -> str:
+        return json.dumps([self.engine, " ".join(query.lower().split()), num_results])
+
+    def _get(self, params: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        GETs the endpoint, retrying transient failures with jittered exponential backoff.
+        With a deadline (a time.perf_counter() value), attempts are cut to the time left and retries
+        that could not start before it are not made.
+        """
+        for attempt in range(self.max_retries + 1):
+            timeout = self.timeout
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.perf_counter())
+                if timeout <= 0:
+                    raise requests.Timeout("Web search deadline passed.")
+            try:
+                response = self.session.get(self.endpoint, params=params, timeout=timeout)
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response.json()
+                reason = f"HTTP {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                reason = str(e)
+            delay = random.uniform(0, self.backoff * (2 ** attempt))
+            if deadline is not None and time.perf_counter() + delay >= deadline:
+                raise requests.Timeout(f"Web search attempt {attempt + 1} failed ({reason}); no time left to retry.")
+            self.logger.warning(f"Web search attempt {attempt + 1} failed ({reason}); retrying in {delay:.2f}s.")
+            time.sleep(delay)
+
+    def search(
+            self,
+            query: str,
+            num_results: int = 3,
+            trace: Optional[Trace] = None,
+            deadline: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
         """
         Searches the web via SerpAPI.
         :param query: Query string to search.
         :param num_results: Number of top results to return.
+        :param deadline: time.perf_counter() value the search must finish by, retries included.
         :return: List of result dicts, each with title, snippet, url, and citation info.
         """
         if not query or not isinstance(query, str):
@@ -31,6 +110,13 @@ class WebSearcher:
         if not (1 <= num_results <= 10):
             raise ValueError("num_results must be between 1 and 10.")
 
+        if self.cache is not None:
+            cached = self.cache.get(self._cache_key(query, num_results))
+            if trace is not None:
+                trace.incr("web_cache_hits" if cached is not None else "web_cache_misses")
+            if cached is not None:
+                return cached
+
         params = {
             "engine": self.engine,
             "q": query,
@@ -41,9 +127,8 @@ class WebSearcher:
         }
 
         try:
-            response = requests.get("https://serpapi.com/search", params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            with maybe_span(trace, "web_search"):
+                data = self._get(params, deadline=deadline)
         except requests.RequestException as e:
             self.logger.error(f"Web search failed: {e}")
             raise RuntimeError(f"Web search failed: {e}")
@@ -72,6 +157,7 @@ class WebSearcher:
 
         if not results:
             self.logger.warning(f"No results found for query: '{query}'")
+        elif self.cache is not None:
+            self.cache.put(self._cache_key(query, num_results), results)
 
         return list(results)  # Return a shallow copy
-
@@ -0,0 +1,190 @@
+"""
+Chunk record memory benchmark: heap bytes per chunk of the numpy vector store's chunk records, before and after
+the ChunkStore, and the cost of reading chunks from it rather than from Chroma's documents.
+
+Run from src/:
+    python -m benchmarks.chunkstore --chunks 10000 100000 --output chunkstore.json
+
+For every chunk count it writes synthetic chunks (ingestion's id, text size and metadata shapes) and reports:
+- jsonl_*: the numpy store's layout before the ChunkStore, a chunks.jsonl sidecar loaded into lists of ids, texts
+  and metadata dicts plus an id -> row dict;
+- chunkstore_*: the ChunkStore arrays, after an id lookup (which builds its sorted id index);
+- text_mapped_bytes_per_chunk: the memory-mapped text blob, paged in by the OS on demand rather than held on the heap;
+- lookup_us / read_us: time to find one chunk by id and to decode one chunk;
+- chroma_* (only if langchain_chroma is installed): the Chroma path, where chunk texts and metadata live in the
+  collection and every read materializes LangChain Documents. Its records are not held on the Python heap, so it
+  is compared per read instead: chroma_read_us and chroma_read_heap_bytes_per_chunk (peak heap of fetching
+  READ_K chunks by id, per chunk) against chunkstore_batch_read_us and chunkstore_read_heap_bytes_per_chunk.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import tracemalloc
+from typing import List, Dict, Any, Optional, Iterator
+
+from agents.chunkstore import ChunkStore
+from agents.vectorstore import ChromaStore
+from benchmarks.synthetic import BigramText
+
+# Chunks fetched per read in the Chroma comparison, as many as a query passes to the prompt by default.
+READ_K = 4
+# Chunks per Chroma add call, below its maximum batch size.
+CHROMA_BATCH = 1000
+
+SEED_TEXT = (
+    "Dopamine neurons in the ventral tegmental area signal reward prediction errors. The striatum receives "
+    "dopaminergic input and supports learning from reward. Phasic firing follows unexpected rewards, while "
+    "tonic levels modulate motivation and effort. Receptor subtypes shape the response of striatal neurons."
+)
+
+
+def synthetic_chunks(n: int, chunk_words: int = 150, chunks_per_page: int = 3, pages_per_file: int = 14) -> Iterator:
+    generator = BigramText(SEED_TEXT, seed=0)
+    # A pool of texts keeps generation time out of the way; stored texts are still distinct objects.
+    pool = [generator.generate(chunk_words) for _ in range(64)]
+    for i in range(n):
+        file_index, page_index = divmod(i // chunks_per_page, pages_per_file)
+        file_hash = hashlib.sha256(str(file_index).encode()).hexdigest()
+        cid = f"{file_hash}:{i}"
+        yield cid, f"{pool[i % len(pool)]} ({i})", {"filename": f"paper-{file_index:05d}.pdf", "page": page_index}
+
+
+def heap_bytes(load) -> tuple:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    loaded = load()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return loaded, after - before
+
+
+def peak_heap_bytes(fn) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak - before
+
+
+def load_jsonl(path: str) -> Dict[str, Any]:
+    state = {"ids": [], "texts": [], "metadatas": []}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            chunk = json.loads(line)
+            state["ids"].append(chunk["id"])
+            state["texts"].append(chunk["text"])
+            state["metadatas"].append(chunk["metadata"])
+    state["row_of"] = {cid: row for row, cid in enumerate(state["ids"])}
+    return state
+
+
+def load_chunkstore(directory: str, probe: str) -> ChunkStore:
+    store = ChunkStore(directory)
+    store.row_of(probe)
+    return store
+
+
+def write_chroma(directory: str, n: int) -> Optional[ChromaStore]:
+    """
+    The chunks in a Chroma collection, with fixed placeholder embeddings; None if langchain_chroma is not installed.
+    """
+    try:
+        store = ChromaStore(directory, embedding=None)
+    except ImportError:
+        return None
+    chunks = list(synthetic_chunks(n))
+    for start in range(0, n, CHROMA_BATCH):
+        batch = chunks[start:start + CHROMA_BATCH]
+        store.db._collection.add(
+            ids=[cid for cid, _, _ in batch],
+            documents=[text for _, text, _ in batch],
+            metadatas=[metadata for _, _, metadata in batch],
+            embeddings=[[1.0, float(i % 7), float(i % 11)] for i in range(start, start + len(batch))]
+        )
+    return store
+
+
+def per_call_us(fn, number: int = 10000) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return round((time.perf_counter() - start) / number * 1e6, 3)
+
+
+def measure(n: int, work_dir: str) -> Dict[str, Any]:
+    directory = os.path.join(work_dir, f"chunks-{n}")
+    os.makedirs(directory)
+    jsonl_path = os.path.join(directory, "chunks.jsonl")
+    with open(jsonl_path, "w", encoding="utf-8") as f:
+        for cid, text, metadata in synthetic_chunks(n):
+            f.write(json.dumps({"id": cid, "text": text, "metadata": metadata}) + "\n")
+    ChunkStore.write(directory, synthetic_chunks(n))
+    probe = next(synthetic_chunks(1))[0]
+
+    legacy, legacy_bytes = heap_bytes(lambda: load_jsonl(jsonl_path))
+    store, store_bytes = heap_bytes(lambda: load_chunkstore(directory, probe))
+    # Same chunks either way, page numbers included.
+    row = n // 2
+    cid = store.chunk_id(row)
+    assert store.chunk(row) == (legacy["ids"][row], legacy["texts"][row], legacy["metadatas"][row])
+    results = {
+        "jsonl_heap_bytes_per_chunk": round(legacy_bytes / n, 1),
+        "chunkstore_heap_bytes_per_chunk": round(store_bytes / n, 1),
+        "reduction": round(legacy_bytes / max(store_bytes, 1), 1),
+        "text_mapped_bytes_per_chunk": store.memory_stats()["text_bytes_per_chunk"],
+        "jsonl_lookup_us": per_call_us(lambda: legacy["row_of"].get(cid)),
+        "chunkstore_lookup_us": per_call_us(lambda: store.row_of(cid)),
+        "jsonl_read_us": per_call_us(lambda: (legacy["ids"][row], legacy["texts"][row], legacy["metadatas"][row])),
+        "chunkstore_read_us": per_call_us(lambda: store.chunk(row)),
+    }
+
+    chroma = write_chroma(os.path.join(directory, "chroma"), n)
+    if chroma is None:
+        print("langchain_chroma is not installed: skipping the Chroma comparison.", file=sys.stderr)
+    else:
+        read_ids = [store.chunk_id(row + i) for i in range(READ_K)]
+        read_chroma = lambda: chroma.get_by_ids(read_ids)
+        read_store = lambda: [store.chunk(store.row_of(cid)) for cid in read_ids]
+        assert sorted(read_chroma()) == sorted(read_store())
+        results.update({
+            "chroma_read_us": round(per_call_us(read_chroma, number=1000) / READ_K, 3),
+            "chunkstore_batch_read_us": round(per_call_us(read_store, number=1000) / READ_K, 3),
+            "chroma_read_heap_bytes_per_chunk": round(peak_heap_bytes(read_chroma) / READ_K, 1),
+            "chunkstore_read_heap_bytes_per_chunk": round(peak_heap_bytes(read_store) / READ_K, 1),
+        })
+    del legacy, store, chroma
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Measure chunk record memory per chunk")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10000, 100000], help="Chunk counts")
+    parser.add_argument("--work-dir", help="Directory for the generated files (default: a temporary one)")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="chunkstore-bench-")
+    results: Dict[str, Any] = {"python": sys.version.split()[0], "chunks": {}}
+    try:
+        for n in args.chunks:
+            results["chunks"][str(n)] = measure(n, work_dir)
+            print(f"{n} chunks: {results['chunks'][str(n)]}", file=sys.stderr)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Embedding backend benchmark: ingest throughput, query latency and agreement of each embedding backend
+against the current one (PyTorch, float32).
+
+Run from src/:
+    python -m benchmarks.embedding --backends torch onnx onnx-int8 --threads 4 --output embedding.json
+
+Every backend embeds the chunks of the papers (split as ingestion does) and the labeled benchmark questions,
+and reports:
+- load_seconds: time to load the model;
+- ingest: chunks per second when embedding all chunks (best of --repeats);
+- query_ms: single-query embed_query latency percentiles;
+- agreement with the first backend: cosine similarity of the chunk vectors, overlap of every question's top-k
+  chunks, the fingerprint similarity and whether the index guard accepts the backend for the first one's index.
+A backend that cannot be loaded (e.g. without onnxruntime) is reported with its error.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+from agents.ingestion import parse_pdf
+from agents.retriever import PDFRetriever, MIN_FINGERPRINT_SIMILARITY
+from benchmarks.suite import DEFAULT_QUESTIONS, load_questions, percentiles
+
+# name: (embedding_backend, embedding_quantize)
+BACKENDS = {
+    "torch": ("torch", False),
+    "torch-int8": ("torch", True),
+    "onnx": ("onnx", False),
+    "onnx-int8": ("onnx", True),
+}
+
+
+def chunk_texts(papers_dir: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    texts = []
+    for path in sorted(glob.glob(os.path.join(papers_dir, "*.pdf"))):
+        for _, text in parse_pdf(path):
+            texts.extend(splitter.split_text(text))
+    return texts
+
+
+def normalized(vectors: List[List[float]]) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def measure(
+        retriever: PDFRetriever,
+        texts: List[str],
+        questions: List[str],
+        repeats: int
+) -> Dict[str, Any]:
+    start = time.perf_counter()
+    retriever.embedder_fingerprint()
+    load_seconds = time.perf_counter() - start
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        vectors = retriever.embedding.embed_documents(texts)
+        best = min(best, time.perf_counter() - start)
+    latencies, query_vectors = [], []
+    for question in questions * repeats:
+        start = time.perf_counter()
+        vector = retriever.embedding.embed_query(question)
+        latencies.append(time.perf_counter() - start)
+        query_vectors.append(vector)
+    return {
+        "load_seconds": round(load_seconds, 3),
+        "ingest": {"chunks": len(texts), "seconds": round(best, 3), "chunks_per_second": round(len(texts) / best, 1)},
+        "query_ms": percentiles(latencies),
+        "_chunks": normalized(vectors),
+        "_queries": normalized(query_vectors[:len(questions)]),
+    }
+
+
+def agreement(baseline: Dict[str, Any], result: Dict[str, Any], top_k: int) -> Dict[str, Any]:
+    cosines = (baseline["_chunks"] * result["_chunks"]).sum(axis=1)
+    overlaps = []
+    for base_query, query in zip(baseline["_queries"], result["_queries"]):
+        base_top = set(np.argsort(-(baseline["_chunks"] @ base_query))[:top_k])
+        top = set(np.argsort(-(result["_chunks"] @ query))[:top_k])
+        overlaps.append(len(base_top & top) / top_k)
+    similarity = PDFRetriever.fingerprint_similarity(baseline["fingerprint"], result["fingerprint"])
+    return {
+        "chunk_cosine_mean": round(float(cosines.mean()), 4),
+        "chunk_cosine_min": round(float(cosines.min()), 4),
+        f"top{top_k}_overlap": round(float(np.mean(overlaps)), 4),
+        "fingerprint_similarity": round(similarity, 4),
+        "index_compatible": similarity >= MIN_FINGERPRINT_SIMILARITY,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Compare embedding backends")
+    parser.add_argument("--papers-dir", default="papers")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS)
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS),
+                        help="Backends to compare; agreement is measured against the first")
+    parser.add_argument("--threads", type=int, help="CPU threads for embedding inference")
+    parser.add_argument("--batch-size", type=int, default=32, help="Texts encoded per forward pass")
+    parser.add_argument("--chunk-size", type=int, default=800)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    texts = chunk_texts(args.papers_dir, args.chunk_size, args.chunk_overlap)
+    questions = [record["question"] for record in load_questions(args.questions)]
+    results: Dict[str, Any] = {
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "backends": {},
+    }
+    baseline = None
+    with tempfile.TemporaryDirectory(prefix="embedding-bench-") as persist_dir:
+        for name in args.backends:
+            backend, quantize = BACKENDS[name]
+            retriever = PDFRetriever(
+                args.papers_dir,
+                persist_dir,
+                embedding_model=args.embedding_model,
+                embedding_backend=backend,
+                embedding_quantize=quantize,
+                embedding_threads=args.threads,
+                embedding_batch_size=args.batch_size
+            )
+            print(f"[{name}] embedding {len(texts)} chunks", file=sys.stderr)
+            try:
+                result = measure(retriever, texts, questions, args.repeats)
+            except Exception as e:
+                results["backends"][name] = {"error": str(e)}
+                print(f"[{name}] failed: {e}", file=sys.stderr)
+                continue
+            result["fingerprint"] = retriever.embedder_fingerprint()
+            if baseline is None:
+                baseline = result
+            result["agreement"] = agreement(baseline, result, args.top_k)
+            results["backends"][name] = {key: value for key, value in result.items() if not key.startswith("_")}
+            del results["backends"][name]["fingerprint"]
+
+    if baseline is not None:
+        base = baseline["ingest"]["chunks_per_second"], baseline["query_ms"]["p50"]
+        for result in results["backends"].values():
+            if "error" not in result:
+                result["ingest_speedup"] = round(result["ingest"]["chunks_per_second"] / base[0], 2)
+                result["query_p50_speedup"] = round(base[1] / max(result["query_ms"]["p50"], 1e-6), 2)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Load test for the HTTP server (python -m interface.cli serve).
+
+Run from src/, without API keys, against stub LLM and search APIs:
+    python -m benchmarks.stubs &
+    OPENAI_BASE_URL=http://127.0.0.1:9001/v1 OPENAI_API_KEY=stub SERPAPI_API_KEY=stub \
+        python -m interface.cli serve --search-endpoint http://127.0.0.1:9002/search &
+    python -m benchmarks.load --users 32 --requests 500 --output load.json
+
+Each simulated user keeps its own session and asks the labeled benchmark questions in turn, one at a time
+(closed loop); --rate switches to an open loop that sends requests at a fixed rate regardless of responses,
+which is how overload (503s) shows up. Reports throughput, latency percentiles of successful requests and
+the count of every status code.
+"""
+import json
+import time
+import asyncio
+import argparse
+import itertools
+from typing import List, Dict, Any, Optional
+
+import aiohttp
+
+from benchmarks.suite import DEFAULT_QUESTIONS, load_questions, percentiles
+
+
+async def ask(
+        session: aiohttp.ClientSession,
+        url: str,
+        question: str,
+        session_id: str,
+        results: Dict[str, Any]
+) -> None:
+    start = time.perf_counter()
+    try:
+        async with session.post(f"{url}/ask", json={"question": question, "session_id": session_id}) as response:
+            await response.read()
+            status = str(response.status)
+    except aiohttp.ClientError as e:
+        status = type(e).__name__
+    elapsed = time.perf_counter() - start
+    results["statuses"][status] = results["statuses"].get(status, 0) + 1
+    if status == "200":
+        results["latencies"].append(elapsed)
+
+
+async def closed_loop(url: str, questions: List[str], users: int, requests: int, results: Dict[str, Any]) -> None:
+    counter = itertools.count()
+
+    async def user(session: aiohttp.ClientSession, user_id: int) -> None:
+        while (n := next(counter)) < requests:
+            await ask(session, url, questions[n % len(questions)], f"load-{user_id}", results)
+
+    connector = aiohttp.TCPConnector(limit=users)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(user(session, i) for i in range(users)))
+
+
+async def open_loop(url: str, questions: List[str], rate: float, requests: int, results: Dict[str, Any]) -> None:
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        tasks = []
+        start = time.perf_counter()
+        for n in range(requests):
+            delay = start + n / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(ask(session, url, questions[n % len(questions)], f"load-{n}", results)))
+        await asyncio.gather(*tasks)
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Load test the HTTP server")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS)
+    parser.add_argument("--users", type=int, default=16, help="Concurrent users (closed loop)")
+    parser.add_argument("--rate", type=float, help="Requests per second (open loop) instead of --users")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    questions = [record["question"] for record in load_questions(args.questions)]
+    results: Dict[str, Any] = {"statuses": {}, "latencies": []}
+    start = time.perf_counter()
+    if args.rate:
+        asyncio.run(open_loop(args.url, questions, args.rate, args.requests, results))
+    else:
+        asyncio.run(closed_loop(args.url, questions, args.users, args.requests, results))
+    seconds = time.perf_counter() - start
+
+    latencies = results.pop("latencies")
+    report = {
+        "url": args.url,
+        "mode": f"open loop at {args.rate}/s" if args.rate else f"closed loop with {args.users} users",
+        "requests": args.requests,
+        "seconds": round(seconds, 3),
+        "throughput_per_second": round(len(latencies) / seconds, 3),
+        "statuses": results["statuses"],
+        "latency_ms": percentiles(latencies) if latencies else None,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Meta-question router benchmark: routing overhead per question as the session grows.
+
+Run from src/:
+    python -m benchmarks.router --lengths 10 1000 100000 --output router.json
+
+For every session length it reports, in microseconds per call:
+- route_regular: routing a regular (RAG) question, i.e. the overhead every question pays;
+- answer_<intent>: MetaRouter.answer on each built-in meta question, end to end as Crew.handle_question calls it
+  (routing, history reads and the response's bounded "memory" window included);
+- full_history_copy: reading the whole history, which the router no longer does for any response.
+"""
+import sys
+import json
+import timeit
+import argparse
+from typing import List, Dict, Any, Optional
+
+from agents.memory import MemoryKeeper
+from agents.router import default_router
+
+REGULAR_QUESTIONS = [
+    "What is dopamine's function in the brain?",
+    "How do dopamine neurons respond to reward prediction errors in the ventral tegmental area?",
+    "Is digital detox part of the dopamine fasting concept?",
+]
+META_QUESTIONS = {
+    "ordinal_question": "What was the third question?",
+    "numbered_question": "What was the 7th question?",
+    "last_question": "What was my last question?",
+    "last_answer": "What was the last answer?",
+    "previous_questions": "List questions",
+    "summarize_conversation": "Please summarize our conversation",
+}
+# Listing or summarizing the whole session is linear in its length by nature; timed only up to this length.
+LINEAR_INTENT_MAX_LENGTH = 10000
+
+
+def per_call_us(fn) -> float:
+    """
+    Best of three timing runs of at least 0.2s each.
+    """
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return round(min(timer.repeat(repeat=3, number=number)) / number * 1e6, 3)
+
+
+def fill(memory: MemoryKeeper, session_id: str, length: int) -> None:
+    memory.import_memory(
+        [
+            {"question": f"Question {i} about dopamine?", "answer": f"Answer {i}, citing [1] and [W1].",
+             "sources": [{"filename": "paper.pdf", "page": str(i % 20)}]}
+            for i in range(length)
+        ],
+        session_id=session_id
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Measure meta-question routing overhead")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 1000, 100000], help="Session lengths (turns)")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    router = default_router()
+    memory = MemoryKeeper()
+    results: Dict[str, Any] = {"python": sys.version.split()[0], "unit": "microseconds per call", "sessions": {}}
+    for length in args.lengths:
+        session_id = f"bench-{length}"
+        fill(memory, session_id, length)
+        timings = {
+            "route_regular": max(per_call_us(lambda q=q: router.route(q)) for q in REGULAR_QUESTIONS),
+            "answer_regular": max(per_call_us(lambda q=q: router.answer(q, memory, session_id)) for q in REGULAR_QUESTIONS),
+        }
+        for intent, question in META_QUESTIONS.items():
+            if intent in ("previous_questions", "summarize_conversation") and length > LINEAR_INTENT_MAX_LENGTH:
+                continue
+            timings[f"answer_{intent}"] = per_call_us(lambda q=question: router.answer(q, memory, session_id))
+        if length <= LINEAR_INTENT_MAX_LENGTH:
+            timings["full_history_copy"] = per_call_us(lambda: memory.get_history(session_id=session_id))
+        results["sessions"][str(length)] = timings
+        print(f"{length} turns: " + ", ".join(f"{k} {v}us" for k, v in timings.items()), file=sys.stderr)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
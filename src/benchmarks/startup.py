@@ -0,0 +1,121 @@
+"""
+Startup benchmark: time from launching the CLI to its first prompt, and to the answer of a first question.
+
+Run from src/:
+    python -m benchmarks.startup --runs 5 --output startup.json
+
+Each mode starts `python -m interface.cli` in a fresh process (so imports and model loads are cold within it),
+waits for the prompt, asks one question, waits for the next prompt and exits. By default the question is a meta
+question, which should never need the index, embedding model or LLM; pass --question for a regular one.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import statistics
+from typing import List, Dict, Any, Optional
+
+PROMPT = b"Ask a question about dopamine: "
+MODES = {
+    "lazy": [],
+    "no-build": ["--no-build"],
+    "warm": ["--warm"],
+    "warm-no-build": ["--warm", "--no-build"],
+}
+
+
+def read_until(stream, marker: bytes, timeout: float) -> bytes:
+    """
+    Reads the unbuffered stream until marker appears (the prompt has no trailing newline, so read byte-wise).
+    """
+    deadline = time.perf_counter() + timeout
+    data = b""
+    while not data.endswith(marker):
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"No prompt within {timeout}s; output so far: {data[-500:]!r}")
+        byte = stream.read(1)
+        if not byte:
+            raise RuntimeError(f"CLI exited before prompting; output so far: {data[-500:]!r}")
+        data += byte
+    return data
+
+
+def run_once(flags: List[str], question: str, timeout: float) -> Dict[str, float]:
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    # WebSearcher refuses to start without a key; no search is made for meta questions.
+    env.setdefault("SERPAPI_API_KEY", "benchmark")
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "interface.cli", *flags],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        env=env
+    )
+    try:
+        read_until(process.stdout, PROMPT, timeout)
+        to_prompt = time.perf_counter() - start
+        asked = time.perf_counter()
+        process.stdin.write(question.encode() + b"\n")
+        process.stdin.flush()
+        read_until(process.stdout, PROMPT, timeout)
+        to_answer = time.perf_counter() - asked
+        process.stdin.write(b"exit\n")
+        process.stdin.flush()
+        process.wait(timeout=timeout)
+    finally:
+        if process.poll() is None:
+            process.kill()
+    return {"time_to_prompt": to_prompt, "first_answer": to_answer, "total": time.perf_counter() - start}
+
+
+def import_seconds() -> float:
+    """
+    Wall time of a fresh interpreter importing the CLI module (includes interpreter start-up).
+    """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import interface.cli"], check=True)
+    return time.perf_counter() - start
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "median": round(statistics.median(samples), 4),
+        "min": round(min(samples), 4),
+        "max": round(max(samples), 4),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Measure CLI time-to-prompt")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=sorted(MODES))
+    parser.add_argument("--question", default="What was the first question?")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Any] = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "question": args.question,
+        "import_seconds": summarize([import_seconds() for _ in range(args.runs)]),
+        "modes": {},
+    }
+    for mode in args.modes:
+        runs = [run_once(MODES[mode], args.question, args.timeout) for _ in range(args.runs)]
+        results["modes"][mode] = {key: summarize([run[key] for run in runs]) for key in runs[0]}
+        print(f"{mode}: time to prompt {results['modes'][mode]['time_to_prompt']['median']:.3f}s, "
+              f"first answer {results['modes'][mode]['first_answer']['median']:.3f}s", file=sys.stderr)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Local stand-ins for the OpenAI chat completions API and SerpAPI, so end-to-end latency can be measured
+without network calls, API keys or quota. Both reply after a configurable fixed latency; the SerpAPI stub
+can also fail its first requests, to exercise retries.
+"""
+import json
+import time
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, Tuple
+
+# Cites the first PDF and web chunk, so citation parsing does real work.
+STUB_ANSWER_TOKENS = ["Dopamine ", "neurons signal ", "reward prediction ", "errors [", "1] ", "[W", "1]."]
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class OpenAIStubHandler(_QuietHandler):
+    """
+    POST .../chat/completions, streaming or not. The latency is spread over the streamed tokens.
+    If fail_after is set, a stream sends an error event after that many tokens instead of the rest.
+    """
+    tokens = STUB_ANSWER_TOKENS
+    fail_after: Optional[int] = None
+
+    def do_POST(self) -> None:
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt_tokens = sum(len(m.get("content", "").split()) for m in request.get("messages", []))
+        if not request.get("stream"):
+            time.sleep(self.latency)
+            self._send_json({
+                "id": "stub", "object": "chat.completion", "created": 0, "model": request.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(self.tokens)},
+                    "finish_reason": "stop"
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(self.tokens),
+                    "total_tokens": prompt_tokens + len(self.tokens)
+                },
+            })
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        try:
+            for i, token in enumerate(self.tokens):
+                if i == self.fail_after:
+                    error = {"error": {"message": "Stub stream failure.", "type": "server_error", "code": None}}
+                    self.wfile.write(f"data: {json.dumps(error)}\n\n".encode())
+                    return
+                time.sleep(self.latency / len(self.tokens))
+                chunk = {
+                    "id": "stub", "object": "chat.completion.chunk", "created": 0, "model": request.get("model", "stub"),
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early (e.g. a cancelled speculative draft).
+            pass
+
+
+class SerpAPIStubHandler(_QuietHandler):
+    """
+    GET /search?q=...&num=... in SerpAPI's response shape. The first requests are answered with the HTTP
+    statuses in fail_statuses, one each (e.g. (429, 503) fails twice, then serves results).
+    """
+    fail_statuses: Tuple[int, ...] = ()
+
+    def do_GET(self) -> None:
+        with self.server.lock:
+            self.server.requests += 1
+            request_number = self.server.requests
+        if request_number <= len(self.fail_statuses):
+            time.sleep(self.latency)
+            status = self.fail_statuses[request_number - 1]
+            self._send_json({"error": f"Stub failure {request_number} (HTTP {status})."}, status=status)
+            return
+        params = parse_qs(urlparse(self.path).query)
+        query = params.get("q", [""])[0]
+        num = int(params.get("num", ["3"])[0])
+        time.sleep(self.latency)
+        self._send_json({"organic_results": [
+            {
+                "title": f"Result {i + 1} for {query}",
+                "link": f"https://example.org/{i + 1}",
+                "snippet": f"A web snippet about {query}, ranked {i + 1}."
+            }
+            for i in range(num)
+        ]})
+
+
+class StubServer:
+    """
+    Serves one stub handler on a local port (default: any free one) from a daemon thread. Use as a context manager.
+    """
+
+    def __init__(self, handler: type, latency: float = 0.0, port: int = 0, **attributes: Any):
+        """
+        :param attributes: Handler class attributes to override, e.g. fail_statuses of SerpAPIStubHandler.
+        """
+        handler = type(handler.__name__, (handler,), dict(attributes, latency=latency))
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.server.daemon_threads = True
+        # Requests received so far, counted by handlers that need it.
+        self.server.requests = 0
+        self.server.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def requests(self) -> int:
+        return self.server.requests
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, name="stub-server", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the stub LLM and search APIs (e.g. for load tests)")
+    parser.add_argument("--llm-port", type=int, default=9001)
+    parser.add_argument("--web-port", type=int, default=9002)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--web-latency", type=float, default=0.3)
+    args = parser.parse_args()
+    llm = StubServer(OpenAIStubHandler, latency=args.llm_latency, port=args.llm_port).start()
+    web = StubServer(SerpAPIStubHandler, latency=args.web_latency, port=args.web_port).start()
+    print(f"OPENAI_BASE_URL={llm.url}/v1")
+    print(f"search endpoint: {web.url}/search", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        llm.stop()
+        web.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""
+Benchmark suite: ingest throughput, index size on disk, query latency percentiles, recall@k against labeled
+questions, and end-to-end Crew.handle_question latency with the LLM and SerpAPI replaced by local stub servers.
+
+Run from src/:
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --corpora papers synthetic --scale 10 --vector-backend numpy --output numpy.json
+    python -m benchmarks.suite --baseline results.json --output after.json
+
+Corpora:
+- papers: the PDFs in --papers-dir.
+- synthetic: the same PDFs plus generated distractor documents, --scale times the original page count
+  (see benchmarks/synthetic.py). The labeled questions stay valid, so recall shows the cost of scale.
+
+Every corpus is indexed from scratch into --work-dir. Query latencies are measured with the query embedding
+and result caches cleared before each query; the end-to-end run disables the answer and web caches as well.
+Results are printed and written as JSON; with --baseline the headline metrics are compared with an earlier run.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from agents.crew import Crew
+from agents.retriever import PDFRetriever, RETRIEVAL_MODES, VECTOR_BACKENDS
+from agents.vectorstore import VECTOR_DTYPES
+from benchmarks.stubs import StubServer, OpenAIStubHandler, SerpAPIStubHandler
+from benchmarks.synthetic import build_corpus
+
+DEFAULT_QUESTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions.jsonl")
+RECALL_KS = (1, 4, 10)
+CORPORA = ("papers", "synthetic")
+# (path in the results, True if higher is better) of the metrics compared against a baseline.
+HEADLINE_METRICS = [
+    (("ingest", "chunks_per_second"), True),
+    (("index", "bytes"), False),
+    (("query", "total_ms", "p50"), False),
+    (("query", "total_ms", "p95"), False),
+    (("query", "total_ms", "p99"), False),
+    (("recall", "page", "4"), True),
+    (("recall", "file", "4"), True),
+    (("end_to_end", "latency_ms", "p50"), False),
+    (("end_to_end", "latency_ms", "p95"), False),
+]
+
+
+def percentiles(seconds: List[float]) -> Dict[str, float]:
+    """
+    p50/p95/p99/mean/max of a sample of durations, in milliseconds.
+    """
+    ms = np.asarray(seconds) * 1000
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 3),
+        "p95": round(float(np.percentile(ms, 95)), 3),
+        "p99": round(float(np.percentile(ms, 99)), 3),
+        "mean": round(float(ms.mean()), 3),
+        "max": round(float(ms.max()), 3),
+        "samples": len(seconds),
+    }
+
+
+def dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            file_path = os.path.join(root, name)
+            if not os.path.islink(file_path):
+                total += os.path.getsize(file_path)
+    return total
+
+
+def load_questions(path: str) -> List[Dict[str, Any]]:
+    """
+    Labeled questions: {"id", "question", "relevant": [{"filename", "pages": [0-based page numbers]}]}.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_index(papers_dir: str, persist_dir: str, args: argparse.Namespace) -> Tuple[PDFRetriever, Dict[str, Any]]:
+    """
+    Indexes papers_dir from scratch and returns the retriever with the ingest and index size metrics.
+    """
+    shutil.rmtree(persist_dir, ignore_errors=True)
+    retriever = PDFRetriever(
+        papers_dir,
+        persist_dir,
+        embedding_model=args.embedding_model,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        ingest_workers=args.ingest_workers,
+        retrieval_mode=args.retrieval_mode,
+        vector_backend=args.vector_backend,
+        vector_dtype=args.vector_dtype,
+        embedding_backend=args.embedding_backend,
+        embedding_quantize=args.embedding_quantize,
+        embedding_threads=args.embedding_threads,
+        embedding_batch_size=args.embedding_batch_size
+    )
+    # Loaded outside the timed section: ingest throughput should not include the model download/load.
+    retriever.embedding.embed_query("warm up")
+    pdfs = glob.glob(os.path.join(papers_dir, "*.pdf"))
+    start = time.perf_counter()
+    retriever.update_index()
+    seconds = time.perf_counter() - start
+
+    chunks = retriever.vector_db.count()
+    input_bytes = sum(os.path.getsize(path) for path in pdfs)
+    components = {
+        name: dir_size(os.path.join(persist_dir, name)) if os.path.isdir(os.path.join(persist_dir, name))
+        else os.path.getsize(os.path.join(persist_dir, name))
+        for name in sorted(os.listdir(persist_dir))
+    }
+    index_bytes = sum(components.values())
+    return retriever, {
+        "ingest": {
+            "files": len(pdfs),
+            "chunks": chunks,
+            "input_mb": round(input_bytes / 2 ** 20, 3),
+            "seconds": round(seconds, 3),
+            "files_per_second": round(len(pdfs) / seconds, 3),
+            "chunks_per_second": round(chunks / seconds, 3),
+            "mb_per_second": round(input_bytes / 2 ** 20 / seconds, 3),
+        },
+        "index": {
+            "bytes": index_bytes,
+            "bytes_per_chunk": round(index_bytes / chunks, 1) if chunks else None,
+            "components": components,
+            # Chunk records held by the numpy store; Chroma keeps them in its own database.
+            "chunk_memory": retriever.vector_db.memory_stats() if hasattr(retriever.vector_db, "memory_stats") else None,
+        },
+    }
+
+
+def measure_queries(retriever: PDFRetriever, questions: List[Dict[str, Any]], top_k: int, repeats: int) -> Dict[str, Any]:
+    """
+    Cold query latency: embedding and search timed separately, with both caches cleared before every query.
+    """
+    embed, search, total = [], [], []
+    for _ in range(repeats):
+        for record in questions:
+            retriever.embedding_cache.clear()
+            retriever.result_cache.clear()
+            start = time.perf_counter()
+            embedding = retriever.embed_query(record["question"])
+            embedded = time.perf_counter()
+            retriever.retrieve(record["question"], top_k=top_k, query_embedding=embedding)
+            end = time.perf_counter()
+            embed.append(embedded - start)
+            search.append(end - embedded)
+            total.append(end - start)
+    return {"embed_ms": percentiles(embed), "search_ms": percentiles(search), "total_ms": percentiles(total)}
+
+
+def measure_recall(retriever: PDFRetriever, questions: List[Dict[str, Any]], ks=RECALL_KS) -> Dict[str, Any]:
+    """
+    Hit rate at k: the share of questions with a relevant chunk among the top k, judged by exact page ("page")
+    or by file only ("file"), plus the page-level mean reciprocal rank.
+    """
+    hits = {"page": {k: 0 for k in ks}, "file": {k: 0 for k in ks}}
+    reciprocal_ranks = []
+    misses = []
+    for record in questions:
+        pages = {(r["filename"], str(page)) for r in record["relevant"] for page in r["pages"]}
+        files = {r["filename"] for r in record["relevant"]}
+        retriever.result_cache.clear()
+        results = retriever.retrieve(record["question"], top_k=max(ks))
+        cited = [(chunk["citation"]["filename"], chunk["citation"]["page"]) for chunk in results]
+        page_ranks = [rank for rank, citation in enumerate(cited, start=1) if citation in pages]
+        file_ranks = [rank for rank, citation in enumerate(cited, start=1) if citation[0] in files]
+        for k in ks:
+            hits["page"][k] += bool(page_ranks and page_ranks[0] <= k)
+            hits["file"][k] += bool(file_ranks and file_ranks[0] <= k)
+        reciprocal_ranks.append(1.0 / page_ranks[0] if page_ranks else 0.0)
+        if not page_ranks:
+            misses.append(record["id"])
+    return {
+        "page": {str(k): round(hits["page"][k] / len(questions), 4) for k in ks},
+        "file": {str(k): round(hits["file"][k] / len(questions), 4) for k in ks},
+        "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+        "questions": len(questions),
+        "missed": misses,
+    }
+
+
+def measure_end_to_end(
+        retriever: PDFRetriever,
+        questions: List[Dict[str, Any]],
+        args: argparse.Namespace
+) -> Dict[str, Any]:
+    """
+    Crew.handle_question latency over the labeled questions, with the LLM and SerpAPI served by local stubs.
+    Each question gets its own session and the retriever caches are cleared, so every run takes the full path.
+    """
+    os.environ.setdefault("SERPAPI_API_KEY", "benchmark")
+    with StubServer(OpenAIStubHandler, latency=args.llm_latency) as llm, \
+            StubServer(SerpAPIStubHandler, latency=args.web_latency) as web:
+        crew = Crew(
+            papers_dir=retriever.papers_dir,
+            persist_dir=retriever.persist_dir,
+            answer_cache=False,
+            web_cache=False,
+            top_k=args.top_k,
+            retriever=retriever,
+            web_timeout=args.web_timeout,
+            speculative=args.speculative
+        )
+        crew.synthesizer.base_url = llm.url + "/v1"
+        crew.synthesizer.api_key = "benchmark"
+        crew.websearcher.endpoint = web.url + "/search"
+        crew.warm_up()
+
+        latencies = []
+        stages: Dict[str, List[float]] = {}
+        errors = 0
+        paths: Dict[str, int] = {}
+        for repeat in range(args.e2e_repeats):
+            for record in questions:
+                retriever.embedding_cache.clear()
+                retriever.result_cache.clear()
+                start = time.perf_counter()
+                response = crew.handle_question(record["question"], session_id=f"bench-{repeat}-{record['id']}")
+                latencies.append(time.perf_counter() - start)
+                errors += response["answer"].startswith("Sorry")
+                if response["speculation"] is not None:
+                    path = response["speculation"]["path"]
+                    paths[path] = paths.get(path, 0) + 1
+                for span in response["trace"]["spans"]:
+                    stages.setdefault(span["name"], []).append(span["ms"] / 1000)
+        crew.executor.shutdown(wait=False)
+    return {
+        "latency_ms": percentiles(latencies),
+        "stages_ms": {name: percentiles(samples) for name, samples in sorted(stages.items())},
+        "errors": errors,
+        "stub_latency": {"llm": args.llm_latency, "web": args.web_latency},
+        "web_timeout": args.web_timeout,
+        "speculative": {"mode": args.speculative, "paths": paths} if args.speculative else None,
+    }
+
+
+def run_corpus(name: str, papers_dir: str, questions: List[Dict[str, Any]], args: argparse.Namespace) -> Dict[str, Any]:
+    print(f"[{name}] indexing {papers_dir}", file=sys.stderr)
+    retriever, results = build_index(papers_dir, os.path.join(args.work_dir, f"index-{name}"), args)
+    print(f"[{name}] {results['ingest']['chunks']} chunks in {results['ingest']['seconds']}s", file=sys.stderr)
+    results["query"] = measure_queries(retriever, questions, args.top_k, args.query_repeats)
+    results["recall"] = measure_recall(retriever, questions)
+    if not args.skip_e2e:
+        results["end_to_end"] = measure_end_to_end(retriever, questions, args)
+    return results
+
+
+def _lookup(results: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    for key in path:
+        if not isinstance(results, dict) or key not in results:
+            return None
+        results = results[key]
+    return results
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Headline metrics of every corpus present in both runs, with the relative change and whether it is a regression
+    (a change for the worse beyond 5%).
+    """
+    rows = []
+    for corpus, results in current["corpora"].items():
+        previous = baseline.get("corpora", {}).get(corpus)
+        if previous is None:
+            continue
+        for path, higher_is_better in HEADLINE_METRICS:
+            before, after = _lookup(previous, path), _lookup(results, path)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else 0.0
+            rows.append({
+                "corpus": corpus,
+                "metric": ".".join(path),
+                "baseline": before,
+                "current": after,
+                "change": round(change, 4),
+                "regression": (change < -0.05) if higher_is_better else (change > 0.05),
+            })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, retrieval and end-to-end latency")
+    parser.add_argument("--papers-dir", default="papers")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS, help="Labeled questions (JSON lines)")
+    parser.add_argument("--corpora", nargs="+", choices=CORPORA, default=["papers"])
+    parser.add_argument("--scale", type=int, default=10, help="Synthetic corpus size as a multiple of the papers")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "rag-benchmarks"),
+                        help="Holds the synthetic corpus and the indexes built by the benchmark")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--embedding-backend", choices=["torch", "onnx"], default="torch")
+    parser.add_argument("--embedding-quantize", action="store_true")
+    parser.add_argument("--embedding-threads", type=int)
+    parser.add_argument("--embedding-batch-size", type=int, default=32)
+    parser.add_argument("--chunk-size", type=int, default=800)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--ingest-workers", type=int, default=None)
+    parser.add_argument("--retrieval-mode", choices=RETRIEVAL_MODES, default="hybrid")
+    parser.add_argument("--vector-backend", choices=VECTOR_BACKENDS, default="chroma")
+    parser.add_argument("--vector-dtype", choices=VECTOR_DTYPES, default="float32")
+    parser.add_argument("--top-k", type=int, default=4, help="Chunks retrieved per query (latency and end-to-end)")
+    parser.add_argument("--query-repeats", type=int, default=5)
+    parser.add_argument("--skip-e2e", action="store_true", help="Skip the end-to-end Crew benchmark")
+    parser.add_argument("--e2e-repeats", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds the stub LLM takes per completion")
+    parser.add_argument("--web-latency", type=float, default=0.3, help="Seconds the stub search API takes per query")
+    parser.add_argument("--web-timeout", type=float, default=5.0, help="Crew web search deadline in seconds")
+    parser.add_argument("--speculative", choices=["restart", "corroborate"],
+                        help="Crew speculative synthesis mode (default: off)")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare with")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    questions = load_questions(args.questions)
+    os.makedirs(args.work_dir, exist_ok=True)
+    results: Dict[str, Any] = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {key: value for key, value in vars(args).items() if key not in ("baseline", "output")},
+        "corpora": {},
+    }
+    for corpus in args.corpora:
+        papers_dir = args.papers_dir
+        if corpus == "synthetic":
+            papers_dir = os.path.join(args.work_dir, f"synthetic-x{args.scale}")
+            print(f"[synthetic] generating {papers_dir}", file=sys.stderr)
+            results["config"]["synthetic"] = build_corpus(args.papers_dir, papers_dir, args.scale)
+            corpus = f"synthetic-x{args.scale}"
+        results["corpora"][corpus] = run_corpus(corpus, papers_dir, questions, args)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            results["comparison"] = compare(json.load(f), results)
+        for row in results["comparison"]:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(f"{row['corpus']:>16} {row['metric']:<32} {row['baseline']:>12} -> {row['current']:<12} "
+                  f"{row['change']:+.1%} {flag}", file=sys.stderr)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
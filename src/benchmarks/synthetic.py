@@ -0,0 +1,111 @@
+"""
+Synthetic scaled-up corpus: the real papers plus generated distractor PDFs.
+
+Distractor text is a word-bigram random walk over the real papers' text, so it shares their vocabulary
+(and competes with them in retrieval) without containing their passages. PDFs are written by a minimal
+text-only PDF writer, so no extra dependency is needed and the normal ingestion path parses them.
+"""
+import os
+import glob
+import random
+import shutil
+import textwrap
+from typing import List, Dict
+
+from agents.ingestion import parse_pdf
+
+LINES_PER_PAGE = 60
+CHARS_PER_LINE = 95
+
+
+def _escape(line: str) -> str:
+    line = line.encode("latin-1", "replace").decode("latin-1")
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[str]) -> None:
+    """
+    Writes a PDF with one Helvetica text page per entry of pages.
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for text in pages:
+        lines = textwrap.wrap(text, CHARS_PER_LINE)[:LINES_PER_PAGE]
+        stream = "BT /F1 10 Tf 12 TL 50 760 Td " + " ".join(f"({_escape(line)}) Tj T*" for line in lines) + " ET"
+        stream = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        page_refs.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(page_refs), len(page_refs))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+class BigramText:
+    """
+    Generates text by a random walk over the word bigrams of a source text.
+    """
+
+    def __init__(self, text: str, seed: int = 0):
+        self.words = text.split()
+        self.following: Dict[str, List[str]] = {}
+        for a, b in zip(self.words, self.words[1:]):
+            self.following.setdefault(a, []).append(b)
+        self.rng = random.Random(seed)
+
+    def generate(self, num_words: int) -> str:
+        word = self.rng.choice(self.words)
+        out = [word]
+        for _ in range(num_words - 1):
+            options = self.following.get(word)
+            word = self.rng.choice(options) if options and self.rng.random() > 0.05 else self.rng.choice(self.words)
+            out.append(word)
+        return " ".join(out)
+
+
+def build_corpus(papers_dir: str, target_dir: str, scale: int, pages_per_doc: int = 14, words_per_page: int = 400) -> Dict[str, int]:
+    """
+    Fills target_dir with the PDFs of papers_dir plus distractors, about scale times the original page count in total.
+    Generation is deterministic, and an existing corpus with the same parameters is reused.
+    """
+    marker = os.path.join(target_dir, f".synthetic-x{scale}-{pages_per_doc}-{words_per_page}")
+    originals = sorted(glob.glob(os.path.join(papers_dir, "*.pdf")))
+    if os.path.exists(marker):
+        files = glob.glob(os.path.join(target_dir, "*.pdf"))
+        return {"files": len(files), "distractors": len(files) - len(originals)}
+
+    shutil.rmtree(target_dir, ignore_errors=True)
+    os.makedirs(target_dir)
+    source = []
+    pages = 0
+    for path in originals:
+        shutil.copy(path, target_dir)
+        parsed = parse_pdf(path)
+        pages += len(parsed)
+        source.extend(text for _, text in parsed)
+    generator = BigramText(" ".join(source))
+
+    distractor_pages = (scale - 1) * pages
+    num_docs = (distractor_pages + pages_per_doc - 1) // pages_per_doc
+    for i in range(num_docs):
+        doc_pages = [generator.generate(words_per_page) for _ in range(min(pages_per_doc, distractor_pages - i * pages_per_doc))]
+        write_pdf(os.path.join(target_dir, f"synthetic-{i:05d}.pdf"), doc_pages)
+    open(marker, "w").close()
+    return {"files": len(originals) + num_docs, "distractors": num_docs}
@@ -1,14 +1,14 @@
+import json
 import logging
+import argparse
 from agents.crew import Crew
+from agents.batch import BatchRunner
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-def main():
-    logging.basicConfig(level=logging.INFO)
-    crew = Crew()
-
+def chat(crew: Crew):
     print("Dopamine Q&A Assistant (type 'exit' or empty line to quit)\n")
 
     while True:
@@ -18,9 +18,21 @@ def main():
             break
 
         print("\nThinking...")
-        response = crew.handle_question(question)
-
-        print("\nAnswer:\n", response["answer"])
+        response = {"sources": []}
+        answering = False
+        for event in crew.stream_question(question):
+            if event["type"] == "token":
+                if not answering:
+                    # Answer tokens are rendered live as they arrive.
+                    print("\nAnswer:\n ", end="")
+                    answering = True
+                print(event["text"], end="", flush=True)
+            elif event["type"] == "done":
+                response = event
+        if response.get("error") and response["answer"] != response["error"]:
+            # The answer was cut short; the failure is reported after the part already shown.
+            print(f"\n\n{response['error']}", end="")
+        print()
         print("\nSources:")
         for source in response["sources"]:
             # Show PDF or web citation
@@ -31,5 +43,105 @@ def main():
             print("-" * 40)
 
 
+def batch(crew: Crew, args: argparse.Namespace):
+    runner = BatchRunner(
+        crew,
+        concurrency=args.concurrency,
+        web_rate=args.web_rate or None,
+        llm_rate=args.llm_rate or None,
+        block_size=args.block_size,
+        use_web=not args.no_web
+    )
+    stats = runner.run(args.input, args.output)
+    print(json.dumps(stats))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Dopamine Q&A Assistant")
+    parser.add_argument("--warm", action="store_true",
+                        help="Load the index, models and LLM client in the background while waiting for the first question")
+    parser.add_argument("--no-build", action="store_true",
+                        help="Use the existing index as is instead of syncing it with the papers folder")
+    parser.add_argument("--embedding-backend", choices=["torch", "onnx"], default="torch",
+                        help="Embedding model inference runtime (onnx needs sentence-transformers[onnx])")
+    parser.add_argument("--embedding-quantize", action="store_true", help="Use int8 embedding model weights")
+    parser.add_argument("--embedding-threads", type=int, help="CPU threads for embedding inference")
+    parser.add_argument("--embedding-batch-size", type=int, default=32, help="Texts encoded per forward pass")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("chat", help="Interactive questions (default)")
+    batch_parser = commands.add_parser("batch", help="Answer questions from a JSONL file")
+    batch_parser.add_argument("input", help='JSONL file with one {"id": ..., "question": ...} per line')
+    batch_parser.add_argument("output", help="JSONL file answers are appended to; rerunning resumes where it stopped")
+    batch_parser.add_argument("--concurrency", type=int, default=8, help="Questions in flight at once")
+    batch_parser.add_argument("--web-rate", type=float, default=5.0, help="Max web searches per second (0: unlimited)")
+    batch_parser.add_argument("--llm-rate", type=float, default=0.0, help="Max LLM calls per second (0: unlimited)")
+    batch_parser.add_argument("--block-size", type=int, default=256, help="Questions embedded and searched together")
+    batch_parser.add_argument("--no-web", action="store_true", help="Answer from the PDFs only")
+    serve_parser = commands.add_parser("serve", help="Serve questions over HTTP")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument("--max-concurrency", type=int, default=16, help="Questions answered at once")
+    serve_parser.add_argument("--max-queue", type=int, default=64,
+                              help="Questions allowed to wait for a worker; beyond that requests get 503")
+    serve_parser.add_argument("--timeout", type=float, default=120.0, help="Seconds before a request gets 504")
+    serve_parser.add_argument("--embed-batch-size", type=int, default=32,
+                              help="Max query embeddings of concurrent requests computed in one model call")
+    serve_parser.add_argument("--embed-batch-wait", type=float, default=0.0,
+                              help="Seconds an embedding batch waits for more queries (default: no waiting)")
+    serve_parser.add_argument("--search-endpoint", help="SerpAPI-compatible endpoint, e.g. a local stub")
+    serve_parser.add_argument("--web-timeout", type=float, default=5.0, help="Seconds to wait for web results")
+    serve_parser.add_argument("--speculative", choices=["restart", "corroborate"],
+                              help="Start answering from the PDFs while web results are pending; when they arrive "
+                                   "in time, restart with both or append a web corroboration pass")
+    return parser.parse_args()
+
+
+def embedding_options(args: argparse.Namespace) -> dict:
+    return {
+        "embedding_backend": args.embedding_backend,
+        "embedding_quantize": args.embedding_quantize,
+        "embedding_threads": args.embedding_threads,
+        "embedding_batch_size": args.embedding_batch_size,
+    }
+
+
+def serve(args: argparse.Namespace):
+    # Imported here: aiohttp is only needed for serving.
+    from interface.server import serve as serve_http
+    crew = Crew(
+        build_index=not args.no_build,
+        embed_batch_size=args.embed_batch_size,
+        embed_batch_wait=args.embed_batch_wait,
+        web_timeout=args.web_timeout,
+        speculative=args.speculative,
+        # The PDF and web legs of every question in flight, plus its draft answer when speculating.
+        source_workers=(3 if args.speculative else 2) * args.max_concurrency,
+        **embedding_options(args)
+    )
+    if args.search_endpoint:
+        crew.websearcher.endpoint = args.search_endpoint
+    serve_http(
+        crew,
+        host=args.host,
+        port=args.port,
+        max_concurrency=args.max_concurrency,
+        max_queue=args.max_queue,
+        request_timeout=args.timeout
+    )
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "serve":
+        serve(args)
+        return
+    crew = Crew(build_index=not args.no_build, warm_up=args.warm, **embedding_options(args))
+    if args.command == "batch":
+        batch(crew, args)
+    else:
+        chat(crew)
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
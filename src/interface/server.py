@@ -0,0 +1,193 @@
+import uuid
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
+from aiohttp import web
+from agents.crew import Crew
+
+SERVER_COUNTERS = ("served", "rejected", "embedding_batches", "embedding_items")
+
+
+class QAServer:
+    """
+    Serves one shared Crew over HTTP, so every user shares the index, embedding model and LLM client of a single
+    process; conversations are kept apart by session id.
+
+    Requests are accepted on an asyncio event loop and answered on a bounded thread pool (Crew is synchronous,
+    so every question holds a worker thread for its whole duration, web search and LLM call included).
+    At most max_concurrency questions are answered at once and at most max_queue more wait for a thread;
+    beyond that, requests are rejected at once with 503 and Retry-After instead of piling up. A question counts
+    against these limits until its worker is done with it, even if its request already timed out: its thread is
+    still taken, so counting it keeps the limits true to the pool. Abandoned questions are bounded by the crew's own
+    deadlines (web search and LLM timeouts) rather than by the server; /health reports how many there are, and
+    their failures are logged.
+
+    Endpoints:
+    - POST /ask {"question": ..., "session_id": ...}: the handle_question response plus its "session_id"
+      (a new one is issued if none is given, also accepted as an X-Session-Id header).
+    - GET /sessions/{session_id}/history: the conversation so far.
+    - GET /health: liveness and current load.
+    - GET /metrics: Crew and server metrics in Prometheus text format.
+    """
+
+    def __init__(
+            self,
+            crew: Crew,
+            max_concurrency: int = 16,
+            max_queue: int = 64,
+            request_timeout: float = 120.0,
+            warm_up: bool = True
+    ):
+        """
+        :param crew: Crew shared by all requests.
+        :param max_concurrency: Questions answered at once (worker threads).
+        :param max_queue: Questions allowed to wait for a worker; further requests get 503.
+        :param request_timeout: Seconds before a request gets 504 (a question still waiting for a thread is dropped;
+            one being answered is finished by its thread).
+        :param warm_up: Load the index and models before accepting requests, so the first users are not slowed down.
+        """
+        if max_concurrency < 1 or max_queue < 0:
+            raise ValueError("max_concurrency must be at least 1 and max_queue non-negative.")
+        self.crew = crew
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.request_timeout = request_timeout
+        self.warm_up = warm_up
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="http-worker")
+        # Only touched from the event loop thread, so no lock is needed.
+        self.in_flight = 0
+        # Questions still being answered after their request timed out (counted in in_flight too).
+        self.abandoned = 0
+        self.served = 0
+        self.rejected = 0
+        self.logger = logging.getLogger("QAServer")
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.post("/ask", self.ask),
+            web.get("/sessions/{session_id}/history", self.history),
+            web.get("/health", self.health),
+            web.get("/metrics", self.metrics),
+        ])
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app: web.Application) -> None:
+        if self.warm_up:
+            self.logger.info("Warming up...")
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.crew.warm_up)
+
+    async def _on_cleanup(self, app: web.Application) -> None:
+        self.executor.shutdown(wait=False)
+
+    async def _run(self, fn, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def ask(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({"error": "Body must be JSON."}, status=400)
+        question = body.get("question") if isinstance(body, dict) else None
+        if not isinstance(question, str) or not question.strip():
+            return web.json_response({"error": "Missing 'question'."}, status=400)
+        session_id = str(body.get("session_id") or request.headers.get("X-Session-Id") or uuid.uuid4().hex)
+
+        if self.in_flight >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            return web.json_response(
+                {"error": "Server busy; retry later.", "in_flight": self.in_flight},
+                status=503,
+                headers={"Retry-After": "1"}
+            )
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        job = self.executor.submit(self.crew.handle_question, question.strip(), session_id)
+        # Released when the worker is done (or the job is cancelled), not when the request gives up.
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        answer = asyncio.wrap_future(job)
+        try:
+            # Shielded: the timeout must not mark the job done while its thread is still answering.
+            response = await asyncio.wait_for(asyncio.shield(answer), self.request_timeout)
+        except asyncio.TimeoutError:
+            if not job.cancel():
+                self.abandoned += 1
+                answer.add_done_callback(self._finish_abandoned)
+            return web.json_response({"error": "Timed out.", "session_id": session_id}, status=504)
+        except Exception as e:
+            self.logger.error(f"Question failed: {e}")
+            return web.json_response({"error": str(e), "session_id": session_id}, status=500)
+        self.served += 1
+        response["session_id"] = session_id
+        return web.json_response(response)
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+
+    def _finish_abandoned(self, answer: asyncio.Future) -> None:
+        """
+        Consumes the outcome of a question whose request timed out, so that a failure is logged rather than lost.
+        """
+        self.abandoned -= 1
+        if answer.cancelled():
+            return
+        error = answer.exception()
+        if error is not None:
+            self.logger.error(f"Question failed after its request timed out: {error}")
+        else:
+            self.logger.info("Question answered after its request timed out.")
+
+    async def history(self, request: web.Request) -> web.Response:
+        session_id = request.match_info["session_id"]
+        history = await self._run(lambda: self.crew.memory.get_history(session_id=session_id))
+        return web.json_response({"session_id": session_id, "history": history})
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", **self._load()})
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        lines = [self.crew.export_metrics().rstrip("\n")]
+        for name, value in self._load().items():
+            lines.append(f"# TYPE server_{name} {'counter' if name in SERVER_COUNTERS else 'gauge'}")
+            lines.append(f"server_{name} {value:g}")
+        return web.Response(text="\n".join(lines) + "\n", content_type="text/plain")
+
+    def _load(self) -> Dict[str, Any]:
+        load = {
+            "in_flight": self.in_flight,
+            "abandoned": self.abandoned,
+            "capacity": self.max_concurrency + self.max_queue,
+            "served": self.served,
+            "rejected": self.rejected,
+        }
+        # Metrics must not trigger an index build.
+        retriever = self.crew.loaded_retriever
+        batcher = retriever.query_batcher if retriever is not None else None
+        if batcher is not None:
+            load.update({f"embedding_{key}": value for key, value in batcher.stats().items()})
+        return load
+
+
+def serve(
+        crew: Crew,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        max_concurrency: int = 16,
+        max_queue: int = 64,
+        request_timeout: float = 120.0,
+        warm_up: bool = True
+) -> None:
+    """
+    Runs the HTTP server until interrupted.
+    """
+    server = QAServer(
+        crew,
+        max_concurrency=max_concurrency,
+        max_queue=max_queue,
+        request_timeout=request_timeout,
+        warm_up=warm_up
+    )
+    web.run_app(server.app(), host=host, port=port)
@@ -0,0 +1,69 @@
+import zlib
+import pytest
+from agents.crew import Crew
+from agents.router import is_standalone
+from benchmarks.stubs import OpenAIStubHandler, SerpAPIStubHandler, StubServer
+
+
+class FakeRetriever:
+    """
+    Returns the same chunk for every question; embeddings are bags of words, so rewordings stay close.
+    """
+
+    def embed_query(self, question, trace=None):
+        vector = [0.0] * 64
+        for word in question.lower().strip("?").split():
+            vector[zlib.crc32(word.encode()) % 64] += 1.0
+        return vector
+
+    def retrieve(self, question, top_k=4, query_embedding=None, trace=None):
+        return [{
+            "id": "chunk-1",
+            "text": "Dopamine neurons signal reward prediction errors.",
+            "citation": {"filename": "a.pdf", "page": "1"},
+        }]
+
+
+@pytest.fixture
+def crew(tmp_path, monkeypatch):
+    monkeypatch.setenv("SERPAPI_API_KEY", "test")
+    with StubServer(OpenAIStubHandler) as llm, StubServer(SerpAPIStubHandler) as web:
+        crew = Crew(persist_dir=str(tmp_path), retriever=FakeRetriever(), web_cache=False)
+        crew.synthesizer.base_url = llm.url + "/v1"
+        crew.synthesizer.api_key = "test"
+        crew.websearcher.endpoint = web.url + "/search"
+        yield crew
+        crew.executor.shutdown(wait=False)
+
+
+def test_standalone_follow_up_turn_hits_the_cache(crew):
+    first = crew.handle_question("What do dopamine neurons signal?", session_id="s")
+    assert not first["cached"]
+    crew.handle_question("How is reward learning measured?", session_id="s")
+    # Third turn of the session: history is passed, but the question stands on its own.
+    repeat = crew.handle_question("what do dopamine neurons signal", session_id="s")
+    assert repeat["memory"]
+    assert repeat["cached"]
+    assert repeat["timings"]["answer_cache"]["status"] == "hit"
+    assert repeat["answer"] == first["answer"]
+
+
+def test_follow_up_questions_bypass_the_cache(crew):
+    crew.handle_question("What do dopamine neurons signal?", session_id="s")
+    follow_up = crew.handle_question("What do they signal in mice?", session_id="s")
+    assert not follow_up["cached"]
+    assert "answer_cache" not in follow_up["timings"]
+    # Not stored either: the same follow-up in a fresh session misses.
+    assert not crew.handle_question("What do they signal in mice?", session_id="other")["cached"]
+
+
+@pytest.mark.parametrize("question, standalone", [
+    ("What do dopamine neurons signal?", True),
+    ("How does the striatum contribute to habit formation?", True),
+    ("What about its side effects?", False),
+    ("And in rats?", False),
+    ("Why not?", False),
+    ("Can you explain that again?", False),
+])
+def test_is_standalone(question, standalone):
+    assert is_standalone(question) == standalone
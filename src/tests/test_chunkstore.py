@@ -0,0 +1,64 @@
+from agents.chunkstore import ChunkStore, CHUNK_FILES
+from agents.vectorstore import NumpyStore
+
+CHUNKS = [
+    ("b:1", "Dopamine neurons signal reward prediction errors.", {"filename": "b.pdf", "page": 3}),
+    ("a:0", "Ünïcödé text, 神经元.", {"filename": "a.pdf", "page": 0}),
+    ("c:2", "", {"filename": "a.pdf", "page": "?"}),
+    ("a:10", "No metadata at all.", {}),
+]
+
+
+class FakeEmbedding:
+    def embed_documents(self, texts):
+        return [[1.0, float(len(text)), 0.5] for text in texts]
+
+
+def test_write_and_read(tmp_path):
+    assert ChunkStore.write(str(tmp_path), CHUNKS) == 4
+    assert all((tmp_path / name).exists() for name in CHUNK_FILES)
+    store = ChunkStore(str(tmp_path))
+    assert len(store) == 4
+    assert store.chunk(0) == CHUNKS[0]
+    assert store.chunk(1) == CHUNKS[1]
+    # Pages that are not numbers are left out rather than stored as something else.
+    assert store.chunk(2) == ("c:2", "", {"filename": "a.pdf"})
+    assert store.metadata(3) == {"filename": "Unknown"}
+    assert [store.row_of(cid) for cid, _, _ in CHUNKS] == [0, 1, 2, 3]
+    assert store.row_of("a:1") is None and store.row_of("zzz") is None
+    assert [cid for cid, _, _ in store.iter_chunks(skip=[1, 3])] == ["b:1", "c:2"]
+    stats = store.memory_stats()
+    assert stats["chunks"] == 4 and stats["text_bytes"] == sum(len(text.encode("utf-8")) for _, text, _ in CHUNKS)
+
+
+def test_empty_store(tmp_path):
+    for store in (ChunkStore(), ChunkStore(str(tmp_path / "missing"))):
+        assert len(store) == 0 and store.row_of("a") is None and list(store.iter_chunks()) == []
+    ChunkStore.write(str(tmp_path), [])
+    assert len(ChunkStore(str(tmp_path))) == 0
+
+
+def test_reopen(tmp_path):
+    ChunkStore.write(str(tmp_path), CHUNKS)
+    first = ChunkStore(str(tmp_path))
+    reopened = ChunkStore(str(tmp_path))
+    assert list(reopened.iter_chunks()) == list(first.iter_chunks())
+    assert reopened.row_of("a:10") == 3
+
+
+def test_put_delete_and_compaction_through_numpy_store(tmp_path):
+    store = NumpyStore(str(tmp_path), FakeEmbedding(), segment_rows=2, max_segments=1)
+    store.add_texts([text for _, text, _ in CHUNKS], [meta for _, _, meta in CHUNKS], [cid for cid, _, _ in CHUNKS])
+    store.flush()
+    # Replaced and deleted chunks are gone from the records after the segments are merged.
+    store.add_texts(["Replaced text."], [{"filename": "b.pdf", "page": 4}], ["b:1"])
+    store.delete(["a:0"])
+    store.flush()
+    assert len(store._segments) == 1
+    records = store._segments[0].chunks
+    assert len(records) == 3
+    assert records.chunk(records.row_of("b:1")) == ("b:1", "Replaced text.", {"filename": "b.pdf", "page": 4})
+    assert records.row_of("a:0") is None
+    reopened = NumpyStore(str(tmp_path), FakeEmbedding())
+    assert sorted(reopened.iter_chunks()) == sorted(store.iter_chunks())
+    assert reopened.get_by_ids(["c:2", "a:0"]) == [("c:2", "", {"filename": "a.pdf"})]
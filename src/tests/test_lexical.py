@@ -0,0 +1,134 @@
+import json
+import random
+import pytest
+from agents.lexical import BM25Index, tokenize, reciprocal_rank_fusion
+
+WORDS = [f"w{i}" for i in range(200)]
+
+
+def corpus(n, seed=0):
+    rng = random.Random(seed)
+    return [(f"doc-{i:05d}", " ".join(rng.choices(WORDS, k=rng.randint(5, 40)))) for i in range(n)]
+
+
+def ids(results):
+    return [cid for cid, _ in results]
+
+
+def assert_same_results(index, reference, queries=("w1 w2", "w7", "w150 w3 w99", "w42 w42")):
+    # Every matching document with its score: equal scores may be ranked in either order.
+    for query in queries:
+        got, expected = dict(index.search(query, k=10000)), dict(reference.search(query, k=10000))
+        assert got.keys() == expected.keys()
+        assert [got[cid] for cid in expected] == pytest.approx(list(expected.values()), rel=1e-5)
+
+
+def test_tokenize_keeps_identifiers_and_non_ascii_terms():
+    assert tokenize("The DRD4 gene and d2r receptors") == ["drd4", "gene", "d2r", "receptors"]
+    assert tokenize("Schrödinger's naïve Nervenzellen, 神经元 и нейроны") == [
+        "schrödinger", "s", "naïve", "nervenzellen", "神经元", "и", "нейроны"
+    ]
+
+
+def test_search_ranks_matching_documents(tmp_path):
+    index = BM25Index.build(str(tmp_path), [
+        ("a", "dopamine neurons signal reward prediction errors"),
+        ("b", "serotonin and mood"),
+        ("c", "dopamine dopamine dopamine release"),
+        ("d", "Gedächtnis und Lernen"),
+    ])
+    assert ids(index.search("dopamine")) == ["c", "a"]
+    assert ids(index.search("reward dopamine")) == ["a", "c"]
+    assert ids(index.search("gedächtnis")) == ["d"]
+    assert index.search("unknownterm") == []
+    assert index.search("the of") == []
+    assert len(index.search("dopamine", k=1)) == 1
+
+
+def test_update_adds_replaces_and_deletes(tmp_path):
+    index = BM25Index(str(tmp_path))
+    assert index.num_docs == 0 and index.search("dopamine") == []
+    index.update([("a", "dopamine reward"), ("b", "serotonin mood")])
+    assert ids(index.search("dopamine")) == ["a"]
+    # Same id, new text: the old text is no longer found.
+    index.update([("a", "acetylcholine attention")])
+    assert index.search("dopamine") == []
+    assert ids(index.search("attention")) == ["a"]
+    index.update([], deleted_ids=["b", "missing"])
+    assert index.search("serotonin") == []
+    assert index.num_docs == 1
+    # Deleted and re-added in the same update: the new document stays.
+    index.update([("b", "serotonin again")], deleted_ids=["b"])
+    assert ids(index.search("serotonin")) == ["b"]
+
+
+def test_incremental_updates_match_a_full_build(tmp_path):
+    docs = corpus(600)
+    index = BM25Index(str(tmp_path / "inc"), segment_docs=100, max_segments=3)
+    index.update(docs[:300])
+    index.update(docs[300:], deleted_ids=[cid for cid, _ in docs[:50]])
+    index.update([("doc-00100", "w1 w1 w2")], deleted_ids=["doc-00200"])
+    # Merges kept the segment count bounded.
+    assert len(json.loads((tmp_path / "inc" / "meta.json").read_text())["segments"]) <= 3
+
+    live = {cid: text for cid, text in docs[50:] if cid != "doc-00200"}
+    live["doc-00100"] = "w1 w1 w2"
+    reference = BM25Index.build(str(tmp_path / "ref"), live.items())
+    assert index.num_docs == reference.num_docs == len(live)
+    assert set(ids(index.search("w1 w2", k=10000))) == set(ids(reference.search("w1 w2", k=10000)))
+    # Scores match once no deleted document is left to count towards document frequencies.
+    merged = BM25Index(str(tmp_path / "inc"), segment_docs=100, max_segments=1)
+    merged.update([])
+    assert_same_results(merged, reference)
+
+
+def test_compaction_drops_deleted_documents_and_keeps_scores(tmp_path):
+    docs = corpus(400, seed=1)
+    index = BM25Index(str(tmp_path / "index"), segment_docs=100, max_segments=8)
+    index.update(docs)
+    # Three quarters of the first segment deleted: it is rewritten without them.
+    index.update([], deleted_ids=[cid for cid, _ in docs[:75]])
+    segments = json.loads((tmp_path / "index" / "meta.json").read_text())["segments"]
+    assert sorted(segment["docs"] for segment in segments) == [25, 100, 100, 100]
+    assert all(segment["deleted"] is None for segment in segments)
+    reference = BM25Index.build(str(tmp_path / "ref"), docs[75:])
+    assert_same_results(index, reference)
+
+    # Everything deleted: no segment is left.
+    index.update([], deleted_ids=[cid for cid, _ in docs])
+    assert index.num_docs == 0 and index.search("w1") == []
+    assert json.loads((tmp_path / "index" / "meta.json").read_text())["segments"] == []
+
+
+def test_reopen_from_disk(tmp_path):
+    docs = corpus(300, seed=2)
+    index = BM25Index(str(tmp_path), segment_docs=100)
+    index.update(docs)
+    index.update([], deleted_ids=["doc-00001", "doc-00150"])
+    reopened = BM25Index(str(tmp_path))
+    assert reopened.num_docs == index.num_docs == 298
+    assert_same_results(reopened, index)
+    assert "doc-00001" not in ids(reopened.search(docs[1][1], k=300))
+    # Updates continue from the reopened state.
+    reopened.update([("doc-new", "w1 w1 w1 w1")])
+    assert ids(BM25Index(str(tmp_path)).search("w1", k=1)) == ["doc-new"]
+
+
+def test_exists_only_for_the_current_layout(tmp_path):
+    assert not BM25Index.exists(str(tmp_path / "missing"))
+    BM25Index.build(str(tmp_path / "index"), [("a", "dopamine")])
+    assert BM25Index.exists(str(tmp_path / "index"))
+    meta_path = tmp_path / "index" / "meta.json"
+    meta = json.loads(meta_path.read_text())
+    meta_path.write_text(json.dumps(dict(meta, version=1)))
+    assert not BM25Index.exists(str(tmp_path / "index"))
+
+
+def test_reciprocal_rank_fusion_order():
+    dense = ["a", "b", "c", "d"]
+    lexical = ["c", "e", "a"]
+    # a: 1/61 + 1/63, c: 1/63 + 1/61 (tie, first seen wins), b: 1/62, e: 1/62, d: 1/64.
+    assert reciprocal_rank_fusion([dense, lexical]) == ["a", "c", "b", "e", "d"]
+    assert reciprocal_rank_fusion([dense, lexical], limit=2) == ["a", "c"]
+    assert reciprocal_rank_fusion([["x", "y"], ["y"]], k=0) == ["y", "x"]
+    assert reciprocal_rank_fusion([]) == []
@@ -0,0 +1,30 @@
+import json
+import pytest
+from agents.cache import DiskTTLCache
+from agents.retriever import PDFRetriever, MANIFEST_NAME, NUMPY_STORE_DIR_NAME
+from agents.vectorstore import NumpyStore
+
+
+class FakeEmbedding:
+    def embed_documents(self, texts):
+        return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+
+def test_load_existing_index_fails_without_an_index(tmp_path):
+    # The caches Crew opens in persist_dir create it before the index is loaded.
+    DiskTTLCache(str(tmp_path / "web_cache.sqlite"))
+    for backend in ("chroma", "numpy"):
+        retriever = PDFRetriever(str(tmp_path / "papers"), str(tmp_path), vector_backend=backend)
+        with pytest.raises(FileNotFoundError, match="No .* index found"):
+            retriever.load_existing_index()
+
+
+def test_load_existing_index_opens_a_built_index(tmp_path):
+    store = NumpyStore(str(tmp_path / NUMPY_STORE_DIR_NAME), FakeEmbedding())
+    store.add_texts(["dopamine"], metadatas=[{"filename": "a.pdf", "page": 1}], ids=["c1"])
+    store.flush()
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps({"files": {}}))
+    retriever = PDFRetriever(str(tmp_path / "papers"), str(tmp_path), vector_backend="numpy")
+    retriever._embedding = FakeEmbedding()
+    retriever.load_existing_index()
+    assert retriever.vector_db.count() == 1
@@ -0,0 +1,80 @@
+import time
+import asyncio
+import logging
+import threading
+from aiohttp.test_utils import TestClient, TestServer
+from interface.server import QAServer
+
+
+class SlowCrew:
+    """
+    Answers after release is set; raises for questions containing "fail".
+    """
+
+    loaded_retriever = None
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def handle_question(self, question, session_id):
+        self.release.wait(5)
+        if "fail" in question:
+            raise RuntimeError("LLM unavailable")
+        return {"answer": question}
+
+    def export_metrics(self):
+        return ""
+
+
+def run_server(server, scenario):
+    async def main():
+        async with TestClient(TestServer(server.app())) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+async def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    assert condition()
+
+
+def test_abandoned_question_keeps_its_slot_and_logs_its_failure(caplog):
+    crew = SlowCrew()
+    server = QAServer(crew, max_concurrency=1, max_queue=0, request_timeout=0.1, warm_up=False)
+
+    async def scenario(client):
+        response = await client.post("/ask", json={"question": "please fail"})
+        assert response.status == 504
+        health = await (await client.get("/health")).json()
+        assert health["in_flight"] == 1 and health["abandoned"] == 1
+        # Its worker thread is still taken, so the next question is turned away.
+        assert (await client.post("/ask", json={"question": "next"})).status == 503
+        crew.release.set()
+        await wait_until(lambda: server.in_flight == 0 and server.abandoned == 0)
+        response = await client.post("/ask", json={"question": "next"})
+        assert response.status == 200 and (await response.json())["answer"] == "next"
+
+    with caplog.at_level(logging.INFO, logger="QAServer"):
+        run_server(server, scenario)
+    assert "Question failed after its request timed out: LLM unavailable" in caplog.text
+    server.executor.shutdown(wait=True)
+
+
+def test_question_waiting_for_a_thread_is_dropped_on_timeout():
+    crew = SlowCrew()
+    server = QAServer(crew, max_concurrency=1, max_queue=1, request_timeout=0.2, warm_up=False)
+
+    async def scenario(client):
+        first = asyncio.ensure_future(client.post("/ask", json={"question": "first"}))
+        await wait_until(lambda: server.in_flight == 1)
+        # Queued behind the first question: cancelled on timeout, so it is not abandoned.
+        assert (await client.post("/ask", json={"question": "queued"})).status == 504
+        assert (await first).status == 504
+        assert server.abandoned == 1
+        crew.release.set()
+        await wait_until(lambda: server.in_flight == 0 and server.abandoned == 0)
+
+    run_server(server, scenario)
+    server.executor.shutdown(wait=True)
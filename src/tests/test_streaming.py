@@ -0,0 +1,123 @@
+import pytest
+from agents.crew import Crew
+from agents.synthesizer import Synthesizer, LLM_ERROR_PREFIX
+from benchmarks.stubs import OpenAIStubHandler, SerpAPIStubHandler, StubServer, STUB_ANSWER_TOKENS
+
+CHUNKS = [
+    {
+        "text": "Dopamine neurons signal reward prediction errors.",
+        "citation": {"filename": "a.pdf", "page": "3"},
+        "citation_type": "pdf",
+        "citation_num": 1,
+    },
+    {
+        "text": "Reward prediction errors drive learning.",
+        "citation": {"url": "https://example.org/1", "title": "Result 1", "rank": 1},
+        "citation_type": "web",
+        "citation_num": 1,
+    },
+]
+
+
+def source_kind(source):
+    return "pdf" if "filename" in source else "web"
+
+
+def stream(server: StubServer, chunks=CHUNKS):
+    synthesizer = Synthesizer(base_url=server.url + "/v1", api_key="test")
+    return list(synthesizer.stream_synthesize("What do dopamine neurons signal?", chunks, history=[]))
+
+
+def test_token_and_citation_events_in_order():
+    # The stub answer splits both citations across tokens: "errors [" + "1] " and "[W" + "1].".
+    with StubServer(OpenAIStubHandler) as server:
+        events = stream(server)
+    kinds = [(e["type"], e.get("text") or (source_kind(e["source"]) if "source" in e else None)) for e in events]
+    assert kinds == [
+        ("token", "Dopamine "),
+        ("token", "neurons signal "),
+        ("token", "reward prediction "),
+        ("token", "errors ["),
+        ("token", "1] "),
+        ("citation", "pdf"),
+        ("token", "[W"),
+        ("token", "1]."),
+        ("citation", "web"),
+        ("done", None),
+    ]
+
+
+def test_one_citation_event_per_cited_source():
+    tokens = ["See [", "1", "] and [1] then [W", "1] and again [W1] [", "1]."]
+    with StubServer(OpenAIStubHandler, tokens=tokens) as server:
+        events = stream(server)
+    citations = [e["source"] for e in events if e["type"] == "citation"]
+    assert len(citations) == 2
+    assert [e["text"] for e in events if e["type"] == "token"] == tokens
+
+
+def test_citation_of_unknown_source_is_not_announced():
+    with StubServer(OpenAIStubHandler, tokens=["Claim [", "7] and [W", "1]."]) as server:
+        events = stream(server)
+    assert [source_kind(e["source"]) for e in events if e["type"] == "citation"] == ["web"]
+
+
+def test_done_payload():
+    with StubServer(OpenAIStubHandler) as server:
+        done = stream(server)[-1]
+    assert done["type"] == "done"
+    assert done["answer"] == "".join(STUB_ANSWER_TOKENS).strip()
+    assert done["error"] is None
+    assert len(done["sources"]) == 2
+    assert done["reasoning"]
+    assert done["packing"]["tokens_after"] > 0
+
+
+def test_failure_mid_stream_keeps_the_partial_answer():
+    with StubServer(OpenAIStubHandler, fail_after=3) as server:
+        events = stream(server)
+    assert [e["text"] for e in events if e["type"] == "token"] == STUB_ANSWER_TOKENS[:3]
+    done = events[-1]
+    assert done["type"] == "done"
+    assert done["error"].startswith(LLM_ERROR_PREFIX)
+    # The error is reported, not appended to an answer that could pass for a complete one.
+    assert done["answer"] == "".join(STUB_ANSWER_TOKENS[:3]).strip()
+
+
+def test_failure_before_any_token_streams_the_error():
+    with StubServer(OpenAIStubHandler, fail_after=0) as server:
+        events = stream(server)
+    assert [e["type"] for e in events] == ["token", "done"]
+    assert events[0]["text"].startswith(LLM_ERROR_PREFIX)
+    assert events[-1]["answer"] == events[-1]["error"]
+
+
+class FakeRetriever:
+    def embed_query(self, question, trace=None):
+        return [1.0, 0.0, 0.0]
+
+    def retrieve(self, question, top_k=4, query_embedding=None, trace=None):
+        return [dict(id="chunk-1", text=CHUNKS[0]["text"], citation=CHUNKS[0]["citation"])]
+
+
+@pytest.mark.parametrize("fail_after", [None, 4])
+def test_stream_question(tmp_path, monkeypatch, fail_after):
+    monkeypatch.setenv("SERPAPI_API_KEY", "test")
+    with StubServer(OpenAIStubHandler, fail_after=fail_after) as llm, StubServer(SerpAPIStubHandler) as web:
+        crew = Crew(persist_dir=str(tmp_path), retriever=FakeRetriever(), web_cache=False)
+        crew.synthesizer.base_url = llm.url + "/v1"
+        crew.synthesizer.api_key = "test"
+        crew.websearcher.endpoint = web.url + "/search"
+        events = list(crew.stream_question("What do dopamine neurons signal?", session_id="s"))
+        crew.executor.shutdown(wait=False)
+    tokens = [e["text"] for e in events if e["type"] == "token"]
+    done = events[-1]
+    assert [e["type"] for e in events].count("done") == 1 and done["type"] == "done"
+    assert done["answer"] == "".join(tokens).strip()
+    assert "trace" in done and "timings" in done
+    if fail_after is None:
+        assert done["error"] is None
+        assert [source_kind(e["source"]) for e in events if e["type"] == "citation"] == ["pdf", "web"]
+    else:
+        assert tokens == STUB_ANSWER_TOKENS[:fail_after]
+        assert done["error"].startswith(LLM_ERROR_PREFIX)
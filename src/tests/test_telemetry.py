@@ -0,0 +1,42 @@
+import threading
+from agents.telemetry import Trace, MetricsRegistry
+
+
+def test_observe_while_another_thread_records():
+    trace = Trace()
+    draft = trace.prefixed("draft_")
+
+    def record():
+        # New names grow the trace's dicts, as late legs and cancelled drafts do.
+        for i in range(20000):
+            draft.incr(f"counter_{i}")
+            if i % 10 == 0:
+                with draft.span(f"span_{i % 100}"):
+                    pass
+
+    recorder = threading.Thread(target=record)
+    recorder.start()
+    metrics = MetricsRegistry()
+    while recorder.is_alive():
+        metrics.observe(trace)
+    recorder.join()
+    assert metrics.requests >= 1
+    assert all(name.startswith("draft_counter_") for name in metrics.counters)
+    assert all(name.startswith("draft_span_") for name in metrics.stage_seconds)
+
+
+def test_observe_sums_spans_and_counters():
+    metrics = MetricsRegistry()
+    for _ in range(2):
+        trace = Trace()
+        with trace.span("retrieval"):
+            pass
+        trace.incr("completion_tokens", 5)
+        trace.prefixed("draft_").incr("completion_tokens", 3)
+        trace.finish()
+        metrics.observe(trace)
+    assert metrics.stage_counts == {"retrieval": 2}
+    assert metrics.counters == {"completion_tokens": 10, "draft_completion_tokens": 6}
+    text = metrics.to_prometheus()
+    assert "crew_request_seconds_count 2" in text
+    assert "crew_draft_completion_tokens_total 6" in text
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+from agents.vectorstore import NumpyStore
+
+DIM = 32
+
+
+class FakeEmbedding:
+    """
+    Embeds "text-N" as row N of a fixed matrix of clustered vectors.
+    """
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[int(text.split("-")[1])] for text in texts]
+
+
+def clustered(n, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, DIM))
+    return (centers[rng.integers(0, len(centers), n)] + 0.3 * rng.normal(size=(n, DIM))).astype(np.float32)
+
+
+def fill(store, n):
+    texts = [f"text-{i}" for i in range(n)]
+    metadatas = [{"filename": f"{i % 7}.pdf", "page": i} for i in range(n)]
+    store.add_texts(texts, metadatas=metadatas, ids=[f"c{i}" for i in range(n)])
+    store.flush()
+
+
+def exact_top(vectors, queries, k):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    return [set(f"c{i}" for i in np.argsort(-scores)[:k]) for scores in queries @ vectors.T]
+
+
+def top_ids(store, queries, k):
+    return [[cid for cid, _, _ in hits] for hits in store.query(queries.tolist(), k)]
+
+
+EXACT, IVF = 10 ** 9, 500
+
+
+@pytest.mark.parametrize("dtype, ann_threshold", [("float32", EXACT), ("int8", EXACT), ("float32", IVF), ("int8", IVF)])
+def test_recall_against_exact_float32_search(tmp_path, dtype, ann_threshold):
+    vectors = clustered(3000)
+    store = NumpyStore(
+        str(tmp_path), FakeEmbedding(vectors), dtype=dtype, ann_threshold=ann_threshold, nprobe=8, segment_rows=1000
+    )
+    fill(store, len(vectors))
+    assert all((segment.ivf is not None) == (ann_threshold == IVF) for segment in store._segments)
+    queries = clustered(50, seed=1)
+    expected = exact_top(vectors, queries, 10)
+    found = top_ids(store, queries, 10)
+    recall = np.mean([len(expected_ids & set(ids)) / 10 for expected_ids, ids in zip(expected, found)])
+    assert recall == 1.0 if (dtype, ann_threshold) == ("float32", EXACT) else recall >= 0.9
+
+
+def test_reopen_from_disk(tmp_path):
+    vectors = clustered(500)
+    store = NumpyStore(str(tmp_path), FakeEmbedding(vectors), dtype="int8", segment_rows=200)
+    fill(store, len(vectors))
+    store.delete(["c3"])
+    store.flush()
+    reopened = NumpyStore(str(tmp_path), FakeEmbedding(vectors), dtype="int8")
+    assert NumpyStore.exists(str(tmp_path))
+    assert reopened.count() == store.count() == 499
+    assert reopened.get_by_ids(["c10", "c3"]) == [("c10", "text-10", {"filename": "3.pdf", "page": 10})]
+    queries = clustered(10, seed=2)
+    assert top_ids(reopened, queries, 5) == top_ids(store, queries, 5)
+    # Another dtype is not read as this one: the store starts empty and is rebuilt.
+    assert NumpyStore(str(tmp_path), FakeEmbedding(vectors), dtype="float32").count() == 0
+
+
+def test_delete_then_search(tmp_path):
+    vectors = clustered(400)
+    store = NumpyStore(str(tmp_path), FakeEmbedding(vectors), segment_rows=100, max_segments=8)
+    fill(store, len(vectors))
+    nearest = top_ids(store, vectors[:1], 5)[0]
+    assert nearest[0] == "c0"
+    store.delete(nearest[:2])
+    # Deletions are visible before and after the flush that compacts them away.
+    assert not set(nearest[:2]) & set(top_ids(store, vectors[:1], 400)[0])
+    store.flush()
+    assert not set(nearest[:2]) & set(top_ids(store, vectors[:1], 400)[0])
+    assert store.count() == 398
+    assert store.get_by_ids(nearest[:2]) == []
+    # Re-adding a deleted id makes it searchable again once sealed.
+    store.add_texts(["text-0"], ids=["c0"])
+    store.flush()
+    assert top_ids(store, vectors[:1], 1)[0] == ["c0"]
+
+
+def test_reset(tmp_path):
+    vectors = clustered(300)
+    store = NumpyStore(str(tmp_path), FakeEmbedding(vectors), segment_rows=100)
+    fill(store, len(vectors))
+    store.add_texts(["text-0"], ids=["pending"])
+    store.reset()
+    assert store.count() == 0
+    store.flush()
+    assert store.query(vectors[:1].tolist(), 5) == [[]]
+    assert NumpyStore(str(tmp_path), FakeEmbedding(vectors)).count() == 0
+    fill(store, 10)
+    assert store.count() == 10
@@ -0,0 +1,79 @@
+import time
+import pytest
+from agents.websearcher import WebSearcher
+from benchmarks.stubs import SerpAPIStubHandler, StubServer
+
+
+def make_searcher(server: StubServer, **kwargs) -> WebSearcher:
+    kwargs.setdefault("backoff", 0)
+    return WebSearcher(serpapi_api_key="test", endpoint=f"{server.url}/search", timeout=5, **kwargs)
+
+
+@pytest.mark.parametrize("fail_statuses", [(429,), (503,), (429, 500, 502)])
+def test_retries_transient_statuses_then_succeeds(fail_statuses):
+    with StubServer(SerpAPIStubHandler, fail_statuses=fail_statuses) as server:
+        results = make_searcher(server, max_retries=3).search("dopamine", num_results=2)
+        assert [r["rank"] for r in results] == [1, 2]
+        assert server.requests == len(fail_statuses) + 1
+
+
+def test_gives_up_after_max_retries():
+    with StubServer(SerpAPIStubHandler, fail_statuses=(503,) * 5) as server:
+        with pytest.raises(RuntimeError, match="503"):
+            make_searcher(server, max_retries=2).search("dopamine")
+        assert server.requests == 3
+
+
+def test_does_not_retry_other_errors():
+    with StubServer(SerpAPIStubHandler, fail_statuses=(404,)) as server:
+        with pytest.raises(RuntimeError, match="404"):
+            make_searcher(server, max_retries=2).search("dopamine")
+        assert server.requests == 1
+
+
+def test_backoff_is_jittered_and_exponential(monkeypatch):
+    bounds = []
+    monkeypatch.setattr("agents.websearcher.random.uniform", lambda low, high: bounds.append((low, high)) or 0.0)
+    with StubServer(SerpAPIStubHandler, fail_statuses=(429, 429, 503)) as server:
+        assert make_searcher(server, max_retries=3, backoff=0.5).search("dopamine")
+    assert bounds == [(0, 0.5), (0, 1.0), (0, 2.0)]
+
+
+def test_cache_hits_skip_the_endpoint(tmp_path):
+    with StubServer(SerpAPIStubHandler) as server:
+        searcher = make_searcher(server, cache_path=str(tmp_path / "web.sqlite"))
+        first = searcher.search("Dopamine  neurons")
+        # Same normalized query and result count.
+        assert searcher.search("dopamine neurons") == first
+        assert server.requests == 1
+        searcher.search("dopamine neurons", num_results=2)
+        assert server.requests == 2
+        assert (searcher.cache.hits, searcher.cache.misses) == (1, 2)
+
+
+def test_cache_entries_expire(tmp_path):
+    with StubServer(SerpAPIStubHandler) as server:
+        searcher = make_searcher(server, cache_path=str(tmp_path / "web.sqlite"), cache_ttl=0.2)
+        searcher.search("dopamine")
+        searcher.search("dopamine")
+        assert server.requests == 1
+        time.sleep(0.3)
+        searcher.search("dopamine")
+        assert server.requests == 2
+
+
+def test_cache_persists_across_searchers(tmp_path):
+    with StubServer(SerpAPIStubHandler) as server:
+        path = str(tmp_path / "web.sqlite")
+        expected = make_searcher(server, cache_path=path).search("dopamine")
+        assert make_searcher(server, cache_path=path).search("dopamine") == expected
+        assert server.requests == 1
+
+
+def test_failed_searches_are_not_cached(tmp_path):
+    with StubServer(SerpAPIStubHandler, fail_statuses=(503,)) as server:
+        searcher = make_searcher(server, max_retries=0, cache_path=str(tmp_path / "web.sqlite"))
+        with pytest.raises(RuntimeError):
+            searcher.search("dopamine")
+        assert searcher.search("dopamine")
+        assert server.requests == 2